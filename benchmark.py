@@ -0,0 +1,471 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import psycopg2
+from openpyxl import Workbook
+import data_validator
+import import_data
+from data_validator import COLUMN_VALIDATORS
+from database import password_configured
+from input_reader import open_batches, READ_BATCH_SIZE
+from logging_setup import setup_logging
+from normalizers import UF_MAPPING, clear_caches
+from parallel import map_in_order
+from pipeline import validate_chunk
+
+# Benchmark runs log here instead of import_data.log
+LOG_FILE = 'benchmark.log'
+logger = logging.getLogger(__name__)
+
+# Sheet sizes benchmarked when none are given
+DEFAULT_SIZES = [10000]
+
+# Share of generated rows with each kind of problem (or variation)
+DEFAULT_RATES = {
+    'cnpj': 0.15,              # CNPJ instead of CPF
+    'invalid_cpf_cnpj': 0.05,  # wrong check digit
+    'bad_cep': 0.03,           # letters or too many digits
+    'bad_uf': 0.03,            # not a UF code or state name
+    'uf_name': 0.30,           # state name instead of the code
+    'duplicate': 0.10,         # same CPF/CNPJ as an earlier row
+    'string_date': 0.30,       # 'dd/mm/yyyy' text instead of a date cell
+    'missing_date': 0.05,      # empty Data Nasc.
+    'bad_phone': 0.03,         # too few digits
+    'bad_email': 0.02,         # missing '@'
+}
+
+# Scalar validators timed on the first --scalar-rows rows: (name, column, function of (value, row index))
+SCALAR_VALIDATORS = [
+    ('clean_cpf_cnpj', 'CPF/CNPJ', data_validator.clean_cpf_cnpj),
+    ('convert_excel_date', 'Data Nasc.', lambda value, i: data_validator.convert_excel_date(value, i, 'Data Nasc.')),
+    ('clean_phone', 'Celulares', lambda value, i: data_validator.clean_phone(value, i, 'Celulares')),
+    ('clean_email', 'Emails', data_validator.clean_email),
+    ('clean_cep', 'CEP', data_validator.clean_cep),
+    ('encode_string', 'Cidade', lambda value, i: data_validator.encode_string(value, 255)),
+    ('normalize_uf', 'UF', data_validator.normalize_uf),
+    ('validate_dia_vencimento', 'Vencimento', data_validator.validate_dia_vencimento),
+    ('validate_plano_valor', 'Plano Valor', data_validator.validate_plano_valor),
+    ('validate_isento', 'Isento', data_validator.validate_isento),
+]
+
+# Load modes: name -> import_data.main keyword arguments
+LOAD_MODES = {
+    'row': {},
+    'row_text': {'prepare': False},
+    'bulk': {'bulk': True},
+    'loaders': {'loaders': 4},
+    'async': {'async_connections': 8},
+}
+
+# Tables emptied in the benchmark database before each load mode
+LOAD_TABLES = ['tbl_cliente_contatos', 'tbl_cliente_contratos', 'tbl_clientes', 'tbl_importacao_linhas', 'tbl_importacoes']
+
+FIRST_NAMES = ['Ana', 'Bruno', 'Carla', 'Daniel', 'Eduarda', 'Felipe', 'Gabriela', 'Heitor', 'Isabela', 'João',
+               'Larissa', 'Marcos', 'Natália', 'Otávio', 'Paula', 'Rafael', 'Sofia', 'Thiago', 'Valéria', 'Yuri']
+LAST_NAMES = ['Almeida', 'Barbosa', 'Cardoso', 'Dias', 'Fernandes', 'Gomes', 'Lima', 'Martins', 'Nascimento',
+              'Oliveira', 'Pereira', 'Ribeiro', 'Santos', 'Souza', 'Teixeira']
+STREETS = ['Rua das Flores', 'Avenida Brasil', 'Rua Sete de Setembro', 'Travessa da Paz', 'Rua Trinta e Dois']
+DISTRICTS = ['Centro', 'Jardim América', 'Vila Nova', 'Boa Vista', 'Nazare']
+CITIES = ['São Paulo', 'Curitiba', 'Recife', 'Belo Horizonte', 'Porto Alegre', 'Itajaí']
+PLANS = [('50MB_PLA_ITA_FIBRA_99_NOVO', 99.9), ('100MB_FIBRA', 119.9), ('300MB_FIBRA', 149.9),
+         ('500MB_FIBRA_EMPRESA', 249.9), ('1GB_FIBRA', 299.9)]
+STATUSES = ['Ativo', 'Velocidade Reduzida', 'Suspenso', 'Cancelado']
+DOMAINS = ['gmail.com', 'hotmail.com', 'empresa.com.br', 'uol.com.br']
+
+CPF_WEIGHTS = (np.arange(10, 1, -1), np.arange(11, 1, -1))
+CNPJ_WEIGHTS = (np.array([5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]), np.array([6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]))
+
+def digits_to_text(digits):
+    """Rows of a digit matrix as strings."""
+    width = digits.shape[1]
+    text = (digits + ord('0')).astype(np.uint8).tobytes().decode('ascii')
+    return [text[start:start + width] for start in range(0, len(text), width)]
+
+def with_check_digits(digits, weights):
+    """
+    Append the two mod-11 check digits of CPF and CNPJ: the first weighs the base digits,
+    the second the base digits and the first check digit.
+    """
+    for weight in weights:
+        remainder = (digits * weight).sum(axis=1) % 11
+        digits = np.column_stack([digits, np.where(remainder < 2, 0, 11 - remainder)])
+    return digits
+
+def generate_documents(rng, rows, rates):
+    """CPF/CNPJ column: valid documents, some with a wrong check digit, formatted or bare."""
+    cpf = with_check_digits(rng.integers(0, 10, (rows, 9)), CPF_WEIGHTS)
+    cnpj = with_check_digits(rng.integers(0, 10, (rows, 12)), CNPJ_WEIGHTS)
+    invalid = rng.random(rows) < rates['invalid_cpf_cnpj']
+    shift = rng.integers(1, 10, rows)
+    cpf[invalid, -1] = (cpf[invalid, -1] + shift[invalid]) % 10
+    cnpj[invalid, -1] = (cnpj[invalid, -1] + shift[invalid]) % 10
+
+    formatted = rng.random(rows) < 0.5
+    documents = []
+    for is_cnpj, fmt, cpf_text, cnpj_text in zip(rng.random(rows) < rates['cnpj'], formatted,
+                                                  digits_to_text(cpf), digits_to_text(cnpj)):
+        if is_cnpj:
+            documents.append(f"{cnpj_text[:2]}.{cnpj_text[2:5]}.{cnpj_text[5:8]}/{cnpj_text[8:12]}-{cnpj_text[12:]}"
+                             if fmt else cnpj_text)
+        else:
+            documents.append(f"{cpf_text[:3]}.{cpf_text[3:6]}.{cpf_text[6:9]}-{cpf_text[9:]}" if fmt else cpf_text)
+    return np.array(documents, dtype=object)
+
+def generate_dates(rng, rows, start, end, string_rate, missing_rate):
+    """Date column: datetime cells, 'dd/mm/yyyy' strings and empty cells."""
+    days = rng.integers(0, (pd.Timestamp(end) - pd.Timestamp(start)).days, rows)
+    dates = pd.Timestamp(start) + pd.to_timedelta(days, unit='D')
+    values = np.array(dates.to_pydatetime(), dtype=object)
+    as_text = rng.random(rows) < string_rate
+    values[as_text] = dates[as_text].strftime('%d/%m/%Y')
+    values[rng.random(rows) < missing_rate] = None
+    return values
+
+def generate_phones(rng, rows, mobile, bad_rate, empty_rate):
+    """Phone column: '(DD) 9XXXX-XXXX' mobiles or '(DD) XXXX-XXXX' landlines, some too short or empty."""
+    ddd = rng.integers(11, 100, rows)
+    first = rng.integers(10000, 100000, rows) if mobile else rng.integers(2000, 6000, rows)
+    last = rng.integers(0, 10000, rows)
+    bad = rng.random(rows) < bad_rate
+    empty = rng.random(rows) < empty_rate
+    prefix = '9' if mobile else ''
+    phones = []
+    for d, f, l, is_bad, is_empty in zip(ddd, first, last, bad, empty):
+        if is_empty:
+            phones.append(None)
+        elif is_bad:
+            phones.append(f"{f}-{l:04d}")
+        else:
+            phones.append(f"({d}) {prefix}{f}-{l:04d}" if mobile else f"({d}) {f}-{l:04d}")
+    return phones
+
+def generate_rows(rows, seed=42, rates=DEFAULT_RATES):
+    """
+    Synthetic input sheet with the import_data.EXPECTED_COLUMNS layout.
+    The same seed and rates always give the same rows.
+    """
+    rng = np.random.default_rng(seed)
+    documents = generate_documents(rng, rows, rates)
+    first = rng.choice(FIRST_NAMES, rows)
+    last = rng.choice(LAST_NAMES, rows)
+    names = np.array([f"{a} {b}" for a, b in zip(first, last)], dtype=object)
+
+    # Duplicates repeat the CPF/CNPJ and name of an earlier row, with their own contract
+    duplicate = (rng.random(rows) < rates['duplicate']) & (np.arange(rows) > 0)
+    source = (rng.random(rows) * np.arange(rows)).astype(int)
+    documents[duplicate] = documents[source[duplicate]]
+    names[duplicate] = names[source[duplicate]]
+
+    emails = [f"{a.lower()}.{b.lower()}{n}@{domain}" for a, b, n, domain in
+              zip(first, last, rng.integers(1, 1000, rows), rng.choice(DOMAINS, rows))]
+    emails = [email.replace('@', '.') if bad else email
+              for email, bad in zip(emails, rng.random(rows) < rates['bad_email'])]
+
+    cep_digits = rng.integers(1000000, 99999999, rows)
+    cep_style = rng.random(rows)
+    ceps = [f"{cep // 1000:05d}-{cep % 1000:03d}" if style < 0.6 else int(cep)
+            for cep, style in zip(cep_digits, cep_style)]
+    for index in np.flatnonzero(rng.random(rows) < rates['bad_cep']):
+        ceps[index] = 'sem CEP' if index % 2 else str(cep_digits[index]) + '123'
+
+    codes = list(UF_MAPPING.values())
+    states = list(UF_MAPPING.keys())
+    uf_index = rng.integers(0, len(codes), rows)
+    ufs = [states[i].title() if by_name else codes[i]
+           for i, by_name in zip(uf_index, rng.random(rows) < rates['uf_name'])]
+    for index in np.flatnonzero(rng.random(rows) < rates['bad_uf']):
+        ufs[index] = 'XX'
+
+    plan_index = rng.integers(0, len(PLANS), rows)
+    numbers = rng.integers(1, 3000, rows).astype(object)
+    numbers[rng.random(rows) < 0.05] = 'SN'
+    complements = np.array([f"Apto {n}" for n in rng.integers(1, 500, rows)], dtype=object)
+    complements[rng.random(rows) < 0.5] = None
+
+    return pd.DataFrame({
+        'CPF/CNPJ': documents,
+        'Nome/Razão Social': names,
+        'Nome Fantasia': None,
+        'Data Nasc.': generate_dates(rng, rows, '1950-01-01', '2005-12-31', rates['string_date'], rates['missing_date']),
+        'Data Cadastro cliente': generate_dates(rng, rows, '2015-01-01', '2024-12-31', rates['string_date'], 0.0),
+        'Celulares': generate_phones(rng, rows, True, rates['bad_phone'], 0.3),
+        'Telefones': generate_phones(rng, rows, False, rates['bad_phone'], 0.7),
+        'Emails': emails,
+        'Plano': [PLANS[i][0] for i in plan_index],
+        'Plano Valor': [PLANS[i][1] for i in plan_index],
+        'Vencimento': rng.choice([5, 10, 15, 20, 25], rows),
+        'Isento': rng.choice(['Não', 'Sim'], rows, p=[0.9, 0.1]),
+        'Endereço': rng.choice(STREETS, rows),
+        'Número': numbers,
+        'Bairro': rng.choice(DISTRICTS, rows),
+        'Cidade': rng.choice(CITIES, rows),
+        'Complemento': complements,
+        'CEP': ceps,
+        'UF': ufs,
+        'Status': rng.choice(STATUSES, rows, p=[0.7, 0.1, 0.1, 0.1]),
+    }, columns=import_data.EXPECTED_COLUMNS).astype(object)
+
+def write_sheet(df, file_path):
+    """Write a generated sheet as .xlsx (openpyxl write-only mode), .csv or .csv.gz."""
+    if file_path.endswith('.xlsx'):
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet()
+        sheet.append(list(df.columns))
+        for values in df.itertuples(index=False, name=None):
+            sheet.append([value.item() if isinstance(value, np.generic) else value for value in values])
+        workbook.save(file_path)
+    else:
+        df.to_csv(file_path, index=False, compression='infer')
+
+def timed(func, *args, **kwargs):
+    """Run func and return (its result, seconds taken)."""
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+def measurement(seconds, rows):
+    """Result entry: time and throughput."""
+    return {'seconds': round(seconds, 4), 'rows': rows, 'rows_per_s': round(rows / seconds, 1) if seconds else None}
+
+def bench_read(file_path):
+    """Stream the generated file with input_reader and return its rows as one DataFrame."""
+    columns, batches = open_batches(file_path, import_data.EXPECTED_COLUMNS)
+    return pd.concat(list(batches))
+
+def bench_column_validators(df):
+    """Time every column validator of data_validator on the whole sheet."""
+    results = {}
+    for column, validator in COLUMN_VALIDATORS:
+        clear_caches()
+        series = df[column].astype(object)
+        (cleaned, errors), seconds = timed(validator, series)
+        results[column] = measurement(seconds, len(series))
+        results[column]['errors'] = int(errors.notna().sum())
+    return results
+
+def bench_scalar_validators(df, rows):
+    """Time the per-row validators of data_validator on the first rows of the sheet."""
+    results = {}
+    for name, column, validator in SCALAR_VALIDATORS:
+        clear_caches()
+        values = df[column].iloc[:rows].tolist()
+        started = time.perf_counter()
+        for index, value in enumerate(values):
+            validator(value, index)
+        results[name] = measurement(time.perf_counter() - started, len(values))
+    return results
+
+def bench_validation_pass(df, workers):
+    """Time the validate stage (pipeline.validate_chunk) over the whole sheet in read-sized chunks."""
+    clear_caches()
+    chunks = [df.iloc[start:start + READ_BATCH_SIZE] for start in range(0, len(df), READ_BATCH_SIZE)]
+    results, seconds = timed(lambda: list(map_in_order(validate_chunk, chunks, workers)))
+    result = measurement(seconds, len(df))
+    result['accepted'] = sum(reason is None for records, reasons, paths in results for reason in reasons)
+    return result
+
+def run_main(file_path, **kwargs):
+    """Run import_data.main without its input cache and return its metrics, or the error."""
+    result = import_data.main(file_path, use_cache=False, report_format='csv', **kwargs)
+    if result is None:
+        return {'error': "run failed; see the log"}
+    return {
+        'stages': {name: measurement(info['seconds'], info['rows']) for name, info in result['stages'].items()},
+        'seconds': round(sum(info['seconds'] for info in result['stages'].values()), 4),
+        'stats': result['counters'],
+        'statements': result['statements'],
+        'rejections': result['rejections']
+    }
+
+@contextmanager
+def overridden(target, **values):
+    """
+    Set attributes of a module, or keys of a dict, for a with block and restore them after it,
+    so the benchmark leaves import_data as it found it.
+    """
+    if isinstance(target, dict):
+        get, put = target.__getitem__, target.__setitem__
+    else:
+        get, put = (lambda name: getattr(target, name)), (lambda name, value: setattr(target, name, value))
+    saved = {name: get(name) for name in values}
+    try:
+        for name, value in values.items():
+            put(name, value)
+        yield target
+    finally:
+        for name, value in saved.items():
+            put(name, value)
+
+def report_paths(directory):
+    """import_data report file settings pointing to CSV files in directory."""
+    return {
+        'OUTPUT_DIR': directory,
+        'ERRORS_FILE': os.path.join(directory, 'import_erros.csv'),
+        'TOTAL_REGISTROS_FILE': os.path.join(directory, 'import_totalregistros.csv'),
+        'DUPLICATES_FILE': os.path.join(directory, 'import_duplicados.csv'),
+        'REASONS_FILE': os.path.join(directory, 'import_motivos.csv')
+    }
+
+def load_unavailable(dbname):
+    """Why the load modes cannot run on dbname (no password configured, connection refused...), or None."""
+    if not password_configured(import_data.DB_PARAMS):
+        return "no database password (TSMX_DB_PASSWORD, PGPASSWORD or ~/.pgpass)"
+    try:
+        psycopg2.connect(**dict(import_data.DB_PARAMS, dbname=dbname)).close()
+    except psycopg2.Error as e:
+        return str(e).strip()
+    return None
+
+def reset_load_tables(dbname):
+    """Empty the import tables of the benchmark database."""
+    conn = psycopg2.connect(**dict(import_data.DB_PARAMS, dbname=dbname))
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f"TRUNCATE {', '.join(LOAD_TABLES)} RESTART IDENTITY CASCADE")
+        conn.commit()
+    finally:
+        conn.close()
+
+def bench_load(file_path, dbname, modes, workers):
+    """Run each load mode on an emptied benchmark database."""
+    results = {}
+    with overridden(import_data.DB_PARAMS, dbname=dbname):
+        for mode in modes:
+            reset_load_tables(dbname)
+            logger.info("Benchmarking load mode %s", mode)
+            results[mode] = run_main(file_path, workers=workers, **LOAD_MODES[mode])
+    return results
+
+def run_size(rows, args, work_dir, load_db=None):
+    """Generate one sheet size and run every benchmark on it; the load modes only with load_db."""
+    result = {'rows': rows}
+    df, seconds = timed(generate_rows, rows, args.seed, args.rates)
+    result['generate'] = measurement(seconds, rows)
+    file_path = os.path.join(work_dir, f"bench_{rows}.{args.format}")
+    _, seconds = timed(write_sheet, df, file_path)
+    result['write'] = measurement(seconds, rows)
+    result['file_bytes'] = os.path.getsize(file_path)
+
+    read_df, seconds = timed(bench_read, file_path)
+    result['read'] = measurement(seconds, len(read_df))
+    result['column_validators'] = bench_column_validators(read_df)
+    result['scalar_validators'] = bench_scalar_validators(read_df, min(args.scalar_rows, rows))
+    result['validation_pass'] = bench_validation_pass(read_df, args.workers)
+    result['validate_only'] = run_main(file_path, validate_only=True, workers=args.workers)
+    if load_db:
+        result['load'] = bench_load(file_path, load_db, args.load_modes, args.workers)
+    return result
+
+def throughputs(result, prefix=''):
+    """Flatten a result into {metric path: rows/s}."""
+    found = {}
+    for key, value in result.items():
+        if not isinstance(value, dict):
+            continue
+        if value.get('rows_per_s') is not None:
+            found[prefix + key] = value['rows_per_s']
+        found.update(throughputs(value, prefix + key + '.'))
+    return found
+
+def compare(baseline_path, results):
+    """Print rows/s of this run next to a saved run, per size and metric."""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    print(f"{'metric':<60} {'baseline':>12} {'current':>12} {'ratio':>7}")
+    for size, result in results['sizes'].items():
+        if size not in baseline['sizes']:
+            continue
+        before = throughputs(baseline['sizes'][size])
+        for metric, rate in throughputs(result).items():
+            if metric in before and before[metric]:
+                print(f"{size + ' ' + metric:<60} {before[metric]:>12.0f} {rate:>12.0f} {rate / before[metric]:>6.2f}x")
+
+def main(args):
+    """
+    Run the benchmarks for every size and save the results as JSON. import_data's report
+    paths point to a temporary directory during the run and are restored afterwards.
+    """
+    setup_logging(LOG_FILE)
+    results = {
+        'started': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'seed': args.seed,
+        'rates': args.rates,
+        'format': args.format,
+        'workers': args.workers,
+        'sizes': {}
+    }
+    load_db = args.load_db
+    if load_db:
+        reason = load_unavailable(load_db)
+        if reason:
+            logger.warning("Skipping the load modes: database '%s' is not available (%s)", load_db, reason)
+            results['load_skipped'] = reason
+            load_db = None
+
+    with tempfile.TemporaryDirectory(prefix='tsmx_bench_') as work_dir:
+        reports_dir = os.path.join(work_dir, 'reports')
+        os.makedirs(reports_dir)
+        with overridden(import_data, **report_paths(reports_dir)):
+            for rows in args.sizes:
+                logger.info("Benchmarking %s rows", rows)
+                results['sizes'][str(rows)] = run_size(rows, args, work_dir, load_db)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, default=str)
+    logger.info("Benchmark results saved to '%s'", args.output)
+    if args.compare:
+        compare(args.compare, results)
+    return results
+
+def parse_rate(text):
+    """NAME=VALUE override for DEFAULT_RATES."""
+    name, _, value = text.partition('=')
+    if name not in DEFAULT_RATES:
+        raise argparse.ArgumentTypeError(f"unknown rate '{name}'; choose from {', '.join(DEFAULT_RATES)}")
+    try:
+        return name, float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"rate '{name}' needs a number, got '{value}'")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the validation and import pipeline on synthetic sheets.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help="Rows per generated sheet, e.g. 10000 100000 1000000 (default: %(default)s)")
+    parser.add_argument('--seed', type=int, default=42, help="Random seed for the generator (default: %(default)s)")
+    parser.add_argument('--rate', type=parse_rate, action='append', default=[], metavar='NAME=VALUE',
+                        help=f"Override a generator rate; one of: {', '.join(DEFAULT_RATES)}")
+    parser.add_argument('--format', choices=['xlsx', 'csv', 'csv.gz'], default='xlsx',
+                        help="File format of the generated sheets (default: %(default)s)")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Processes used by the validation pass and pipeline runs (default: %(default)s)")
+    parser.add_argument('--scalar-rows', type=int, default=10000,
+                        help="Rows timed with each per-row validator (default: %(default)s)")
+    parser.add_argument('--load-db', metavar='DBNAME',
+                        help="Benchmark the loaders against this PostgreSQL database (same host and user as "
+                             "import_data.DB_PARAMS). Its client, contact, contract and checkpoint tables are emptied.")
+    parser.add_argument('--load-modes', nargs='+', choices=list(LOAD_MODES), default=['row', 'bulk'],
+                        help="Load modes to benchmark with --load-db (default: %(default)s)")
+    parser.add_argument('--output', default=f"benchmark_{datetime.now():%Y%m%d_%H%M%S}.json",
+                        help="JSON file for the results (default: benchmark_<timestamp>.json)")
+    parser.add_argument('--compare', metavar='JSON', help="Saved results to compare this run against")
+    args = parser.parse_args()
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.load_db == import_data.DB_PARAMS['dbname']:
+        parser.error(f"--load-db empties its tables; use a database other than {args.load_db}")
+    if 'async' in args.load_modes and not import_data.async_available() and args.load_db:
+        parser.error("the async load mode needs the asyncpg package")
+    args.rates = dict(DEFAULT_RATES, **dict(args.rate))
+    main(args)
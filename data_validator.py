@@ -1,38 +1,23 @@
 import pandas as pd
-import re
-from datetime import datetime
+import numpy as np
 import logging
-from dateutil.parser import parse as parse_date
+import math
 import os
-
-# Configure logging for detailed traceability
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('data_validation.log'),
-        logging.StreamHandler()
-    ]
-)
+from parallel import map_in_order
+from logging_setup import setup_logging
+from reports import ReportWriter
+from reasons import Reason, ReasonCode, render
+from normalizers import UF_MAPPING, NON_DIGITS, EMAIL_PATTERN, only_digits, cached_digits, uf_code, clean_text, convert_excel_dates
+
+# Logging is configured by the entry point (run_tests here, import_data when imported);
+# per-row messages need TSMX_TRACE=1
 logger = logging.getLogger(__name__)
 
 # Output directory for report files
 OUTPUT_DIR = "C:/Users/Aisla/Downloads"
-os.makedirs(OUTPUT_DIR, exist_ok=True)
 ERRORS_FILE = os.path.join(OUTPUT_DIR, "validation_erros.xlsx")
 SUCCESS_FILE = os.path.join(OUTPUT_DIR, "validation_success.xlsx")
 
-# Mapeamento de UFs (Brazilian states)
-UF_MAPPING = {
-    'ACRE': 'AC', 'ALAGOAS': 'AL', 'AMAPÁ': 'AP', 'AMAZONAS': 'AM', 'BAHIA': 'BA',
-    'CEARÁ': 'CE', 'DISTRITO FEDERAL': 'DF', 'ESPÍRITO SANTO': 'ES', 'GOIÁS': 'GO',
-    'MARANHÃO': 'MA', 'MATO GROSSO': 'MT', 'MATO GROSSO DO SUL': 'MS', 'MINAS GERAIS': 'MG',
-    'PARÁ': 'PA', 'PARAÍBA': 'PB', 'PARANÁ': 'PR', 'PERNAMBUCO': 'PE', 'PIAUÍ': 'PI',
-    'RIO DE JANEIRO': 'RJ', 'RIO GRANDE DO NORTE': 'RN', 'RIO GRANDE DO SUL': 'RS',
-    'RONDÔNIA': 'RO', 'RORAIMA': 'RR', 'SANTA CATARINA': 'SC', 'SÃO PAULO': 'SP',
-    'SERGIPE': 'SE', 'TOCANTINS': 'TO'
-}
-
 def clean_cpf_cnpj(value, row_index):
     """
     Clean and validate CPF/CNPJ with checksum.
@@ -41,26 +26,26 @@ def clean_cpf_cnpj(value, row_index):
     raw_value = value
     error_reason = None
     if pd.isna(value) or value is None or str(value).strip() == '':
-        error_reason = "CPF/CNPJ ausente ou vazio."
-        logger.warning(f"Row {row_index + 1}: CPF/CNPJ missing or empty [raw: {raw_value}]")
+        error_reason = Reason(ReasonCode.MISSING, field='CPF/CNPJ')
+        logger.warning("Row %s: CPF/CNPJ missing or empty [raw: %s]", row_index + 1, raw_value)
         return '00000000000', error_reason
     
-    cleaned = re.sub(r'[^\d]', '', str(value))
+    cleaned = only_digits(str(value))
     if not cleaned:
-        error_reason = "CPF/CNPJ vazio após limpeza."
-        logger.warning(f"Row {row_index + 1}: CPF/CNPJ empty after cleaning [raw: {raw_value}]")
+        error_reason = Reason(ReasonCode.NO_DIGITS, field='CPF/CNPJ')
+        logger.warning("Row %s: CPF/CNPJ empty after cleaning [raw: %s]", row_index + 1, raw_value)
         return '00000000000', error_reason
     
     # CPF validation (11 digits)
     if len(cleaned) == 11:
         if len(set(cleaned)) == 1:
-            error_reason = "CPF inválido (todos os dígitos iguais)."
-            logger.warning(f"Row {row_index + 1}: Invalid CPF (all digits identical) [raw: {raw_value}, cleaned: {cleaned}]")
+            error_reason = Reason(ReasonCode.REPEATED_DIGITS, field='CPF')
+            logger.warning("Row %s: Invalid CPF (all digits identical) [raw: %s, cleaned: %s]", row_index + 1, raw_value, cleaned)
             return '00000000000', error_reason
         
         if cleaned == ''.join(str(i % 10) for i in range(int(cleaned[0]), int(cleaned[0]) + 11)):
-            error_reason = "CPF inválido (dígitos sequenciais)."
-            logger.warning(f"Row {row_index + 1}: Invalid CPF (sequential digits) [raw: {raw_value}, cleaned: {cleaned}]")
+            error_reason = Reason(ReasonCode.SEQUENTIAL_DIGITS, field='CPF')
+            logger.warning("Row %s: Invalid CPF (sequential digits) [raw: %s, cleaned: %s]", row_index + 1, raw_value, cleaned)
             return '00000000000', error_reason
         
         def calculate_cpf_digit(cpf, weights):
@@ -70,23 +55,23 @@ def clean_cpf_cnpj(value, row_index):
         
         weights1 = list(range(10, 1, -1))
         digit1 = calculate_cpf_digit(cleaned[:9], weights1)
-        weights2 = list(range(11, 2, -1))
+        weights2 = list(range(11, 1, -1))
         digit2 = calculate_cpf_digit(cleaned[:9] + str(digit1), weights2)
         
         provided_check_digits = cleaned[9:11]
         expected_check_digits = f"{digit1}{digit2}"
         if provided_check_digits == expected_check_digits:
-            logger.info(f"Row {row_index + 1}: Valid CPF [raw: {raw_value}, cleaned: {cleaned}]")
+            logger.debug("Row %s: Valid CPF [raw: %s, cleaned: %s]", row_index + 1, raw_value, cleaned)
             return cleaned, None
-        error_reason = f"Checksum de CPF inválido (esperado: {expected_check_digits}, fornecido: {provided_check_digits})."
-        logger.warning(f"Row {row_index + 1}: Invalid CPF checksum [raw: {raw_value}, cleaned: {cleaned}]")
+        error_reason = Reason(ReasonCode.BAD_CHECKSUM, expected_check_digits, provided_check_digits, field='CPF')
+        logger.warning("Row %s: Invalid CPF checksum [raw: %s, cleaned: %s]", row_index + 1, raw_value, cleaned)
         return '00000000000', error_reason
     
     # CNPJ validation (14 digits)
     elif len(cleaned) == 14:
         if len(set(cleaned)) == 1:
-            error_reason = "CNPJ inválido (todos os dígitos iguais)."
-            logger.warning(f"Row {row_index + 1}: Invalid CNPJ (all digits identical) [raw: {raw_value}, cleaned: {cleaned}]")
+            error_reason = Reason(ReasonCode.REPEATED_DIGITS, field='CNPJ')
+            logger.warning("Row %s: Invalid CNPJ (all digits identical) [raw: %s, cleaned: %s]", row_index + 1, raw_value, cleaned)
             return '00000000000', error_reason
         
         def calculate_cnpj_digit(cnpj, weights):
@@ -102,14 +87,14 @@ def clean_cpf_cnpj(value, row_index):
         expected_check_digits = f"{digit1}{digit2}"
         provided_check_digits = cleaned[12:14]
         if provided_check_digits == expected_check_digits:
-            logger.info(f"Row {row_index + 1}: Valid CNPJ [raw: {raw_value}, cleaned: {cleaned}]")
+            logger.debug("Row %s: Valid CNPJ [raw: %s, cleaned: %s]", row_index + 1, raw_value, cleaned)
             return cleaned, None
-        error_reason = f"Checksum de CNPJ inválido (esperado: {expected_check_digits}, fornecido: {provided_check_digits})."
-        logger.warning(f"Row {row_index + 1}: Invalid CNPJ checksum [raw: {raw_value}, cleaned: {cleaned}]")
+        error_reason = Reason(ReasonCode.BAD_CHECKSUM, expected_check_digits, provided_check_digits, field='CNPJ')
+        logger.warning("Row %s: Invalid CNPJ checksum [raw: %s, cleaned: %s]", row_index + 1, raw_value, cleaned)
         return '00000000000', error_reason
     
-    error_reason = f"Comprimento de CPF/CNPJ inválido ({len(cleaned)} dígitos, esperado 11 ou 14)."
-    logger.warning(f"Row {row_index + 1}: Invalid CPF/CNPJ length [raw: {raw_value}, cleaned: {cleaned}]")
+    error_reason = Reason(ReasonCode.DOCUMENT_LENGTH, len(cleaned), field='CPF/CNPJ')
+    logger.warning("Row %s: Invalid CPF/CNPJ length [raw: %s, cleaned: %s]", row_index + 1, raw_value, cleaned)
     return '00000000000', error_reason
 
 def convert_excel_date(excel_date, row_index, field_name):
@@ -118,31 +103,15 @@ def convert_excel_date(excel_date, row_index, field_name):
     Returns date or None, with error reason if applicable.
     """
     raw_value = excel_date
-    error_reason = None
-    if pd.isna(excel_date) or excel_date is None or str(excel_date).strip() == '':
-        error_reason = f"{field_name} ausente ou vazio."
-        logger.warning(f"Row {row_index + 1}: {field_name} missing or empty [raw: {raw_value}]")
-        return None, error_reason
-    
-    if isinstance(excel_date, (int, float)):
-        try:
-            result = (datetime(1899, 12, 30) + pd.Timedelta(days=excel_date)).date()
-            logger.info(f"Row {row_index + 1}: Converted numeric {field_name} [raw: {raw_value}, result: {result}]")
-            return result, None
-        except Exception as e:
-            error_reason = f"Falha ao converter data numérica para {field_name}: {e}."
-            logger.warning(f"Row {row_index + 1}: Failed to convert numeric {field_name} [raw: {raw_value}]: {e}")
-            return None, error_reason
-    
-    try:
-        parsed_date = parse_date(str(excel_date), dayfirst=True)
-        result = parsed_date.date()
-        logger.info(f"Row {row_index + 1}: Parsed string {field_name} [raw: {raw_value}, result: {result}]")
-        return result, None
-    except Exception as e:
-        error_reason = f"Falha ao parsear data de string para {field_name}: {e}."
-        logger.warning(f"Row {row_index + 1}: Failed to parse string {field_name} [raw: {raw_value}]: {e}")
-        return None, error_reason
+    values, errors, paths = convert_excel_dates(pd.Series([excel_date], dtype=object), field_name)
+    result, error_reason = values[0], errors[0]
+    if paths['missing']:
+        logger.warning("Row %s: %s missing or empty [raw: %s]", row_index + 1, field_name, raw_value)
+    elif error_reason:
+        logger.warning("Row %s: Failed to convert %s [raw: %s]: %s", row_index + 1, field_name, raw_value, error_reason)
+    else:
+        logger.debug("Row %s: Converted %s [raw: %s, result: %s]", row_index + 1, field_name, raw_value, result)
+    return result, error_reason
 
 def clean_phone(phone, row_index, field_name):
     """
@@ -152,12 +121,12 @@ def clean_phone(phone, row_index, field_name):
     raw_value = phone
     error_reason = None
     if pd.isna(phone) or phone is None or str(phone).strip() == '':
-        logger.info(f"Row {row_index + 1}: {field_name} missing or empty [raw: {raw_value}]")
+        logger.debug("Row %s: %s missing or empty [raw: %s]", row_index + 1, field_name, raw_value)
         return None, None
     
-    cleaned = re.sub(r'[^\d]', '', str(phone))
+    cleaned = only_digits(str(phone))
     if not cleaned:
-        logger.info(f"Row {row_index + 1}: {field_name} empty after cleaning [raw: {raw_value}]")
+        logger.debug("Row %s: %s empty after cleaning [raw: %s]", row_index + 1, field_name, raw_value)
         return None, None
     
     if cleaned.startswith('55') and len(cleaned) == 13:
@@ -167,15 +136,15 @@ def clean_phone(phone, row_index, field_name):
     
     if len(cleaned) == 11 and cleaned[2] in '9876':
         result = f"+55{cleaned}"
-        logger.info(f"Row {row_index + 1}: Valid {field_name} (mobile) [raw: {raw_value}, result: {result}]")
+        logger.debug("Row %s: Valid %s (mobile) [raw: %s, result: %s]", row_index + 1, field_name, raw_value, result)
         return result, None
     elif len(cleaned) == 10:
         result = f"+55{cleaned}"
-        logger.info(f"Row {row_index + 1}: Valid {field_name} (landline) [raw: {raw_value}, result: {result}]")
+        logger.debug("Row %s: Valid %s (landline) [raw: %s, result: %s]", row_index + 1, field_name, raw_value, result)
         return result, None
     
-    error_reason = f"{field_name} inválido (10 dígitos para fixo, 11 dígitos com terceiro dígito após DDD como 9/8/7/6 para móvel)."
-    logger.warning(f"Row {row_index + 1}: Invalid {field_name} [raw: {raw_value}, cleaned: {cleaned}]")
+    error_reason = Reason(ReasonCode.PHONE_INVALID, field=field_name)
+    logger.warning("Row %s: Invalid %s [raw: %s, cleaned: %s]", row_index + 1, field_name, raw_value, cleaned)
     return None, error_reason
 
 def clean_email(email, row_index):
@@ -186,17 +155,16 @@ def clean_email(email, row_index):
     raw_value = email
     error_reason = None
     if pd.isna(email) or email is None or str(email).strip() == '':
-        logger.info(f"Row {row_index + 1}: Email missing or empty [raw: {raw_value}]")
+        logger.debug("Row %s: Email missing or empty [raw: %s]", row_index + 1, raw_value)
         return None, None
     
     email = str(email).strip()
-    email_regex = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    if not re.match(email_regex, email):
-        error_reason = "Formato de email inválido."
-        logger.warning(f"Row {row_index + 1}: Invalid email format [raw: {raw_value}, cleaned: {email}]")
+    if not EMAIL_PATTERN.match(email):
+        error_reason = Reason(ReasonCode.EMAIL_INVALID, field='Emails')
+        logger.warning("Row %s: Invalid email format [raw: %s, cleaned: %s]", row_index + 1, raw_value, email)
         return None, error_reason
     
-    logger.info(f"Row {row_index + 1}: Valid email [raw: {raw_value}, cleaned: {email}]")
+    logger.debug("Row %s: Valid email [raw: %s, cleaned: %s]", row_index + 1, raw_value, email)
     return email, None
 
 def clean_cep(cep, row_index):
@@ -207,26 +175,26 @@ def clean_cep(cep, row_index):
     raw_value = cep
     error_reason = None
     if pd.isna(cep) or cep is None or str(cep).strip() == '':
-        error_reason = "CEP ausente ou vazio."
-        logger.warning(f"Row {row_index + 1}: CEP missing or empty [raw: {raw_value}]")
+        error_reason = Reason(ReasonCode.MISSING, field='CEP')
+        logger.warning("Row %s: CEP missing or empty [raw: %s]", row_index + 1, raw_value)
         return '00000000', error_reason
     
-    cep = re.sub(r'[^\d]', '', str(cep))
+    cep = cached_digits(str(cep))
     if not cep.isdigit():
-        error_reason = "CEP inválido (contém caracteres não numéricos)."
-        logger.warning(f"Row {row_index + 1}: Invalid CEP (non-numeric) [raw: {raw_value}, cleaned: {cep}]")
+        error_reason = Reason(ReasonCode.NOT_NUMERIC, field='CEP')
+        logger.warning("Row %s: Invalid CEP (non-numeric) [raw: %s, cleaned: %s]", row_index + 1, raw_value, cep)
         return '00000000', error_reason
     
     if len(cep) != 8:
         if len(cep) < 8:
             cep = cep.zfill(8)
-            logger.info(f"Row {row_index + 1}: Padded CEP to 8 digits [raw: {raw_value}, cleaned: {cep}]")
+            logger.debug("Row %s: Padded CEP to 8 digits [raw: %s, cleaned: %s]", row_index + 1, raw_value, cep)
         else:
-            error_reason = "Comprimento de CEP inválido (deve ter 8 dígitos)."
-            logger.warning(f"Row {row_index + 1}: Invalid CEP length [raw: {raw_value}, cleaned: {cep}]")
+            error_reason = Reason(ReasonCode.CEP_LENGTH, field='CEP')
+            logger.warning("Row %s: Invalid CEP length [raw: %s, cleaned: %s]", row_index + 1, raw_value, cep)
             return '00000000', error_reason
     
-    logger.info(f"Row {row_index + 1}: Valid CEP [raw: {raw_value}, cleaned: {cep}]")
+    logger.debug("Row %s: Valid CEP [raw: %s, cleaned: %s]", row_index + 1, raw_value, cep)
     return cep, None
 
 def encode_string(value, max_length=None, default=None):
@@ -237,22 +205,22 @@ def encode_string(value, max_length=None, default=None):
     raw_value = value
     error_reason = None
     if pd.isna(value) or value is None or str(value).strip() == '':
-        logger.info(f"Encoding: Value missing or empty [raw: {raw_value}]")
+        logger.debug("Encoding: Value missing or empty [raw: %s]", raw_value)
         return default, None
     
     try:
-        value_str = str(value).strip().encode('utf-8', errors='replace').decode('utf-8')
+        value_str = clean_text(str(value).strip())
         if not value_str:
-            logger.info(f"Encoding: Value empty after stripping [raw: {raw_value}]")
+            logger.debug("Encoding: Value empty after stripping [raw: %s]", raw_value)
             return default, None
         if max_length and len(value_str) > max_length:
             value_str = value_str[:max_length]
-            logger.info(f"Encoding: Truncated value to {max_length} chars [raw: {raw_value}, cleaned: {value_str}]")
-        logger.info(f"Encoding: Successfully encoded value [raw: {raw_value}, cleaned: {value_str}]")
+            logger.debug("Encoding: Truncated value to %s chars [raw: %s, cleaned: %s]", max_length, raw_value, value_str)
+        logger.debug("Encoding: Successfully encoded value [raw: %s, cleaned: %s]", raw_value, value_str)
         return value_str, None
     except Exception as e:
-        error_reason = f"Erro de codificação: {e}."
-        logger.warning(f"Encoding error [raw: {raw_value}]: {e}")
+        error_reason = Reason(ReasonCode.ENCODING_ERROR, str(e))
+        logger.warning("Encoding error [raw: %s]: %s", raw_value, e)
         return default, error_reason
 
 def normalize_uf(uf, row_index):
@@ -263,22 +231,21 @@ def normalize_uf(uf, row_index):
     raw_value = uf
     error_reason = None
     if pd.isna(uf) or uf is None or str(uf).strip() == '':
-        error_reason = "UF ausente ou vazio."
-        logger.warning(f"Row {row_index + 1}: UF missing or empty [raw: {raw_value}]")
+        error_reason = Reason(ReasonCode.MISSING, field='UF')
+        logger.warning("Row %s: UF missing or empty [raw: %s]", row_index + 1, raw_value)
         return 'XX', error_reason
     
     uf = str(uf).strip().upper()
-    if len(uf) == 2 and uf in UF_MAPPING.values():
-        logger.info(f"Row {row_index + 1}: Valid UF [raw: {raw_value}, cleaned: {uf}]")
+    code = uf_code(uf)
+    if code == uf:
+        logger.debug("Row %s: Valid UF [raw: %s, cleaned: %s]", row_index + 1, raw_value, uf)
         return uf, None
+    if code is not None:
+        logger.debug("Row %s: Normalized UF [raw: %s, from: %s, to: %s]", row_index + 1, raw_value, uf, code)
+        return code, None
     
-    for key, value in UF_MAPPING.items():
-        if uf == key or uf.lower() == key.lower():
-            logger.info(f"Row {row_index + 1}: Normalized UF [raw: {raw_value}, from: {uf}, to: {value}]")
-            return value, None
-    
-    error_reason = "UF inválido."
-    logger.warning(f"Row {row_index + 1}: Invalid UF [raw: {raw_value}, cleaned: {uf}]")
+    error_reason = Reason(ReasonCode.INVALID, field='UF')
+    logger.warning("Row %s: Invalid UF [raw: %s, cleaned: %s]", row_index + 1, raw_value, uf)
     return 'XX', error_reason
 
 def validate_dia_vencimento(dia, row_index):
@@ -289,43 +256,54 @@ def validate_dia_vencimento(dia, row_index):
     raw_value = dia
     error_reason = None
     if pd.isna(dia) or dia is None or str(dia).strip() == '':
-        error_reason = "Dia de vencimento ausente ou vazio."
-        logger.warning(f"Row {row_index + 1}: Dia de vencimento missing or empty [raw: {raw_value}]")
+        error_reason = Reason(ReasonCode.MISSING, field='Dia de vencimento')
+        logger.warning("Row %s: Dia de vencimento missing or empty [raw: %s]", row_index + 1, raw_value)
         return 1, error_reason
     
     try:
         dia = int(float(str(dia).strip()))
         if dia < 1 or dia > 31:
-            error_reason = "Dia de vencimento inválido (deve ser entre 1 e 31)."
-            logger.warning(f"Row {row_index + 1}: Invalid dia de vencimento [raw: {raw_value}, cleaned: {dia}]")
+            error_reason = Reason(ReasonCode.OUT_OF_RANGE, 1, 31, field='Dia de vencimento')
+            logger.warning("Row %s: Invalid dia de vencimento [raw: %s, cleaned: %s]", row_index + 1, raw_value, dia)
             return 1, error_reason
-        logger.info(f"Row {row_index + 1}: Valid dia de vencimento [raw: {raw_value}, cleaned: {dia}]")
+        logger.debug("Row %s: Valid dia de vencimento [raw: %s, cleaned: %s]", row_index + 1, raw_value, dia)
         return dia, None
-    except (ValueError, TypeError):
-        error_reason = "Dia de vencimento não é um número."
-        logger.warning(f"Row {row_index + 1}: Dia de vencimento is not a number [raw: {raw_value}]")
+    except (ValueError, TypeError, OverflowError):
+        error_reason = Reason(ReasonCode.NOT_A_NUMBER, field='Dia de vencimento')
+        logger.warning("Row %s: Dia de vencimento is not a number [raw: %s]", row_index + 1, raw_value)
         return 1, error_reason
 
+# Largest plan value tbl_planos.valor (numeric(15,2)) holds
+PLANO_VALOR_MAX = 9999999999999.99
+
 def validate_plano_valor(valor, row_index):
     """
-    Validate plano valor as a float.
+    Validate plano valor as a finite float that fits numeric(15,2).
     Returns validated value or 0.0, with error reason if applicable.
     """
     raw_value = valor
     error_reason = None
     if pd.isna(valor) or valor is None or str(valor).strip() == '':
-        error_reason = "Plano Valor ausente ou vazio."
-        logger.warning(f"Row {row_index + 1}: Plano Valor missing or empty [raw: {raw_value}]")
+        error_reason = Reason(ReasonCode.MISSING, field='Plano Valor')
+        logger.warning("Row %s: Plano Valor missing or empty [raw: %s]", row_index + 1, raw_value)
         return 0.0, error_reason
     
     try:
         valor_str = str(valor).replace(',', '')
         result = float(valor_str)
-        logger.info(f"Row {row_index + 1}: Valid Plano Valor [raw: {raw_value}, cleaned: {result}]")
+        if not math.isfinite(result):
+            error_reason = Reason(ReasonCode.INVALID, field='Plano Valor')
+            logger.warning("Row %s: Invalid Plano Valor [raw: %s]", row_index + 1, raw_value)
+            return 0.0, error_reason
+        if abs(result) > PLANO_VALOR_MAX:
+            error_reason = Reason(ReasonCode.OUT_OF_RANGE, -PLANO_VALOR_MAX, PLANO_VALOR_MAX, field='Plano Valor')
+            logger.warning("Row %s: Plano Valor out of range [raw: %s]", row_index + 1, raw_value)
+            return 0.0, error_reason
+        logger.debug("Row %s: Valid Plano Valor [raw: %s, cleaned: %s]", row_index + 1, raw_value, result)
         return result, None
     except (ValueError, TypeError):
-        error_reason = "Plano Valor inválido."
-        logger.warning(f"Row {row_index + 1}: Invalid Plano Valor [raw: {raw_value}]")
+        error_reason = Reason(ReasonCode.INVALID, field='Plano Valor')
+        logger.warning("Row %s: Invalid Plano Valor [raw: %s]", row_index + 1, raw_value)
         return 0.0, error_reason
 
 def validate_isento(isento, row_index):
@@ -336,138 +314,352 @@ def validate_isento(isento, row_index):
     raw_value = isento
     error_reason = None
     if pd.isna(isento) or isento is None or str(isento).strip() == '':
-        logger.info(f"Row {row_index + 1}: Isento missing or empty [raw: {raw_value}]")
+        logger.debug("Row %s: Isento missing or empty [raw: %s]", row_index + 1, raw_value)
         return False, None
     
     isento_str = str(isento).strip().lower()
     if isento_str in ('sim', 's', 'yes', 'true', '1'):
-        logger.info(f"Row {row_index + 1}: Isento set to True [raw: {raw_value}, cleaned: {isento_str}]")
+        logger.debug("Row %s: Isento set to True [raw: %s, cleaned: %s]", row_index + 1, raw_value, isento_str)
         return True, None
     if isento_str in ('não', 'nao', 'n', 'no', 'false', '0'):
-        logger.info(f"Row {row_index + 1}: Isento set to False [raw: {raw_value}, cleaned: {isento_str}]")
+        logger.debug("Row %s: Isento set to False [raw: %s, cleaned: %s]", row_index + 1, raw_value, isento_str)
         return False, None
     
-    error_reason = f"Valor de Isento inválido ({isento_str})."
-    logger.warning(f"Row {row_index + 1}: Invalid Isento value [raw: {raw_value}, cleaned: {isento_str}]")
+    error_reason = Reason(ReasonCode.INVALID_VALUE, isento_str, field='Isento')
+    logger.warning("Row %s: Invalid Isento value [raw: %s, cleaned: %s]", row_index + 1, raw_value, isento_str)
     return False, error_reason
 
+# Column-wise validation engine
+# Each *_column function takes a whole Series and returns (cleaned values, reasons.Reason or None),
+# producing exactly what the scalar function above returns for every element.
+
+CPF_WEIGHTS_1 = np.arange(10, 1, -1)
+CPF_WEIGHTS_2 = np.arange(11, 1, -1)
+CNPJ_WEIGHTS_1 = np.array([5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2])
+CNPJ_WEIGHTS_2 = np.array([6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2])
+
+ISENTO_TRUE = ('sim', 's', 'yes', 'true', '1')
+ISENTO_FALSE = ('não', 'nao', 'n', 'no', 'false', '0')
+
+# Plain ASCII decimals are converted in one numpy pass; anything else goes through float()
+NUMBER_PATTERN = r'[+-]?[0-9]+(?:\.[0-9]*)?'
+
+def column_as_text(series):
+    """
+    Convert a column to str() of each value, as the scalar functions do.
+    Returns the text Series (object dtype, so .str uses Python's re) and the missing mask.
+    """
+    text = series.map(str, na_action='ignore').astype(object)
+    missing = series.isna() | (text.str.strip() == '')
+    return text, missing
+
+def empty_result(series, default):
+    """Return a values Series filled with default and an all-None errors Series."""
+    values = pd.Series(np.full(len(series), default, dtype=object), index=series.index)
+    errors = pd.Series(np.full(len(series), None, dtype=object), index=series.index)
+    return values, errors
+
+def digit_matrix(values, width):
+    """Turn equal-length ASCII digit strings into an (n, width) integer matrix."""
+    array = np.array(values.tolist(), dtype=f'U{width}')
+    return array.view(np.uint32).reshape(-1, width).astype(np.int64) - ord('0')
+
+def check_digits(digits, weights1, weights2):
+    """Compute both check digits for a digit matrix using dot products with the weight vectors."""
+    base = digits[:, :len(weights1)]
+    remainder = (base @ weights1) % 11
+    digit1 = np.where(remainder < 2, 0, 11 - remainder)
+    # The second digit is weighted over the base digits and the first check digit
+    remainder = (np.column_stack([base, digit1]) @ weights2) % 11
+    digit2 = np.where(remainder < 2, 0, 11 - remainder)
+    return digit1, digit2
+
+def text_to_float(text):
+    """
+    float() every value of a text Series.
+    Returns floats (NaN where float() failed) and the mask of failed values.
+    """
+    result = pd.Series(np.nan, index=text.index, dtype=float)
+    failed = pd.Series(False, index=text.index)
+    fast = text.str.fullmatch(NUMBER_PATTERN).astype(bool)
+    if fast.any():
+        result[fast] = text[fast].astype(float)
+    for index, value in text[~fast].items():
+        try:
+            result[index] = float(value)
+        except (ValueError, TypeError):
+            failed[index] = True
+    return result, failed
+
+def clean_cpf_cnpj_column(series):
+    """Column-wise clean_cpf_cnpj: cleaned values or '00000000000', plus error reasons."""
+    values, errors = empty_result(series, '00000000000')
+    text, missing = column_as_text(series)
+    errors[missing] = Reason(ReasonCode.MISSING, field='CPF/CNPJ')
+
+    cleaned = text[~missing].str.replace(NON_DIGITS, '', regex=True)
+    length = cleaned.str.len()
+    errors[cleaned.index[length == 0]] = Reason(ReasonCode.NO_DIGITS, field='CPF/CNPJ')
+
+    # Non-ASCII digits are rare; the scalar function handles them
+    ascii_digits = cleaned.map(str.isascii).astype(bool)
+    for index in cleaned.index[(length > 0) & ~ascii_digits]:
+        values[index], errors[index] = clean_cpf_cnpj(series[index], index)
+
+    for width, label, weights1, weights2 in ((11, 'CPF', CPF_WEIGHTS_1, CPF_WEIGHTS_2),
+                                             (14, 'CNPJ', CNPJ_WEIGHTS_1, CNPJ_WEIGHTS_2)):
+        subset = cleaned[(length == width) & ascii_digits]
+        if subset.empty:
+            continue
+        digits = digit_matrix(subset, width)
+        identical = (digits == digits[:, :1]).all(axis=1)
+        if width == 11:
+            sequential = (digits == (digits[:, :1] + np.arange(11)) % 10).all(axis=1) & ~identical
+        else:
+            sequential = np.zeros(len(subset), dtype=bool)
+        digit1, digit2 = check_digits(digits, weights1, weights2)
+        valid = (digits[:, -2] == digit1) & (digits[:, -1] == digit2) & ~identical & ~sequential
+
+        values[subset.index[valid]] = subset[valid]
+        errors[subset.index[identical]] = Reason(ReasonCode.REPEATED_DIGITS, field=label)
+        errors[subset.index[sequential]] = Reason(ReasonCode.SEQUENTIAL_DIGITS, field=label)
+        bad_checksum = ~valid & ~identical & ~sequential
+        errors[subset.index[bad_checksum]] = [
+            Reason(ReasonCode.BAD_CHECKSUM, f"{first}{second}", provided, field=label)
+            for first, second, provided in zip(digit1[bad_checksum], digit2[bad_checksum], subset[bad_checksum].str[-2:])
+        ]
+
+    bad_length = (length > 0) & (length != 11) & (length != 14) & ascii_digits
+    errors[cleaned.index[bad_length]] = [Reason(ReasonCode.DOCUMENT_LENGTH, digits, field='CPF/CNPJ')
+                                         for digits in length[bad_length].tolist()]
+    return values, errors
+
+def clean_phone_column(series, field_name):
+    """Column-wise clean_phone: '+55' numbers or None, plus error reasons."""
+    values, errors = empty_result(series, None)
+    text, missing = column_as_text(series)
+
+    cleaned = text[~missing].str.replace(NON_DIGITS, '', regex=True)
+    cleaned = cleaned[cleaned.str.len() > 0]
+    country = cleaned.str.startswith('55') & (cleaned.str.len() == 13)
+    cleaned[country] = cleaned[country].str[2:]
+
+    length = cleaned.str.len()
+    mobile = (length == 11) & cleaned.str[2].isin(list('9876'))
+    landline = length == 10
+    valid = mobile | landline
+    values[cleaned.index[valid]] = '+55' + cleaned[valid]
+    errors[cleaned.index[~valid]] = Reason(ReasonCode.PHONE_INVALID, field=field_name)
+    return values, errors
+
+def clean_email_column(series):
+    """Column-wise clean_email: stripped emails or None, plus error reasons."""
+    values, errors = empty_result(series, None)
+    text, missing = column_as_text(series)
+
+    email = text[~missing].str.strip()
+    valid = email.str.match(EMAIL_PATTERN).astype(bool)
+    values[email.index[valid]] = email[valid]
+    errors[email.index[~valid]] = Reason(ReasonCode.EMAIL_INVALID, field='Emails')
+    return values, errors
+
+def clean_cep_column(series):
+    """Column-wise clean_cep: 8-digit CEPs or '00000000', plus error reasons."""
+    values, errors = empty_result(series, '00000000')
+    text, missing = column_as_text(series)
+    errors[missing] = Reason(ReasonCode.MISSING, field='CEP')
+
+    cep = text[~missing].str.replace(NON_DIGITS, '', regex=True)
+    numeric = cep.str.isdigit().astype(bool)
+    errors[cep.index[~numeric]] = Reason(ReasonCode.NOT_NUMERIC, field='CEP')
+
+    cep = cep[numeric]
+    too_long = cep.str.len() > 8
+    errors[cep.index[too_long]] = Reason(ReasonCode.CEP_LENGTH, field='CEP')
+    values[cep.index[~too_long]] = cep[~too_long].str.zfill(8)
+    return values, errors
+
+def normalize_uf_column(series):
+    """Column-wise normalize_uf: 2-letter codes or 'XX', plus error reasons."""
+    values, errors = empty_result(series, 'XX')
+    text, missing = column_as_text(series)
+    errors[missing] = Reason(ReasonCode.MISSING, field='UF')
+
+    # Few distinct values per column, so the memoized lookup runs once per distinct UF
+    code = text[~missing].map(uf_code)
+    valid = code.notna()
+    values[code.index[valid]] = code[valid]
+    errors[code.index[~valid]] = Reason(ReasonCode.INVALID, field='UF')
+    return values, errors
+
+def validate_dia_vencimento_column(series):
+    """Column-wise validate_dia_vencimento: days 1-31 or 1, plus error reasons."""
+    values, errors = empty_result(series, 1)
+    text, missing = column_as_text(series)
+    errors[missing] = Reason(ReasonCode.MISSING, field='Dia de vencimento')
+
+    number, failed = text_to_float(text[~missing].str.strip())
+    # int() rejects NaN and infinity as well
+    failed |= ~np.isfinite(number)
+    errors[number.index[failed]] = Reason(ReasonCode.NOT_A_NUMBER, field='Dia de vencimento')
+
+    dia = np.trunc(number[~failed]).astype(np.int64)
+    in_range = (dia >= 1) & (dia <= 31)
+    values[dia.index[in_range]] = dia[in_range]
+    errors[dia.index[~in_range]] = Reason(ReasonCode.OUT_OF_RANGE, 1, 31, field='Dia de vencimento')
+    return values, errors
+
+def validate_plano_valor_column(series):
+    """Column-wise validate_plano_valor: floats or 0.0, plus error reasons."""
+    values, errors = empty_result(series, 0.0)
+    text, missing = column_as_text(series)
+    errors[missing] = Reason(ReasonCode.MISSING, field='Plano Valor')
+
+    number, failed = text_to_float(text[~missing].str.replace(',', '', regex=False))
+    failed |= ~np.isfinite(number)
+    out_of_range = ~failed & (number.abs() > PLANO_VALOR_MAX)
+    valid = ~failed & ~out_of_range
+    values[number.index[valid]] = number[valid]
+    errors[number.index[failed]] = Reason(ReasonCode.INVALID, field='Plano Valor')
+    errors[number.index[out_of_range]] = Reason(ReasonCode.OUT_OF_RANGE, -PLANO_VALOR_MAX, PLANO_VALOR_MAX,
+                                                field='Plano Valor')
+    return values, errors
+
+def validate_isento_column(series):
+    """Column-wise validate_isento: booleans (False by default), plus error reasons."""
+    values, errors = empty_result(series, False)
+    text, missing = column_as_text(series)
+
+    isento = text[~missing].str.strip().str.lower()
+    values[isento.index[isento.isin(ISENTO_TRUE)]] = True
+    invalid = ~isento.isin(ISENTO_TRUE) & ~isento.isin(ISENTO_FALSE)
+    errors[isento.index[invalid]] = [Reason(ReasonCode.INVALID_VALUE, value, field='Isento') for value in isento[invalid]]
+    return values, errors
+
+def encode_string_column(series, max_length=None):
+    """Column-wise encode_string: stripped text truncated to max_length or None; never an error."""
+    values, errors = empty_result(series, None)
+    text, missing = column_as_text(series)
+    cleaned = text[~missing].str.strip().map(lambda value: clean_text(value, max_length))
+    values[cleaned.index] = cleaned
+    return values, errors
+
+def required_text_column(series, field_name, max_length=None):
+    """encode_string_column for mandatory fields: missing values get an error reason."""
+    values, errors = encode_string_column(series, max_length)
+    errors[values.isna()] = Reason(ReasonCode.MISSING, field=field_name)
+    return values, errors
+
+def convert_excel_date_column(series, field_name):
+    """Column-wise convert_excel_date: dates or None, plus error reasons."""
+    values, errors, paths = convert_excel_dates(series, field_name)
+    logger.debug("Converted column %s: %s Excel serials, %s dates, %s exact formats, %s dateutil, %s missing, %s failed",
+                field_name, paths['excel_serial'], paths['datetime'], paths['exact_format'], paths['dateutil'],
+                paths['missing'], paths['failed'])
+    return values, errors
+
+# Rows per chunk when validate_dataframe runs in worker processes
+VALIDATION_CHUNK_SIZE = 50000
+
+# Fields validated by validate_dataframe, in the order their reasons are reported.
+# Text lengths follow the database columns.
+COLUMN_VALIDATORS = [
+    ('CPF/CNPJ', clean_cpf_cnpj_column),
+    ('Nome/Razão Social', lambda series: required_text_column(series, 'Nome/Razão Social', 255)),
+    ('Nome Fantasia', lambda series: encode_string_column(series, 255)),
+    ('Data Nasc.', lambda series: convert_excel_date_column(series, 'Data Nasc.')),
+    ('Data Cadastro cliente', lambda series: convert_excel_date_column(series, 'Data Cadastro cliente')),
+    ('Celulares', lambda series: clean_phone_column(series, 'Celulares')),
+    ('Telefones', lambda series: clean_phone_column(series, 'Telefones')),
+    ('Emails', clean_email_column),
+    ('Plano', lambda series: required_text_column(series, 'Plano', 255)),
+    ('Status', encode_string_column),
+    ('Endereço', lambda series: required_text_column(series, 'Endereço', 255)),
+    ('Número', lambda series: encode_string_column(series, 15)),
+    ('Bairro', lambda series: encode_string_column(series, 255)),
+    ('Cidade', lambda series: encode_string_column(series, 255)),
+    ('Complemento', lambda series: encode_string_column(series, 500)),
+    ('CEP', clean_cep_column),
+    ('UF', normalize_uf_column),
+    ('Vencimento', validate_dia_vencimento_column),
+    ('Plano Valor', validate_plano_valor_column),
+    ('Isento', validate_isento_column),
+]
+
+def validate_dataframe(df, workers=1):
+    """
+    Validate every known column of a DataFrame at once.
+    Returns (cleaned, errors): DataFrames with one column per validated field,
+    errors holding the reason for each rejected value or None.
+    With workers > 1, chunks of VALIDATION_CHUNK_SIZE rows are validated in parallel
+    and merged back in their original order.
+    """
+    if workers > 1 and len(df) > VALIDATION_CHUNK_SIZE:
+        chunks = (df.iloc[start:start + VALIDATION_CHUNK_SIZE] for start in range(0, len(df), VALIDATION_CHUNK_SIZE))
+        results = list(map_in_order(validate_dataframe, chunks, workers))
+        return pd.concat([cleaned for cleaned, errors in results]), pd.concat([errors for cleaned, errors in results])
+
+    cleaned = pd.DataFrame(index=df.index)
+    errors = pd.DataFrame(index=df.index)
+    for column, validator in COLUMN_VALIDATORS:
+        if column not in df.columns:
+            continue
+        cleaned[column], errors[column] = validator(df[column].astype(object))
+        logger.debug("Validated column %s: %s rows, %s errors", column, len(df), errors[column].notna().sum())
+    return cleaned, errors
+
+def combine_error_reasons(errors):
+    """
+    Collect the error reasons of each row, in column order, as a tuple of reasons.Reason;
+    rows without errors get None. Messages are only rendered when a report is written.
+    """
+    combined = np.full(len(errors), None, dtype=object)
+    reasons = errors.to_numpy(dtype=object)
+    has_reason = errors.notna().to_numpy()
+    for position in np.flatnonzero(has_reason.any(axis=1)):
+        combined[position] = tuple(reasons[position][has_reason[position]])
+    return pd.Series(combined, index=errors.index)
+
 def run_tests():
     """Run tests for all validation functions and export results to Excel."""
     print("Starting validation tests...\n")
 
     # Sample test data
     test_data = [
-        {'CPF/CNPJ': '123.456.789-09', 'Data Nasc.': 44562, 'Celulares': '11987654321', 'Emails': 'test@example.com', 'CEP': '12345678', 'UF': 'São Paulo', 'Vencimento': 15, 'Plano Valor': '100.50', 'Isento': 'Sim'},  # Invalid CPF
+        {'CPF/CNPJ': '123.456.789-00', 'Data Nasc.': 44562, 'Celulares': '11987654321', 'Emails': 'test@example.com', 'CEP': '12345678', 'UF': 'São Paulo', 'Vencimento': 15, 'Plano Valor': '100.50', 'Isento': 'Sim'},  # Invalid CPF
         {'CPF/CNPJ': '529.982.247-25', 'Data Nasc.': '01/01/2022', 'Celulares': '+5511987654321', 'Emails': '  test@example.com  ', 'CEP': '12345', 'UF': 'SP', 'Vencimento': '15', 'Plano Valor': '1,234.56', 'Isento': '1'},  # Valid
         {'CPF/CNPJ': '12.345.678/0001-95', 'Data Nasc.': '2022-01-01', 'Celulares': '1133334444', 'Emails': 'invalid-email', 'CEP': '12345-678', 'UF': 'ZZ', 'Vencimento': 'invalid', 'Plano Valor': 'invalid', 'Isento': 'No'},  # Mixed errors
         {'CPF/CNPJ': None, 'Data Nasc.': 'invalid', 'Celulares': '12345', 'Emails': None, 'CEP': 'abc', 'UF': None, 'Vencimento': 32, 'Plano Valor': None, 'Isento': 'maybe'},  # Multiple missing/invalid
     ]
     
     df = pd.DataFrame(test_data)
-    errors_list = []
-    success_list = []
-    total_erros = 0
-
-    # Process each row
-    for index, row in df.iterrows():
-        error_row = row.copy()
-        error_reasons = []
-        is_valid = True
-
-        # Test clean_cpf_cnpj
-        cpf_cnpj, cpf_error = clean_cpf_cnpj(row['CPF/CNPJ'], index)
-        if cpf_error:
-            error_reasons.append(cpf_error)
-            is_valid = False
-
-        # Test convert_excel_date
-        data_nasc, date_error = convert_excel_date(row['Data Nasc.'], index, 'Data Nasc.')
-        if date_error:
-            error_reasons.append(date_error)
-            is_valid = False
-
-        # Test clean_phone
-        celular, phone_error = clean_phone(row['Celulares'], index, 'Celulares')
-        if phone_error:
-            error_reasons.append(phone_error)
-            is_valid = False
-
-        # Test clean_email
-        email, email_error = clean_email(row['Emails'], index)
-        if email_error:
-            error_reasons.append(email_error)
-            is_valid = False
-
-        # Test clean_cep
-        cep, cep_error = clean_cep(row['CEP'], index)
-        if cep_error:
-            error_reasons.append(cep_error)
-            is_valid = False
-
-        # Test normalize_uf
-        uf, uf_error = normalize_uf(row['UF'], index)
-        if uf_error:
-            error_reasons.append(uf_error)
-            is_valid = False
-
-        # Test validate_dia_vencimento
-        vencimento, vencimento_error = validate_dia_vencimento(row['Vencimento'], index)
-        if vencimento_error:
-            error_reasons.append(vencimento_error)
-            is_valid = False
-
-        # Test validate_plano_valor
-        plano_valor, valor_error = validate_plano_valor(row['Plano Valor'], index)
-        if valor_error:
-            error_reasons.append(valor_error)
-            is_valid = False
-
-        # Test validate_isento
-        isento, isento_error = validate_isento(row['Isento'], index)
-        if isento_error:
-            error_reasons.append(isento_error)
-            is_valid = False
-
-        # Log results
-        if is_valid:
-            success_row = row.copy()
-            success_row['Motivo do Erro'] = ''
-            success_list.append(success_row)
-            logger.info(f"Row {index + 1}: All validations passed")
-        else:
-            error_row['Motivo do Erro'] = "; ".join(error_reasons)
-            errors_list.append(error_row)
-            total_erros += 1
-            logger.warning(f"Row {index + 1}: Validation errors: {error_row['Motivo do Erro']}")
-
-    # Save reports to Excel
-    columns = df.columns.tolist() + ['Motivo do Erro']
-    errors_df = pd.DataFrame(errors_list, columns=columns) if errors_list else pd.DataFrame(columns=columns)
-    success_df = pd.DataFrame(success_list, columns=columns) if success_list else pd.DataFrame(columns=columns)
-
-    # Save errors report
-    if not errors_df.empty:
-        errors_header = pd.DataFrame([columns], columns=columns)
-        errors_final_df = pd.concat([errors_header, errors_df], ignore_index=True)
-        errors_final_df.to_excel(ERRORS_FILE, index=False)
-        logger.info(f"Errors report saved to '{ERRORS_FILE}'")
-
-    # Save success report
-    if not success_df.empty:
-        success_title = pd.DataFrame([['Registros Válidos'] + [''] * (len(columns) - 1)], columns=columns)
-        success_header = pd.DataFrame([columns], columns=columns)
-        success_final_df = pd.concat([success_title, success_header, success_df], ignore_index=True)
-        success_final_df.to_excel(SUCCESS_FILE, index=False)
-        logger.info(f"Success report saved to '{SUCCESS_FILE}'")
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    errors_report = ReportWriter(ERRORS_FILE, df.columns)
+    success_report = ReportWriter(SUCCESS_FILE, df.columns, title='Registros Válidos')
+
+    # Validate all columns at once
+    cleaned, errors = validate_dataframe(df)
+    motivos = combine_error_reasons(errors)
+
+    # Write each row to its report
+    with errors_report, success_report:
+        for index, row in df.iterrows():
+            if motivos[index] is None:
+                success_report.write(row)
+                logger.debug("Row %s: All validations passed", index + 1)
+            else:
+                errors_report.write(row, motivos[index])
+                logger.warning("Row %s: Validation errors: %s", index + 1, render(motivos[index]))
 
     # Log final metrics
-    logger.info(f"Total de registros processados: {len(df)}")
-    logger.info(f"Total de registros válidos: {len(success_list)}")
-    logger.info(f"Total de erros: {total_erros}")
+    logger.info("Total de registros processados: %s", len(df))
+    logger.info("Total de registros válidos: %s", success_report.count)
+    logger.info("Total de erros: %s", errors_report.count)
 
-    print(f"\nTests completed. Check data_validation.log for detailed logs.")
-    print(f"Errors report saved to: {ERRORS_FILE}")
-    print(f"Success report saved to: {SUCCESS_FILE}")
+    print("\nTests completed. Check data_validation.log for detailed logs.")
+    print(f"Errors report saved to: {errors_report.path}")
+    print(f"Success report saved to: {success_report.path}")
 
 if __name__ == "__main__":
+    setup_logging('data_validation.log')
     run_tests()
\ No newline at end of file
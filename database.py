@@ -0,0 +1,173 @@
+import logging
+import os
+import re
+import time
+from contextlib import contextmanager
+import psycopg2
+import psycopg2.pool
+from metrics import TimedConnection
+
+logger = logging.getLogger(__name__)
+
+# Database connection parameters; each one can be overridden by its environment variable.
+# The password has no default: without TSMX_DB_PASSWORD (None), libpq takes it from PGPASSWORD
+# or the password file (~/.pgpass, or PGPASSFILE), see password_configured
+DB_PARAMS = {
+    'dbname': os.environ.get('TSMX_DB_NAME', 'tsmx_db'),
+    'user': os.environ.get('TSMX_DB_USER', 'postgres'),
+    'password': os.environ.get('TSMX_DB_PASSWORD') or None,
+    'host': os.environ.get('TSMX_DB_HOST', 'localhost'),
+    'port': os.environ.get('TSMX_DB_PORT', '5432')
+}
+
+# Connections in the pool; 0 = as many as the run needs (see import_data.connections_needed)
+DB_POOL_SIZE = int(os.environ.get('TSMX_DB_POOL_SIZE', '0'))
+
+# Session settings of import connections, sent at connect time. synchronous_commit=off does not
+# wait for the WAL flush on commit: a server crash can lose the last commits, but rows and their
+# checkpoint hashes go together, so a rerun imports them again. An empty value leaves a setting alone.
+SESSION_SETTINGS = {
+    'synchronous_commit': os.environ.get('TSMX_SYNCHRONOUS_COMMIT', 'off'),
+    'work_mem': os.environ.get('TSMX_WORK_MEM', '64MB'),
+    'statement_timeout': os.environ.get('TSMX_STATEMENT_TIMEOUT', '10min')
+}
+
+# Attempts to get a working connection, and the wait before the first retry (doubled on each one)
+RECONNECT_ATTEMPTS = 5
+RECONNECT_DELAY = 0.5
+
+# Connections a loader replaces after losing them before it gives up
+MAX_RECONNECTS = 3
+
+PLACEHOLDER = re.compile(r'%s')
+
+def session_options(settings):
+    """libpq 'options' string setting each non-empty session setting."""
+    options = []
+    for name, value in settings.items():
+        if value:
+            value = str(value).replace(' ', '\\ ')
+            options.append(f"-c {name}={value}")
+    return ' '.join(options)
+
+def password_file():
+    """Path of libpq's password file: PGPASSFILE, or ~/.pgpass (%APPDATA%\\postgresql\\pgpass.conf on Windows)."""
+    if os.environ.get('PGPASSFILE'):
+        return os.environ['PGPASSFILE']
+    if os.name == 'nt':
+        return os.path.join(os.environ.get('APPDATA', ''), 'postgresql', 'pgpass.conf')
+    return os.path.expanduser('~/.pgpass')
+
+def password_configured(params):
+    """Whether a connection with params has a password to send: its own, PGPASSWORD or libpq's password file."""
+    return bool(params.get('password') or os.environ.get('PGPASSWORD') or os.path.isfile(password_file()))
+
+def broken(conn):
+    """Whether a psycopg2 connection was closed or lost."""
+    return conn.closed != 0
+
+def numbered_params(sql):
+    """Turn the %s placeholders of a statement into PREPARE's $1, $2, ... in order."""
+    numbers = iter(range(1, sql.count('%s') + 1))
+    return PLACEHOLDER.sub(lambda match: f"${next(numbers)}", sql)
+
+def execute_statement(cursor, statements, name, params):
+    """
+    Run statements[name] with params: EXECUTE it by name when the cursor's connection has
+    prepared it (see ConnectionManager), otherwise send its SQL text.
+    """
+    if name in getattr(cursor.connection, 'prepared_statements', ()):
+        cursor.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+    else:
+        cursor.execute(statements[name], params)
+
+class ConnectionManager:
+    """
+    Pool of import connections (psycopg2.pool.ThreadedConnectionPool of TimedConnection) shared by
+    the loaders, the lookup stage and the checkpoint. The size connections are opened up front with
+    the session settings, checked with a round trip when taken from the pool and replaced, with
+    retries, when they no longer answer. Broken connections given back are closed instead of pooled.
+    statements (name -> SQL with %s placeholders) are PREPAREd on each connection the first
+    time it is taken, and again on the ones that replace lost connections.
+    """
+
+    def __init__(self, params, size, settings=None, metrics=None, statements=None):
+        self.params = dict(params)
+        self.settings = {name: value for name, value in (settings or {}).items() if value}
+        self.metrics = metrics
+        self.statements = dict(statements or {})
+        self.size = size
+        options = session_options(self.settings)
+        if options:
+            self.params['options'] = options
+        self.pool = psycopg2.pool.ThreadedConnectionPool(size, size, connection_factory=TimedConnection, **self.params)
+        if self.settings:
+            logger.info("Sessões de importação com %s", ', '.join(f"{name}={value}" for name, value in self.settings.items()))
+
+    def getconn(self, autocommit=False):
+        """Take a connection that answers from the pool, reconnecting with a growing delay if needed."""
+        delay = RECONNECT_DELAY
+        for attempt in range(1, RECONNECT_ATTEMPTS + 1):
+            conn = None
+            try:
+                conn = self.pool.getconn()
+                conn.initialize(self.metrics)
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                    if self.statements and not getattr(conn, 'prepared_statements', None):
+                        self.prepare(cursor)
+                conn.autocommit = autocommit
+                return conn
+            except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+                if conn is not None:
+                    self.pool.putconn(conn, close=True)
+                if attempt == RECONNECT_ATTEMPTS:
+                    raise
+                logger.warning("Conexão com o banco indisponível (tentativa %s de %s): %s",
+                               attempt, RECONNECT_ATTEMPTS, str(e).strip())
+                time.sleep(delay)
+                delay *= 2
+
+    def prepare(self, cursor):
+        """PREPARE the statements on the cursor's connection; they last as long as its session."""
+        for name, sql in self.statements.items():
+            cursor.execute(f"PREPARE {name} AS {numbered_params(sql)}")
+        cursor.connection.prepared_statements = frozenset(self.statements)
+
+    def putconn(self, conn):
+        """Give a connection back to the pool; a broken one is closed."""
+        self.pool.putconn(conn, close=broken(conn))
+
+    def reconnect(self, conn, autocommit=False):
+        """Drop a lost connection and take a working one in its place."""
+        logger.warning("Conexão com o banco perdida; reconectando")
+        self.pool.putconn(conn, close=True)
+        return self.getconn(autocommit)
+
+    @contextmanager
+    def connection(self, autocommit=False):
+        """Borrow a connection for a with block."""
+        conn = self.getconn(autocommit)
+        try:
+            yield conn
+        finally:
+            self.putconn(conn)
+
+    def call(self, func):
+        """
+        Run func(cursor) on an autocommit connection and return its result. If the connection
+        is lost on the way, func runs once more on a new one, so it must be safe to repeat.
+        """
+        for attempt in range(2):
+            with self.connection(autocommit=True) as conn:
+                try:
+                    with conn.cursor() as cursor:
+                        return func(cursor)
+                except psycopg2.Error:
+                    if attempt or not broken(conn):
+                        raise
+                    logger.warning("Conexão com o banco perdida; repetindo a consulta em outra conexão")
+
+    def closeall(self):
+        self.pool.closeall()
@@ -0,0 +1,137 @@
+import logging
+from operator import attrgetter
+
+logger = logging.getLogger(__name__)
+
+# How the client of a repeated CPF/CNPJ is chosen: its first row, its last row (what the
+# row-by-row upsert always did), or the row with the most filled client fields (ties go to the later row)
+MERGE_POLICIES = ('first', 'last', 'complete')
+
+# Loader record keys written to tbl_clientes
+CLIENT_FIELDS = ['cpf_cnpj', 'nome_razao_social', 'nome_fantasia', 'data_nascimento', 'data_cadastro']
+client_values = attrgetter(*CLIENT_FIELDS)
+
+# Documents whose merge state (a 4-tuple, about 250 bytes each with its key) is kept for the
+# rest of the run, so about 250 MB at most. Documents first seen after that are not tracked:
+# each of their groups upserts the client (ON CONFLICT), like the 'last' policy, and their
+# repeats in later chunks are not reported
+MERGE_TRACKED_DOCUMENTS = 1000000
+
+# Column of the duplicates report explaining where each repeated row went
+DUPLICATE_NOTE_COLUMN = 'Observação'
+
+def completeness(record):
+    """Number of filled client fields of a record."""
+    return sum(value is not None and value != '' for value in client_values(record))
+
+def prefer(policy, score, best_score):
+    """Whether a later row with completeness score replaces the current choice under policy."""
+    if policy == 'first':
+        return False
+    if policy == 'last':
+        return True
+    return score >= best_score
+
+def merged_client(items, policy, contact_types):
+    """
+    Client of prepared rows sharing one CPF/CNPJ: the client fields of the row chosen by policy,
+    plus 'source_row', its 'completeness', the 'policy' and the rows' contacts without repeats,
+    as (label, contato) in row order. contact_types holds (label, record key) pairs.
+    """
+    best = items[0]
+    best_score = completeness(best[2])
+    for item in items[1:]:
+        score = completeness(item[2])
+        if prefer(policy, score, best_score):
+            best, best_score = item, score
+
+    contacts = []
+    found = set()
+    for index, row, record in items:
+        for label, key in contact_types:
+            contato = getattr(record, key)
+            if contato and (label, contato) not in found:
+                found.add((label, contato))
+                contacts.append((label, contato))
+
+    client = dict(zip(CLIENT_FIELDS, client_values(best[2])))
+    client.update(source_row=best[0], completeness=best_score, policy=policy, contacts=contacts)
+    return client
+
+class ClientMerger:
+    """
+    Group the prepared rows of each chunk by cleaned CPF/CNPJ before they reach the database,
+    so each document gets one client upsert and one deduplicated set of contacts per chunk.
+    Every row keeps its own contract. The client written for a group is chosen by policy;
+    documents already written by an earlier chunk of the run are only updated again when the
+    new group wins under the same policy, so the policy holds for the whole file, up to
+    MERGE_TRACKED_DOCUMENTS documents. Each repeated row is written to the duplicates report,
+    if one is given.
+    """
+
+    def __init__(self, policy='last', contact_types=(), duplicates_report=None):
+        if policy not in MERGE_POLICIES:
+            raise ValueError(f"Unknown merge policy: {policy}")
+        self.policy = policy
+        self.contact_types = list(contact_types)
+        self.duplicates_report = duplicates_report
+        self.duplicate_rows = 0
+        self.duplicate_clients = 0
+        # cpf_cnpj -> (first row, row the client was taken from, its completeness, rows seen)
+        self._seen = {}
+        self._untracked = 0
+
+    def group(self, prepared_chunks):
+        """Turn each (chunk, prepared) into (chunk, groups) with groups as (client, items) in first-row order."""
+        for chunk, prepared in prepared_chunks:
+            by_document = {}
+            for item in prepared:
+                by_document.setdefault(item[2].cpf_cnpj, []).append(item)
+            yield chunk, [self.merge(cpf_cnpj, items) for cpf_cnpj, items in by_document.items()]
+
+    def merge(self, cpf_cnpj, items):
+        """
+        Merge one document's rows of a chunk into (client, items), see merged_client. The client's
+        'update' is False when an earlier chunk's choice still wins, so the client is only looked up.
+        """
+        client = merged_client(items, self.policy, self.contact_types)
+        seen = self._seen.get(cpf_cnpj)
+        if seen is None:
+            first_row, source_row, best_score, rows_seen = items[0][0], client['source_row'], client['completeness'], 0
+            client['update'] = True
+        else:
+            first_row, source_row, best_score, rows_seen = seen
+            client['update'] = prefer(self.policy, client['completeness'], best_score)
+            if client['update']:
+                source_row, best_score = client['source_row'], client['completeness']
+        repeated = items if rows_seen else items[1:]
+        if rows_seen <= 1 and rows_seen + len(items) > 1:
+            self.duplicate_clients += 1
+        self.track(cpf_cnpj, (first_row, source_row, best_score, rows_seen + len(items)))
+
+        for index, row, record in repeated:
+            self.duplicate_rows += 1
+            logger.debug("Row %s: CPF/CNPJ %s repeated from row %s", index + 1, cpf_cnpj, first_row + 1)
+            if self.duplicates_report is not None:
+                self.duplicates_report.write(row, f"CPF/CNPJ {cpf_cnpj} repetido (primeira ocorrência na linha {first_row + 1}); "
+                                                  f"dados do cliente da linha {source_row + 1} (política {self.policy})")
+        return client, items
+
+    def track(self, cpf_cnpj, state):
+        """Keep a document's merge state for later chunks, unless MERGE_TRACKED_DOCUMENTS are kept already."""
+        if cpf_cnpj in self._seen or len(self._seen) < MERGE_TRACKED_DOCUMENTS:
+            self._seen[cpf_cnpj] = state
+            return
+        if not self._untracked:
+            logger.warning("Mais de %s CPF/CNPJ distintos: os próximos não são acompanhados entre blocos "
+                           "(cada bloco atualiza o cliente, e repetições em outros blocos não são listadas)",
+                           MERGE_TRACKED_DOCUMENTS)
+        self._untracked += 1
+
+    def log_summary(self):
+        """Log how many rows repeated a CPF/CNPJ and how many documents they belong to."""
+        logger.info("Linhas com CPF/CNPJ repetido: %s, em %s clientes (política de mesclagem: %s)",
+                    self.duplicate_rows, self.duplicate_clients, self.policy)
+        if self._untracked:
+            logger.info("Grupos de CPF/CNPJ não acompanhados entre blocos (limite de %s): %s",
+                        MERGE_TRACKED_DOCUMENTS, self._untracked)
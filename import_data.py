@@ -1,31 +1,26 @@
-import pandas as pd
-import psycopg2
-from datetime import datetime
-import re
 import os
 import sys
+import argparse
+import hashlib
 import logging
-import psycopg2.extras
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('import_data.log'),
-        logging.StreamHandler()
-    ]
-)
-logger = logging.getLogger(__name__)
+from collections import Counter, deque
+from input_reader import open_batches, READ_BATCH_SIZE
+from parallel import map_in_order
+from logging_setup import setup_logging
+from normalizers import cache_stats
+from pipeline import validate_chunk, RECORD_COLUMNS
+from metrics import RunMetrics, write_json, write_prometheus, profiled
+from database import ConnectionManager, DB_PARAMS, DB_POOL_SIZE, SESSION_SETTINGS, numbered_params, password_configured
+from input_cache import InputCache, cache_available, file_sha256
+from reports import ReportWriter, REPORT_FORMATS, write_reason_summary
+from reasons import Reason, ReasonCode, LANGUAGES
+from dedup import ClientMerger, MERGE_POLICIES, DUPLICATE_NOTE_COLUMN
+from loaders import (import_rows, parallel_import, async_import, async_available, bulk_import, new_stats,
+                     add_error, add_success, without_row, staged_values, CONTACT_TYPES, HOT_STATEMENTS, BATCH_SIZE)
 
-# Database connection parameters
-DB_PARAMS = {
-    'dbname': 'tsmx_db',
-    'user': 'postgres',
-    'password': '1234',
-    'host': 'localhost',
-    'port': '5432'
-}
+# Logging is configured when the import starts; per-row messages need --trace (or TSMX_TRACE=1)
+LOG_FILE = 'import_data.log'
+logger = logging.getLogger(__name__)
 
 # File path for the Excel file
 EXCEL_FILE_PATH = 'dados_importacao.xlsx'
@@ -34,6 +29,8 @@ EXCEL_FILE_PATH = 'dados_importacao.xlsx'
 OUTPUT_DIR = "C:/Users/Aisla/Downloads"
 TOTAL_REGISTROS_FILE = os.path.join(OUTPUT_DIR, "import_totalregistros.xlsx")
 ERRORS_FILE = os.path.join(OUTPUT_DIR, "import_erros.xlsx")
+DUPLICATES_FILE = os.path.join(OUTPUT_DIR, "import_duplicados.xlsx")
+REASONS_FILE = os.path.join(OUTPUT_DIR, "import_motivos.xlsx")
 
 # Expected columns in the Excel file
 EXPECTED_COLUMNS = [
@@ -42,387 +39,563 @@ EXPECTED_COLUMNS = [
     'Endereço', 'Número', 'Bairro', 'Cidade', 'Complemento', 'CEP', 'UF', 'Status'
 ]
 
-# Mapeamento de UFs
-UF_MAPPING = {
-    'ACRE': 'AC', 'ALAGOAS': 'AL', 'AMAPÁ': 'AP', 'AMAZONAS': 'AM', 'BAHIA': 'BA',
-    'CEARÁ': 'CE', 'DISTRITO FEDERAL': 'DF', 'ESPÍRITO SANTO': 'ES', 'GOIÁS': 'GO',
-    'MARANHÃO': 'MA', 'MATO GROSSO': 'MT', 'MATO GROSSO DO SUL': 'MS', 'MINAS GERAIS': 'MG',
-    'PARÁ': 'PA', 'PARAÍBA': 'PB', 'PARANÁ': 'PR', 'PERNAMBUCO': 'PE', 'PIAUÍ': 'PI',
-    'RIO DE JANEIRO': 'RJ', 'RIO GRANDE DO NORTE': 'RN', 'RIO GRANDE DO SUL': 'RS',
-    'RONDÔNIA': 'RO', 'RORAIMA': 'RR', 'SANTA CATARINA': 'SC', 'SÃO PAULO': 'SP',
-    'SERGIPE': 'SE', 'TOCANTINS': 'TO'
-}
-
-# Helper functions
-def clean_cpf_cnpj(value):
-    """Clean CPF/CNPJ by removing non-numeric characters."""
-    if pd.isna(value):
-        return None
-    return re.sub(r'[^\d]', '', str(value))
-
-def convert_excel_date(excel_date):
-    """Convert Excel numeric date to Python date."""
-    if pd.isna(excel_date) or not isinstance(excel_date, (int, float)):
-        return None
-    try:
-        return (datetime(1899, 12, 30) + pd.Timedelta(days=excel_date)).date()
-    except Exception as e:
-        logger.warning(f"Failed to convert Excel date {excel_date}: {e}")
-        return None
-
-def clean_phone(phone):
-    """Clean phone number by removing non-numeric characters."""
-    if pd.isna(phone):
-        return None
-    cleaned = re.sub(r'[^\d]', '', str(phone))
-    if len(cleaned) < 10:
-        logger.warning(f"Invalid phone number (less than 10 digits): {cleaned}")
-        return None
-    return cleaned
-
-def clean_cep(cep, row_index):
-    """Clean and normalize CEP to 8 digits."""
-    if pd.isna(cep):
-        logger.warning(f"Row {row_index + 1}: CEP missing")
-        return None
-    cep = re.sub(r'[^\d]', '', str(cep))
-    if len(cep) != 8:
-        if len(cep) < 8:
-            cep = cep.zfill(8)
-            logger.info(f"Row {row_index + 1}: Fixed CEP by padding: {cep}")
-        else:
-            logger.warning(f"Row {row_index + 1}: Invalid CEP (too long): {cep}")
-            return None
-    return cep
-
-def encode_string(value, max_length=None):
-    """Encode string to UTF-8, truncate if necessary, and handle encoding errors."""
-    if pd.isna(value) or value is None:
-        return None
-    try:
-        value_str = str(value).encode('utf-8', errors='replace').decode('utf-8')
-        if max_length and len(value_str) > max_length:
-            value_str = value_str[:max_length]
-        return value_str
-    except Exception as e:
-        logger.warning(f"Encoding error for value '{value}': {e}")
-        return None
-
-def normalize_uf(uf, row_index):
-    """Normalize UF to 2-letter code."""
-    if pd.isna(uf):
-        logger.warning(f"Row {row_index + 1}: UF missing")
-        return None
-    uf = str(uf).strip().upper()
-    if len(uf) == 2 and uf in UF_MAPPING.values():
-        return uf
-    if uf in UF_MAPPING:
-        return UF_MAPPING[uf]
-    logger.warning(f"Row {row_index + 1}: Invalid UF: {uf}")
-    return None
-
-def validate_dia_vencimento(dia, row_index):
-    """Validate day of payment (1-31)."""
-    if pd.isna(dia):
-        logger.warning(f"Row {row_index + 1}: Dia de vencimento missing")
-        return None
-    try:
-        dia = int(dia)
-        if dia < 1 or dia > 31:
-            logger.warning(f"Row {row_index + 1}: Invalid dia de vencimento (1-31): {dia}")
-            return None
-        return dia
-    except ValueError:
-        logger.warning(f"Row {row_index + 1}: Dia de vencimento is not a number: {dia}")
-        return None
-
-def get_or_create_plano(cursor, descricao, valor):
-    """Get or create plano ID."""
-    try:
-        descricao = encode_string(descricao, 255)
-        cursor.execute("SELECT id FROM tbl_planos WHERE descricao = %s", (descricao,))
-        result = cursor.fetchone()
-        if result:
-            return result[0]
-        
-        cursor.execute(
-            "INSERT INTO tbl_planos (descricao, valor) VALUES (%s, %s) RETURNING id",
-            (descricao, float(valor))
-        )
-        return cursor.fetchone()[0]
-    except Exception as e:
-        logger.error(f"Error in get_or_create_plano for {descricao}: {e}")
-        raise
+# tbl_status_contrato status given to contracts of rows without one
+DEFAULT_STATUS = 'Velocidade Reduzida'
 
-def get_status_id(cursor, status):
-    """Get status ID from status name."""
-    try:
-        status = encode_string(status)
-        cursor.execute("SELECT id FROM tbl_status_contrato WHERE status = %s", (status,))
-        result = cursor.fetchone()
-        return result[0] if result else 2  # Default to 'Velocidade Reduzida'
-    except Exception as e:
-        logger.error(f"Error in get_status_id for {status}: {e}")
-        raise
+# Bulk mode: rows staged and resolved per transaction
+BULK_CHUNK_SIZE = 50000
+
+# Checkpoint tables: one row per run and one hash per committed source row. A run is keyed by
+# the absolute path and SHA-256 of its source file; columns added after the first release are
+# added to existing tables too
+CHECKPOINT_DDL = """
+    CREATE TABLE IF NOT EXISTS tbl_importacoes (
+        id serial PRIMARY KEY,
+        arquivo varchar(500) NOT NULL,
+        caminho varchar(1000),
+        hash_arquivo char(64),
+        iniciada_em timestamp NOT NULL DEFAULT now(),
+        concluida_em timestamp
+    );
+    ALTER TABLE tbl_importacoes
+        ADD COLUMN IF NOT EXISTS caminho varchar(1000),
+        ADD COLUMN IF NOT EXISTS hash_arquivo char(64);
+    CREATE TABLE IF NOT EXISTS tbl_importacao_linhas (
+        hash_linha bytea PRIMARY KEY,
+        importacao_id integer NOT NULL REFERENCES tbl_importacoes (id) ON DELETE CASCADE
+    );
+    CREATE INDEX IF NOT EXISTS tbl_importacao_linhas_importacao_id_idx ON tbl_importacao_linhas (importacao_id);
+"""
+
+# Advisory lock class of import runs: a run holds (CHECKPOINT_LOCK, its id) on the connection that
+# registered it until the pool is closed, so an unfinished run whose lock is free was interrupted
+# and one whose lock is taken is still going
+CHECKPOINT_LOCK = 7317
+
+# Stores the checkpoint hashes of a batch of rows with their run, as one array parameter. A hash
+# already stored (a --reprocess run, or the same content in another file) moves to the run that
+# committed the row last, so each run's rows are the ones it committed
+CHECKPOINT_RECORD_SQL = """
+    INSERT INTO tbl_importacao_linhas (hash_linha, importacao_id)
+    SELECT unnest(%s::bytea[]), %s
+    ON CONFLICT (hash_linha) DO UPDATE SET importacao_id = EXCLUDED.importacao_id
+"""
+
+# Maps the new labels of a chunk to IDs in one round trip: plans missing from tbl_planos are
+# created by the same statement, statuses and contact types are only looked up
+LOOKUP_SQL = """
+    WITH planos AS (
+        SELECT descricao, valor FROM unnest(%(planos)s::varchar[], %(valores)s::numeric[]) AS p(descricao, valor)
+    ), criados AS (
+        INSERT INTO tbl_planos (descricao, valor)
+        SELECT descricao, valor FROM planos
+        ON CONFLICT (descricao) DO NOTHING
+        RETURNING descricao, id
+    )
+    SELECT 'plano', descricao, id FROM criados
+    UNION ALL
+    SELECT 'plano', p.descricao, p.id FROM tbl_planos p JOIN planos USING (descricao)
+    UNION ALL
+    SELECT 'status', s.status, s.id
+    FROM tbl_status_contrato s JOIN unnest(%(status)s::varchar[]) AS u(status) USING (status)
+    UNION ALL
+    SELECT 'tipo', t.tipo_contato, t.id
+    FROM tbl_tipos_contato t JOIN unnest(%(tipos)s::varchar[]) AS u(tipo_contato) USING (tipo_contato)
+"""
+
+class LookupCache:
+    """
+    In-memory cache of tbl_planos, tbl_status_contrato and tbl_tipos_contato IDs by label.
+    resolve() maps the labels of a chunk the cache has not seen with a single LOOKUP_SQL query.
+    Unknown statuses and contact types are cached as None, so they are only looked up once.
+    Plans are created on an autocommit connection (ConnectionManager.call), so they never depend
+    on a batch being committed.
+    """
+
+    def __init__(self):
+        self.planos = {}
+        self.status = {}
+        self.tipos_contato = {}
+        self.hits = 0
+        self.misses = 0
+        self.queries = 0
+
+    def load(self, cursor):
+        """Preload every plan, status and contact type in a single query."""
+        cursor.execute("""
+            SELECT 'plano', descricao, id FROM tbl_planos
+            UNION ALL
+            SELECT 'status', status, id FROM tbl_status_contrato
+            UNION ALL
+            SELECT 'tipo', tipo_contato, id FROM tbl_tipos_contato
+        """)
+        self.store(cursor.fetchall())
+        logger.info("Lookup cache loaded %s plans, %s statuses and %s contact types",
+                    len(self.planos), len(self.status), len(self.tipos_contato))
+
+    def store(self, rows):
+        """Cache (table, label, id) rows of the lookup queries."""
+        tables = {'plano': self.planos, 'status': self.status, 'tipo': self.tipos_contato}
+        for table, label, lookup_id in rows:
+            tables[table][label] = lookup_id
+
+    def query(self, cursor, planos, statuses=(), tipos=()):
+        """Run LOOKUP_SQL for the given labels and cache what it finds."""
+        cursor.execute(LOOKUP_SQL, {'planos': list(planos), 'valores': [float(valor) for valor in planos.values()],
+                                    'status': list(statuses), 'tipos': list(tipos)})
+        self.queries += 1
+        self.store(cursor.fetchall())
+
+    def resolve(self, cursor, planos=None, statuses=(), tipos=()):
+        """
+        Make sure every label is cached: planos maps plan descriptions to the value a new plan
+        gets, statuses and tipos are status and contact type labels. Only labels not cached yet
+        are sent to the database, all in one statement.
+        """
+        planos = planos or {}
+        statuses, tipos = set(statuses), set(tipos)
+        requested = len(planos) + len(statuses) + len(tipos)
+        planos = {descricao: valor for descricao, valor in planos.items() if descricao not in self.planos}
+        statuses = [status for status in statuses if status not in self.status]
+        tipos = [tipo for tipo in tipos if tipo not in self.tipos_contato]
+        missing = len(planos) + len(statuses) + len(tipos)
+        self.hits += requested - missing
+        self.misses += missing
+        if not missing:
+            return
+
+        self.query(cursor, planos, statuses, tipos)
+        # A plan created by a concurrent import after the statement started is found on a second try
+        planos = {descricao: valor for descricao, valor in planos.items() if descricao not in self.planos}
+        if planos:
+            self.query(cursor, planos)
+            if any(descricao not in self.planos for descricao in planos):
+                raise RuntimeError(f"Planos não resolvidos: {', '.join(planos)}")
+
+        for status in statuses:
+            if status not in self.status:
+                logger.warning("Status '%s' não existe em tbl_status_contrato; as linhas com ele serão rejeitadas", status)
+                self.status[status] = None
+        for tipo in tipos:
+            if tipo not in self.tipos_contato:
+                logger.error("Tipo de contato '%s' não existe em tbl_tipos_contato; esses contatos não serão importados", tipo)
+                self.tipos_contato[tipo] = None
+
+class Checkpoint:
+    """
+    Content-hash checkpoint of imported rows.
+    Each prepared row is hashed from its normalized values; hashes are written in the same
+    transaction as the rows they stand for, so a rerun (or the restart of an interrupted run)
+    skips exactly the rows already committed. Identical rows within a file are numbered,
+    so a file with the same row twice still sends both copies to the import.
+    """
+
+    def __init__(self, reprocess=False):
+        self.reprocess = reprocess
+        self.run_id = None
+        self.resumed = []
+        self.skipped = 0
+        self._occurrences = {}
+
+    def start(self, cursor, file_path, hash_arquivo=None):
+        """
+        Create the checkpoint tables if needed and register this run under the file's absolute
+        path and content hash (hash_arquivo, when the caller has it already). Interrupted runs of
+        the same path and content are resumed: their locks are taken here and finish completes
+        them along with this run. Runs of other files, of another version of this one or still
+        in progress are left alone.
+        """
+        arquivo = os.path.basename(file_path)
+        caminho = os.path.abspath(file_path)
+        hash_arquivo = hash_arquivo or file_sha256(file_path)
+        cursor.execute(CHECKPOINT_DDL)
+        cursor.execute("""
+            WITH pendentes AS MATERIALIZED (
+                SELECT id FROM tbl_importacoes
+                WHERE caminho = %s AND hash_arquivo = %s AND concluida_em IS NULL
+            )
+            SELECT p.id, (SELECT count(*) FROM tbl_importacao_linhas l WHERE l.importacao_id = p.id)
+            FROM pendentes p
+            WHERE pg_try_advisory_lock(%s, p.id)
+            ORDER BY p.id
+        """, (caminho, hash_arquivo, CHECKPOINT_LOCK))
+        self.resumed = []
+        for run_id, committed in cursor.fetchall():
+            logger.info("Resuming interrupted import %s of '%s': %s rows already committed", run_id, caminho, committed)
+            self.resumed.append(run_id)
+        cursor.execute("INSERT INTO tbl_importacoes (arquivo, caminho, hash_arquivo) VALUES (%s, %s, %s) RETURNING id",
+                       (arquivo, caminho, hash_arquivo))
+        self.run_id = cursor.fetchone()[0]
+        cursor.execute("SELECT pg_advisory_lock(%s, %s)", (CHECKPOINT_LOCK, self.run_id))
+
+    def row_hash(self, record):
+        """Hash a prepared record's normalized values, numbering repeated content."""
+        content = '\x1f'.join('\\N' if value is None else str(value) for value in staged_values(record))
+        digest = hashlib.md5(content.encode('utf-8')).digest()
+        occurrence = self._occurrences.get(digest, 0) + 1
+        self._occurrences[digest] = occurrence
+        if occurrence == 1:
+            return digest
+        return hashlib.md5(digest + str(occurrence).encode('ascii')).digest()
+
+    def committed(self, cursor, hashes):
+        """The hashes, out of the given ones, that tbl_importacao_linhas already holds."""
+        cursor.execute("SELECT hash_linha FROM tbl_importacao_linhas WHERE hash_linha = ANY(%s)", (hashes,))
+        return {bytes(hash_linha) for (hash_linha,) in cursor.fetchall()}
+
+    def skip_imported(self, db, prepared_chunks):
+        """Tag prepared rows with their hash and drop the ones a previous run already committed."""
+        for chunk, prepared in prepared_chunks:
+            for index, row, record in prepared:
+                record.row_hash = self.row_hash(record)
+            if prepared and not self.reprocess:
+                hashes = [record.row_hash for index, row, record in prepared]
+                imported = db.call(lambda cursor: self.committed(cursor, hashes))
+                if imported:
+                    prepared = [item for item in prepared if item[2].row_hash not in imported]
+                    self.skipped += len(imported)
+            yield chunk, prepared
+
+    def record(self, cursor, hashes):
+        """Store the hashes of rows about to be committed, in the caller's transaction."""
+        if hashes:
+            cursor.execute(CHECKPOINT_RECORD_SQL, (list(hashes), self.run_id))
+
+    async def record_async(self, conn, hashes):
+        """record on an asyncpg connection, in its current transaction."""
+        if hashes:
+            await conn.execute(numbered_params(CHECKPOINT_RECORD_SQL), list(hashes), self.run_id)
+
+    def finish(self, cursor):
+        """Mark this run and the interrupted runs it resumed as complete."""
+        cursor.execute("UPDATE tbl_importacoes SET concluida_em = now() WHERE id = ANY(%s)",
+                       ([self.run_id] + self.resumed,))
+
+def resolve_lookups(db, grouped_chunks, lookups, stats, errors_report):
+    """
+    Lookup stage: resolve each chunk's plans, statuses and contact types with one
+    LookupCache.resolve call and store the 'plano_id' and 'status_id' of every record, so the
+    loaders never look them up row by row. Rows without a status get DEFAULT_STATUS; rows whose
+    status is not in tbl_status_contrato are reported and dropped from their group.
+    """
+    for chunk, groups in grouped_chunks:
+        planos = {}
+        statuses = {DEFAULT_STATUS}
+        for client, items in groups:
+            for index, row, record in items:
+                planos.setdefault(record.plano, record.plano_valor)
+                if record.status is not None:
+                    statuses.add(record.status)
+        tipos = [label for label, key in CONTACT_TYPES]
+        db.call(lambda cursor: lookups.resolve(cursor, planos, statuses, tipos))
+
+        resolved = []
+        for group in groups:
+            for index, row, record in list(group[1]):
+                status = DEFAULT_STATUS if record.status is None else record.status
+                if lookups.status[status] is None:
+                    add_error(stats, errors_report, row, Reason(ReasonCode.UNKNOWN_STATUS, status))
+                    group = without_row(group, index)
+                    continue
+                record.plano_id = lookups.planos[record.plano]
+                record.status_id = lookups.status[status]
+            if group[1]:
+                resolved.append(group)
+        yield chunk, resolved
+
+def close_reports(timer, errors_report, *reports):
+    """Report stage: finish the report files and write the errors report's reason summary."""
+    with timer.stage('report'):
+        # Closing twice is a no-op, and so is the summary
+        summarize = not errors_report.closed and errors_report.reasons
+        for report in (errors_report,) + reports:
+            report.close()
+        if summarize:
+            write_reason_summary(REASONS_FILE, errors_report, errors_report.report_format)
+    timer.rows['report'] = errors_report.count + sum(report.count for report in reports)
+
+def iter_validation_results(chunks, workers, timer):
+    """
+    Read and validate stages: validate chunks, in parallel when workers > 1, and yield
+    (chunk, records, reasons, date_paths) in input order, as returned by validate_chunk.
+    """
+    submitted = deque()
+
+    def track(chunks):
+        for chunk in timer.timed('read', chunks):
+            submitted.append(chunk)
+            yield chunk
+
+    for records, reasons, paths in map_in_order(validate_chunk, track(chunks), workers):
+        yield (submitted.popleft(), records, reasons, paths)
+
+def iter_validated_chunks(results, timer, stats, errors_report, date_paths):
+    """
+    Yield (chunk, prepared) for each validated chunk. prepared holds (index, row, record)
+    for the rows that passed validation, row being the tuple of the input values (for the
+    reports) and record its pipeline.Record; the others are reported. Date conversion path
+    counts are added to date_paths.
+    """
+    def validated():
+        for chunk, records, reasons, paths in results:
+            date_paths.update(paths)
+            prepared = []
+            rows = zip(chunk.index, chunk.itertuples(index=False, name=None))
+            for (index, row), record, reason in zip(rows, records, reasons):
+                if reason:
+                    add_error(stats, errors_report, row, reason)
+                    continue
+                if record.dropped:
+                    stats['campos_descartados'] += bin(record.dropped).count('1')
+                prepared.append((index, row, record))
+            yield chunk, prepared
+
+    return timer.timed('validate', validated(), rows=lambda item: len(item[0]))
+
+def connections_needed(bulk, loaders):
+    """
+    psycopg2 connections a run holds at once: one per loader (bulk mode keeps a second one for
+    its row-by-row fallback) plus one for the checkpoint and lookup queries.
+    """
+    return (2 if bulk else loaders) + 1
+
+def log_run_metrics(stats, date_paths, metrics, errors_report, metrics_file=None, prometheus_file=None):
+    """
+    Log the metrics shared by imports and --validate-only runs and return them as a dict
+    (metrics.RunMetrics.as_dict plus the date conversion paths), saved as JSON to metrics_file
+    and in the Prometheus text format to prometheus_file when given.
+    """
+    logger.info("Total de erros: %s", stats['total_erros'])
+    logger.info("Total de campos opcionais inválidos descartados: %s", stats['campos_descartados'])
+    logger.info("Datas convertidas: %s seriais do Excel, %s datas, %s formatos exatos, %s dateutil, %s ausentes, %s inválidas",
+                date_paths['excel_serial'], date_paths['datetime'], date_paths['exact_format'],
+                date_paths['dateutil'], date_paths['missing'], date_paths['failed'])
+    for name, info in cache_stats().items():
+        logger.info("Cache de normalização %s: %s acertos, %s falhas, %s valores", name, info.hits, info.misses, info.currsize)
+    snapshot = metrics.log_summary(stats, errors_report.reasons)
+    snapshot['date_paths'] = dict(date_paths)
+    if metrics_file:
+        write_json(metrics_file, snapshot)
+    if prometheus_file:
+        write_prometheus(prometheus_file, snapshot)
+    return snapshot
+
+def main(excel_file_path=EXCEL_FILE_PATH, bulk=False, batch_size=BATCH_SIZE, workers=1, loaders=1, reprocess=False,
+         validate_only=False, use_cache=True, report_format='xlsx', async_connections=0, metrics_file=None,
+         prometheus_file=None, merge_policy='last', session_tuning=True, prepare=True, report_language='pt'):
+    """
+    Import data from Excel to PostgreSQL in stages: read -> validate -> load, then report.
+    With validate_only, nothing is loaded: the rows are only read, validated and reported.
+    With use_cache (and pyarrow installed), validation results are cached by the file's hash
+    and modification time, and later runs on the unchanged file skip the read and validate stages.
+    Report rows are written as they are rejected or committed, as xlsx, csv or txt (report_format).
+    Rejections carry reason codes (reasons.ReasonCode) whose messages are written in report_language
+    (pt or en), and are counted per code and field in the REASONS_FILE summary.
+    With async_connections > 0, rows are loaded with asyncio over that many asyncpg connections.
+    Rows repeating a CPF/CNPJ are merged into one client before loading, chosen by merge_policy
+    (first, last or complete, see dedup.ClientMerger), and listed in the duplicates report.
+    Connections come from a pool (database.ConnectionManager) sized by TSMX_DB_POOL_SIZE or by
+    the run; with session_tuning they use database.SESSION_SETTINGS (synchronous_commit=off...).
+    With prepare, each connection PREPAREs the row-by-row loaders' HOT_STATEMENTS once.
+    Returns the run's metrics dict (counters, stage times, SQL statement latencies and rejections
+    per reason, see log_run_metrics) once the run completes; None if the load failed.
+    """
+    setup_logging(LOG_FILE)
+
+    if async_connections and not async_available():
+        logger.error("--async-connections needs the asyncpg package (pip install asyncpg)")
+        sys.exit(1)
+
+    pool_size = DB_POOL_SIZE or connections_needed(bulk, loaders)
+    if pool_size < connections_needed(bulk, loaders):
+        logger.error("TSMX_DB_POOL_SIZE=%s is below the %s connections this run needs",
+                     pool_size, connections_needed(bulk, loaders))
+        sys.exit(1)
+
+    if not validate_only and not password_configured(DB_PARAMS):
+        logger.error("No database password: set TSMX_DB_PASSWORD, PGPASSWORD or a ~/.pgpass entry for %s@%s",
+                     DB_PARAMS['user'], DB_PARAMS['host'])
+        sys.exit(1)
 
-def main(excel_file_path=EXCEL_FILE_PATH):
-    """Main function to import data from Excel to PostgreSQL."""
     # Ensure output directory exists
     os.makedirs(OUTPUT_DIR, exist_ok=True)
 
     # Check if the Excel file exists
     if not os.path.exists(excel_file_path):
-        logger.error(f"The file '{excel_file_path}' does not exist.")
+        logger.error("The file '%s' does not exist.", excel_file_path)
         sys.exit(1)
     
-    # Read Excel file
+    # Open the input file; batches are read as the import consumes them
+    metrics = RunMetrics()
+    timer = metrics.timer
+    cache = None
+    cached = None
+    if use_cache and not cache_available():
+        logger.info("pyarrow is not installed; validated input will not be cached")
+    elif use_cache:
+        cache = InputCache(excel_file_path, [key for key, column in RECORD_COLUMNS])
+        with timer.stage('read'):
+            cached = cache.open()
     try:
-        df = pd.read_excel(excel_file_path)
-        logger.info(f"Successfully read Excel file: {excel_file_path}")
+        if cached:
+            columns, cached_results = cached
+            results = timer.timed('read', cached_results, rows=lambda item: len(item[0]))
+        else:
+            with timer.stage('read'):
+                columns, chunks = open_batches(excel_file_path, EXPECTED_COLUMNS,
+                                               BULK_CHUNK_SIZE if bulk else READ_BATCH_SIZE)
+            logger.info("Successfully opened input file: %s", excel_file_path)
+            # Rows are validated chunk by chunk, in worker processes when workers > 1
+            results = iter_validation_results(chunks, workers, timer)
+            if cache is not None:
+                results = cache.write(columns, results)
     except Exception as e:
-        logger.error(f"Error reading Excel file: {e}")
+        logger.error("Error reading input file: %s", e)
         sys.exit(1)
     
-    # Validate Excel columns
-    missing_columns = [col for col in EXPECTED_COLUMNS if col not in df.columns]
-    if missing_columns:
-        logger.error(f"Missing columns in Excel file: {missing_columns}")
-        sys.exit(1)
-    
-    # Initialize counters and lists
-    total_clientes = 0
-    total_contatos = 0
-    total_contratos = 0
-    contratos_importados = 0
-    total_erros = 0
-    errors_list = []
-    success_list = []
+    # Initialize counters and reports
+    stats = new_stats()
+    date_paths = Counter()
+    errors_report = ReportWriter(ERRORS_FILE, columns, report_format=report_format, language=report_language)
+    success_report = ReportWriter(TOTAL_REGISTROS_FILE, columns, report_format=report_format)
+    duplicates_report = ReportWriter(DUPLICATES_FILE, columns, report_format=report_format,
+                                     reason_column=DUPLICATE_NOTE_COLUMN)
+    merger = ClientMerger(merge_policy, CONTACT_TYPES, duplicates_report)
+
+    validated_chunks = iter_validated_chunks(results, timer, stats, errors_report, date_paths)
+
+    if validate_only:
+        try:
+            for chunk, groups in merger.group(validated_chunks):
+                for client, items in groups:
+                    for index, row, record in items:
+                        add_success(success_report, row)
+        finally:
+            close_reports(timer, errors_report, success_report, duplicates_report)
+        logger.info("Validação apenas (--validate-only): nada foi carregado no banco")
+        logger.info("Total de linhas válidas: %s", success_report.count)
+        merger.log_summary()
+        return log_run_metrics(stats, date_paths, metrics, errors_report, metrics_file, prometheus_file)
 
     # Connect to database
-    conn = None
-    cursor = None
+    db = None
     try:
-        conn = psycopg2.connect(**DB_PARAMS)
-        conn.set_session(autocommit=False)
-        cursor = conn.cursor()
-        logger.info("Connected to database successfully")
-        
-        # Process each row
-        for index, row in df.iterrows():
-            error_row = row.copy()
-            has_error = False
-
-            # Clean and prepare data
-            cpf_cnpj = clean_cpf_cnpj(row['CPF/CNPJ'])
-            if not cpf_cnpj or len(cpf_cnpj) not in (11, 14):
-                error_row['Motivo do Erro'] = f"Defina CPF/CNPJ como um CPF válido de 11 dígitos (por exemplo, {cpf_cnpj + '0' if cpf_cnpj else '12345678901'}) ou um CNPJ de 14 dígitos."
-                logger.warning(f"Row {index + 1}: Invalid CPF/CNPJ: {cpf_cnpj}")
-                errors_list.append(error_row)
-                total_erros += 1
-                continue
-                
-            # Insert or get client
-            data_nascimento = convert_excel_date(row['Data Nasc.'])
-            data_cadastro = convert_excel_date(row['Data Cadastro cliente'])
-            nome_razao_social = encode_string(row['Nome/Razão Social'], 255)
-            if not nome_razao_social:
-                error_row['Motivo do Erro'] = "Defina Nome/Razão Social como um valor válido."
-                logger.warning(f"Row {index + 1}: Nome/Razão Social missing")
-                errors_list.append(error_row)
-                total_erros += 1
-                continue
-
-            try:
-                cursor.execute("""
-                    INSERT INTO tbl_clientes (nome_razao_social, nome_fantasia, cpf_cnpj, data_nascimento, data_cadastro)
-                    VALUES (%s, %s, %s, %s, %s)
-                    ON CONFLICT (cpf_cnpj) DO UPDATE 
-                    SET nome_razao_social = EXCLUDED.nome_razao_social,
-                        nome_fantasia = EXCLUDED.nome_fantasia,
-                        data_nascimento = EXCLUDED.data_nascimento,
-                        data_cadastro = EXCLUDED.data_cadastro
-                    RETURNING id, (xmax = 0) AS is_new
-                """, (
-                    nome_razao_social,
-                    encode_string(row['Nome Fantasia'], 255),
-                    cpf_cnpj,
-                    data_nascimento,
-                    data_cadastro
-                ))
-                
-                cliente_id, is_new = cursor.fetchone()
-                if is_new:
-                    logger.info(f"Row {index + 1}: Inserted new client with CPF/CNPJ {cpf_cnpj}")
-                else:
-                    logger.info(f"Row {index + 1}: Updated existing client with CPF/CNPJ {cpf_cnpj}")
-                total_clientes += 1
-            except Exception as e:
-                error_row['Motivo do Erro'] = f"Erro ao inserir cliente: {str(e)}"
-                logger.error(f"Row {index + 1}: Error inserting client {cpf_cnpj}: {e}")
-                conn.rollback()
-                errors_list.append(error_row)
-                total_erros += 1
-                continue
-
-            # Insert contacts (Celulares, Telefones, Emails)
-            contatos = [
-                ('Celular', clean_phone(row['Celulares']), 2),  # 2 = Celular
-                ('Telefone', clean_phone(row['Telefones']), 1),  # 1 = Telefone
-                ('E-Mail', encode_string(row['Emails'], 255), 3)  # 3 = E-Mail
-            ]
-
-            for tipo, contato, tipo_contato_id in contatos:
-                if contato:
-                    try:
-                        cursor.execute("""
-                            INSERT INTO tbl_cliente_contatos (cliente_id, tipo_contato_id, contato)
-                            VALUES (%s, %s, %s)
-                            ON CONFLICT DO NOTHING
-                            RETURNING id
-                        """, (cliente_id, tipo_contato_id, contato))
-                        if cursor.fetchone():
-                            total_contatos += 1
-                        else:
-                            logger.info(f"Row {index + 1}: Skipped duplicate {tipo} contact {contato} for client {cpf_cnpj}")
-                    except Exception as e:
-                        error_row['Motivo do Erro'] = f"Erro ao inserir contato {tipo}: {str(e)}"
-                        logger.error(f"Row {index + 1}: Error inserting {tipo} contact for client {cpf_cnpj}: {e}")
-                        conn.rollback()
-                        # Continue despite contact error
-
-            # Insert contract
-            try:
-                plano_id = get_or_create_plano(cursor, str(row['Plano']), float(row['Plano Valor']))
-                status_id = get_status_id(cursor, str(row['Status']))
-                dia_vencimento = validate_dia_vencimento(row['Vencimento'], index)
-                if not dia_vencimento:
-                    error_row['Motivo do Erro'] = "Defina Vencimento como um número válido entre 1 e 31."
-                    errors_list.append(error_row)
-                    total_erros += 1
-                    conn.rollback()
-                    continue
+        with timer.stage('load'):
+            db = ConnectionManager(DB_PARAMS, pool_size, SESSION_SETTINGS if session_tuning else None, metrics,
+                                   HOT_STATEMENTS if prepare else None)
+            logger.info("Connected to database successfully (%s pooled connections)", pool_size)
 
-                cep = clean_cep(row['CEP'], index)
-                uf = normalize_uf(row['UF'], index)
-                endereco_logradouro = encode_string(row['Endereço'], 255)
-                isento = row['Isento'] == 'Sim' if not pd.isna(row['Isento']) else False
-
-                # Validate required fields for tbl_cliente_contratos
-                if cep is None:
-                    error_row['Motivo do Erro'] = "Defina CEP como 00000000 (ou um CEP válido)."
-                    logger.warning(f"Row {index + 1}: Missing endereco_cep for client {cpf_cnpj}")
-                    errors_list.append(error_row)
-                    total_erros += 1
-                    conn.rollback()
-                    continue
-                if endereco_logradouro is None:
-                    error_row['Motivo do Erro'] = "Coloque Endereço na Rua Desconhecida (ou um endereço válido)."
-                    logger.warning(f"Row {index + 1}: Missing endereco_logradouro for client {cpf_cnpj}")
-                    errors_list.append(error_row)
-                    total_erros += 1
-                    conn.rollback()
-                    continue
+            # Plans, statuses and contact types are resolved per chunk on autocommit connections,
+            # so new plans never wait for (or vanish with) a batch of rows
+            lookups = LookupCache()
+            db.call(lookups.load)
+            checkpoint = Checkpoint(reprocess)
+            with db.connection() as conn, conn.cursor() as cursor:
+                # The input cache has hashed the file already
+                checkpoint.start(cursor, excel_file_path, cache.key()['sha256'] if cache is not None else None)
+                conn.commit()
 
-                cursor.execute("""
-                    INSERT INTO tbl_cliente_contratos (
-                        cliente_id, plano_id, dia_vencimento, isento, 
-                        endereco_logradouro, endereco_numero, endereco_bairro,
-                        endereco_cidade, endereco_complemento, endereco_cep,
-                        endereco_uf, status_id
-                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    ON CONFLICT DO NOTHING
-                    RETURNING id
-                """, (
-                    cliente_id,
-                    plano_id,
-                    dia_vencimento,
-                    isento,
-                    endereco_logradouro,
-                    encode_string(row['Número'], 15),
-                    encode_string(row['Bairro'], 255),
-                    encode_string(row['Cidade'], 255),
-                    encode_string(row['Complemento'], 500),
-                    cep,
-                    uf,
-                    status_id
-                ))
-                if cursor.fetchone():
-                    total_contratos += 1
-                    contratos_importados += 1
-                    # Add to success list if contract was inserted
-                    success_row = row.copy()
-                    success_row['Motivo do Erro'] = ''  # Empty for successful imports
-                    success_list.append(success_row)
-                else:
-                    logger.info(f"Row {index + 1}: Skipped duplicate contract for client {cpf_cnpj}")
-            except Exception as e:
-                error_row['Motivo do Erro'] = f"Erro ao inserir contrato: {str(e)}"
-                logger.error(f"Row {index + 1}: Error inserting contract for client {cpf_cnpj}: {e}")
-                conn.rollback()
-                errors_list.append(error_row)
-                total_erros += 1
-                continue
-        
-            # Commit transaction per row
-            try:
+            # Rows already committed by a previous run are skipped; the rest are grouped by CPF/CNPJ
+            grouped_chunks = merger.group(checkpoint.skip_imported(db, validated_chunks))
+            grouped_chunks = resolve_lookups(db, grouped_chunks, lookups, stats, errors_report)
+            if bulk:
+                bulk_import(db, grouped_chunks, batch_size, lookups, checkpoint, stats, errors_report, success_report)
+            elif async_connections:
+                async_import(db, grouped_chunks, async_connections, lookups, checkpoint, stats, errors_report, success_report)
+            elif loaders > 1:
+                parallel_import(db, grouped_chunks, loaders, batch_size, lookups, checkpoint, stats, errors_report, success_report)
+            else:
+                # Process each client's rows, committing every batch_size rows
+                groups = (group for chunk, groups in grouped_chunks for group in groups)
+                import_rows(db, groups, batch_size, lookups, checkpoint, stats, errors_report, success_report)
+            with db.connection() as conn, conn.cursor() as cursor:
+                checkpoint.finish(cursor)
                 conn.commit()
-            except Exception as e:
-                error_row['Motivo do Erro'] = f"Erro ao confirmar transação: {str(e)}"
-                logger.error(f"Row {index + 1}: Error committing transaction: {e}")
-                conn.rollback()
-                errors_list.append(error_row)
-                total_erros += 1
-                continue
-
-        # Save reports to Excel
-        if errors_list or success_list:
-            # Define columns including Motivo do Erro
-            columns = df.columns.tolist() + ['Motivo do Erro']
-            
-            # Create DataFrames
-            errors_df = pd.DataFrame(errors_list, columns=columns) if errors_list else pd.DataFrame(columns=columns)
-            success_df = pd.DataFrame(success_list, columns=columns) if success_list else pd.DataFrame(columns=columns)
-            
-            # Save errors report (only failed records)
-            if not errors_df.empty:
-                errors_header = pd.DataFrame([columns], columns=columns)
-                errors_final_df = pd.concat([errors_header, errors_df], ignore_index=True)
-                errors_final_df.to_excel(ERRORS_FILE, index=False)
-                logger.info(f"Errors report saved to '{ERRORS_FILE}'")
-            
-            # Save total records report (only imported records)
-            if not success_df.empty:
-                success_header = pd.DataFrame([columns], columns=columns)
-                total_records_df = pd.concat([
-                    success_header,
-                    success_df
-                ], ignore_index=True)
-                
-                total_records_df.to_excel(TOTAL_REGISTROS_FILE, index=False)
-                logger.info(f"Imported records report saved to '{TOTAL_REGISTROS_FILE}'")
+        timer.rows['load'] = success_report.count
+        close_reports(timer, errors_report, success_report, duplicates_report)
 
         # Log final metrics
-        logger.info(f"Total de clientes processados: {total_clientes}")
-        logger.info(f"Total de contatos processados: {total_contatos}")
-        logger.info(f"Total de contratos processados: {total_contratos}")
-        logger.info(f"Total de contratos importados: {contratos_importados}")
-        logger.info(f"Total de erros: {total_erros}")
+        logger.info("Total de clientes processados: %s", stats['total_clientes'])
+        logger.info("Total de contatos processados: %s", stats['total_contatos'])
+        logger.info("Total de contratos processados: %s", stats['total_contratos'])
+        logger.info("Total de contratos importados: %s", stats['contratos_importados'])
+        logger.info("Total de linhas já importadas (ignoradas): %s", checkpoint.skipped)
+        merger.log_summary()
+        logger.info("Cache de planos/status/tipos de contato: %s acertos, %s falhas, %s consultas",
+                    lookups.hits, lookups.misses, lookups.queries)
+        return log_run_metrics(stats, date_paths, metrics, errors_report, metrics_file, prometheus_file)
         
     except Exception as e:
-        logger.error(f"Error during database operation: {e}")
-        if conn is not None:
-            conn.rollback()
+        logger.error("Error during database operation: %s", e)
     finally:
-        if cursor is not None:
-            cursor.close()
-        if conn is not None:
-            conn.close()
+        # Rows reported before a failure are kept
+        close_reports(timer, errors_report, success_report, duplicates_report)
+        if db is not None:
+            db.closeall()
         logger.info("Database connection closed")
 
 if __name__ == "__main__":
-    # Allow file path to be passed as command-line argument
-    excel_file_path = EXCEL_FILE_PATH
-    if len(sys.argv) > 1:
-        excel_file_path = sys.argv[1]
-    
-    main(excel_file_path)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Import data from Excel to PostgreSQL.")
+    parser.add_argument('excel_file_path', nargs='?', default=EXCEL_FILE_PATH,
+                        help="Path to the .xlsx, .csv or .csv.gz input file (default: %(default)s)")
+    parser.add_argument('--bulk', action='store_true',
+                        help="Load rows through COPY into staging tables and set-based upserts")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                        help="Rows per transaction in row-by-row mode; each row runs in its own savepoint (default: %(default)s)")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Processes used to validate input chunks (default: %(default)s)")
+    parser.add_argument('--loaders', type=int, default=1,
+                        help="Database connections loading rows in parallel, sharded by CPF/CNPJ (default: %(default)s)")
+    parser.add_argument('--async-connections', type=int, default=0,
+                        help="Load rows with asyncio over this many asyncpg connections, one transaction per row (default: off)")
+    parser.add_argument('--trace', action='store_true',
+                        help="Log every row and field (slow; for debugging)")
+    parser.add_argument('--reprocess', action='store_true',
+                        help="Import every row again, even the ones a previous run already committed")
+    parser.add_argument('--validate-only', action='store_true',
+                        help="Dry run: read and validate the file and write the reports without touching the database")
+    parser.add_argument('--report-format', choices=REPORT_FORMATS, default='xlsx',
+                        help="Format of the errors and imported records reports (default: %(default)s)")
+    parser.add_argument('--report-language', choices=LANGUAGES, default='pt',
+                        help="Language of the rejection messages in the errors report and its reason summary "
+                             "(default: %(default)s)")
+    parser.add_argument('--merge-policy', choices=MERGE_POLICIES, default='last',
+                        help="Which row of a repeated CPF/CNPJ gives the client its data: the first, the last, "
+                             "or the one with the most filled fields (default: %(default)s)")
+    parser.add_argument('--no-session-tuning', action='store_true',
+                        help="Keep the server's session settings instead of synchronous_commit=off, a larger "
+                             "work_mem and a statement timeout (see the TSMX_* variables in database.py)")
+    parser.add_argument('--no-prepare', action='store_true',
+                        help="Send the row-by-row loaders' statements as SQL text instead of PREPAREd statements "
+                             "(to compare, or behind a pooler that does not keep sessions)")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Read and validate the file again instead of reusing the cached validation results")
+    parser.add_argument('--metrics-json', metavar='PATH',
+                        help="Save the run's metrics (stage times, SQL latency histograms, rejections per reason) as JSON")
+    parser.add_argument('--metrics-prom', metavar='PATH',
+                        help="Save the run's metrics in the Prometheus text format")
+    parser.add_argument('--profile', metavar='PATH',
+                        help="Run under cProfile and save the stats to PATH (validation worker processes are not profiled)")
+    args = parser.parse_args()
+    setup_logging(LOG_FILE, trace=args.trace or None)
+    if args.batch_size < 1:
+        parser.error("--batch-size must be at least 1")
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.loaders < 1:
+        parser.error("--loaders must be at least 1")
+    if args.bulk and args.loaders > 1:
+        parser.error("--loaders applies to the row-by-row mode; --bulk already loads with set-based statements")
+    if args.async_connections < 0:
+        parser.error("--async-connections must be at least 0")
+    if args.async_connections and (args.bulk or args.loaders > 1):
+        parser.error("--async-connections cannot be combined with --bulk or --loaders")
+
+    with profiled(args.profile):
+        main(args.excel_file_path, bulk=args.bulk, batch_size=args.batch_size, workers=args.workers,
+             loaders=args.loaders, reprocess=args.reprocess, validate_only=args.validate_only,
+             use_cache=not args.no_cache, report_format=args.report_format,
+             async_connections=args.async_connections, metrics_file=args.metrics_json,
+             prometheus_file=args.metrics_prom, merge_policy=args.merge_policy,
+             session_tuning=not args.no_session_tuning, prepare=not args.no_prepare,
+             report_language=args.report_language)
@@ -0,0 +1,240 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import pandas as pd
+from collections import Counter
+from pipeline import Record
+from reasons import dumps, loads
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.feather as feather
+except ImportError:  # the cache is optional; without pyarrow every run reads the source file
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+# Directory holding one cache entry per source file
+CACHE_DIR = '.import_cache'
+
+# Bump when validation rules or the entry layout change, so older entries are rebuilt
+CACHE_VERSION = 5
+
+# Bytes read per step when hashing the source file
+HASH_BLOCK_SIZE = 1 << 20
+
+MANIFEST_FILE = 'manifest.json'
+
+# Column names in the chunk files: source row, rejection reason, dropped fields and loader record keys
+ROW_COLUMN = '_src_row'
+REASON_COLUMN = '_motivo'
+DROPPED_COLUMN = '_descartados'
+RECORD_PREFIX = 'record.'
+
+def cache_available():
+    """Whether pyarrow is installed, so validated input can be cached."""
+    return pa is not None
+
+def file_sha256(file_path):
+    """SHA-256 of a file's content, read in blocks."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def column_to_arrow(values):
+    """
+    Arrow array for a raw input column, keeping each value's Python type.
+    Columns mixing value types (e.g. CEP as numbers and as text, or text with NaN for
+    empty cells) become a dense union with one child per type, so the reports show
+    exactly what the source file held.
+    """
+    values = list(values)
+    if len({type(value) for value in values if value is not None}) <= 1:
+        return pa.array(values)
+    children = {}
+    type_ids = []
+    offsets = []
+    for value in values:
+        child = children.setdefault(type(value), [])
+        type_ids.append(list(children).index(type(value)))
+        offsets.append(len(child))
+        child.append(value)
+    return pa.UnionArray.from_dense(pa.array(type_ids, pa.int8()), pa.array(offsets, pa.int32()),
+                                    [pa.array(child) for child in children.values()])
+
+def chunk_to_table(columns, chunk, records, reasons, record_keys):
+    """Arrow table with a chunk's raw values, rejection reasons and loader records."""
+    arrays = [pa.array(chunk.index, pa.int64())]
+    names = [ROW_COLUMN]
+    for column in columns:
+        arrays.append(column_to_arrow(chunk[column].astype(object)))
+        names.append(column)
+    # Reasons are stored as their codes and values (reasons.dumps), not as rendered messages
+    arrays.append(pa.array([dumps(reason) for reason in reasons], pa.string()))
+    names.append(REASON_COLUMN)
+    arrays.append(pa.array([record.dropped if record is not None else None for record in records], pa.int64()))
+    names.append(DROPPED_COLUMN)
+    for key in record_keys:
+        arrays.append(pa.array([getattr(record, key) if record is not None else None for record in records]))
+        names.append(RECORD_PREFIX + key)
+    return pa.Table.from_arrays(arrays, names=names)
+
+def column_values(column):
+    """
+    A cached input column as an object array of Python values. Text columns, and numeric
+    columns without nulls, convert in one Arrow call; the rest (unions of value types, nulls
+    that must stay None) go value by value.
+    """
+    kind = column.type
+    if pa.types.is_string(kind) or (column.null_count == 0 and (
+            pa.types.is_integer(kind) or pa.types.is_floating(kind) or pa.types.is_boolean(kind))):
+        return column.to_numpy().astype(object, copy=False)
+    return column.to_pylist()
+
+def reason_values(column):
+    """A chunk's reasons (reasons.loads), decoding each distinct reason once."""
+    encoded = column.dictionary_encode().combine_chunks()
+    decoded = [loads(text) for text in encoded.dictionary.to_pylist()]
+    return [None if position is None else decoded[position] for position in encoded.indices.to_pylist()]
+
+def table_to_chunk(columns, table, record_keys):
+    """
+    Rebuild (chunk, records, reasons) from a chunk table. Only the accepted rows' record
+    columns are converted to Python values; the rejected rows have no record.
+    """
+    index = pd.Index(table.column(ROW_COLUMN).to_numpy())
+    chunk = pd.DataFrame({column: pd.Series(column_values(table.column(column)), index=index, dtype=object)
+                          for column in columns}, index=index)
+    reasons = reason_values(table.column(REASON_COLUMN))
+    accepted = table.select([DROPPED_COLUMN] + [RECORD_PREFIX + key for key in record_keys]).filter(
+        pc.is_null(table.column(REASON_COLUMN)))
+    dropped, *values = (column.to_pylist() for column in accepted.columns)
+    records = iter(map(Record, zip(*values), dropped))
+    return chunk, [None if reason is not None else next(records) for reason in reasons], reasons
+
+class InputCache:
+    """
+    Columnar cache of a validated input file, so reruns on the same file skip reading the
+    workbook and validating it again.
+    Each source path has one entry in CACHE_DIR: a manifest with the file's SHA-256,
+    modification time and the validation results' chunk layout, plus one uncompressed
+    Arrow (Feather) file per chunk, memory-mapped when read back. An entry whose hash,
+    modification time or CACHE_VERSION no longer match the source is discarded.
+    Chunks are written as they are validated and the manifest last, so an interrupted
+    run never leaves an entry that looks complete.
+    """
+
+    def __init__(self, file_path, record_keys, cache_dir=CACHE_DIR):
+        self.file_path = file_path
+        self.record_keys = list(record_keys)
+        path_digest = hashlib.md5(os.path.abspath(file_path).encode('utf-8')).hexdigest()[:12]
+        self.entry = os.path.join(cache_dir, f"{os.path.basename(file_path)}-{path_digest}")
+        self._key = None
+
+    def stat_key(self):
+        """Identity of the source file that needs no read: modification time, size and cache version."""
+        stat = os.stat(self.file_path)
+        return {
+            'mtime_ns': stat.st_mtime_ns,
+            'size': stat.st_size,
+            'version': CACHE_VERSION,
+            'record_keys': self.record_keys
+        }
+
+    def key(self):
+        """stat_key plus the source's content hash, computed once."""
+        if self._key is None:
+            self._key = dict(self.stat_key(), sha256=file_sha256(self.file_path))
+        return self._key
+
+    def matches(self, stored):
+        """
+        Whether a manifest's key is this source's. The content is hashed only when the
+        modification time and size match, so a changed file costs no read.
+        """
+        stored = dict(stored or {})
+        sha256 = stored.pop('sha256', None)
+        return stored == self.stat_key() and sha256 == self.key()['sha256']
+
+    def open(self):
+        """
+        Return (columns, results) from a matching entry, or None on a miss.
+        results yields (chunk, records, reasons, date_paths) per cached chunk, like the validate stage.
+        A stale entry is removed, and so is one with a missing or unreadable chunk file: every
+        chunk is mapped here, before any row is loaded, so the caller can still read the source.
+        """
+        manifest_path = os.path.join(self.entry, MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            return None
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable input cache %s: %s", self.entry, e)
+            manifest = {}
+        if not self.matches(manifest.get('key')):
+            logger.info("Input cache %s no longer matches %s; discarding it", self.entry, self.file_path)
+            shutil.rmtree(self.entry, ignore_errors=True)
+            return None
+        try:
+            tables = [self._map_chunk(info) for info in manifest['chunks']]
+        except Exception as e:
+            logger.warning("Input cache %s is damaged (%s); discarding it", self.entry, e)
+            shutil.rmtree(self.entry, ignore_errors=True)
+            return None
+        logger.info("Reusing validated input from cache %s (%s rows)", self.entry,
+                    sum(chunk['rows'] for chunk in manifest['chunks']))
+        return manifest['columns'], self._read_chunks(manifest, tables)
+
+    def _map_chunk(self, info):
+        """Memory-map one chunk file, checking it holds the rows the manifest lists."""
+        table = feather.read_table(os.path.join(self.entry, info['file']), memory_map=True)
+        if table.num_rows != info['rows']:
+            raise ValueError(f"{info['file']} has {table.num_rows} rows, expected {info['rows']}")
+        return table
+
+    def _read_chunks(self, manifest, tables):
+        try:
+            for info, table in zip(manifest['chunks'], tables):
+                chunk, records, reasons = table_to_chunk(manifest['columns'], table, self.record_keys)
+                yield chunk, records, reasons, Counter(info['date_paths'])
+        except Exception:
+            # Too late to fall back to the source for this run, but the next one rebuilds the entry
+            logger.warning("Discarding input cache %s after a read error", self.entry)
+            shutil.rmtree(self.entry, ignore_errors=True)
+            raise
+
+    def write(self, columns, results):
+        """
+        Pass validate stage results through, storing each chunk in a new entry.
+        The entry replaces any previous one only once results is exhausted; if the run
+        stops earlier, the partial entry is removed.
+        """
+        key = self.key()
+        partial = self.entry + '.partial'
+        shutil.rmtree(partial, ignore_errors=True)
+        os.makedirs(partial)
+        chunks = []
+        complete = False
+        try:
+            for chunk, records, reasons, date_paths in results:
+                info = {'file': f"chunk-{len(chunks):05d}.arrow", 'rows': len(chunk), 'date_paths': dict(date_paths)}
+                table = chunk_to_table(columns, chunk, records, reasons, self.record_keys)
+                feather.write_feather(table, os.path.join(partial, info['file']), compression='uncompressed')
+                chunks.append(info)
+                yield chunk, records, reasons, date_paths
+            with open(os.path.join(partial, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+                json.dump({'key': key, 'source': os.path.abspath(self.file_path),
+                           'columns': list(columns), 'chunks': chunks}, f)
+            shutil.rmtree(self.entry, ignore_errors=True)
+            os.replace(partial, self.entry)
+            complete = True
+            logger.info("Validated input cached in %s (%s chunks)", self.entry, len(chunks))
+        finally:
+            if not complete:
+                shutil.rmtree(partial, ignore_errors=True)
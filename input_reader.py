@@ -0,0 +1,130 @@
+import pandas as pd
+from pandas.io.parsers import TextParser
+import csv
+import gzip
+import logging
+import os
+from openpyxl import load_workbook
+
+logger = logging.getLogger(__name__)
+
+# Rows per batch yielded by the readers
+READ_BATCH_SIZE = 10000
+
+# Separators tried when sniffing a CSV header
+CSV_SEPARATORS = ',;\t|'
+
+def open_text(file_path):
+    """Open a .csv or .csv.gz file for reading as UTF-8 text."""
+    if file_path.lower().endswith('.gz'):
+        return gzip.open(file_path, 'rt', encoding='utf-8', newline='')
+    return open(file_path, 'r', encoding='utf-8', newline='')
+
+def check_columns(columns, expected_columns):
+    """Raise ValueError if any expected column is missing from the header."""
+    missing_columns = [col for col in expected_columns if col not in columns]
+    if missing_columns:
+        raise ValueError(f"Missing columns in input file: {missing_columns}")
+
+def convert_xlsx_value(value):
+    """Convert an openpyxl cell value the same way pd.read_excel does."""
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+def rows_to_frame(rows, columns, start):
+    """
+    Build a batch DataFrame from raw rows.
+    Values keep their Python types (dtype=object), so a value is cleaned the same way
+    whatever else ends up in its batch; empty cells and NA markers become NaN as in read_excel.
+    """
+    df = TextParser(rows, names=columns, dtype=object).read()
+    df.index = pd.RangeIndex(start, start + len(df))
+    return df
+
+def iter_xlsx_batches(workbook, sheet, columns, batch_size):
+    """Yield batches of rows from an openpyxl read-only sheet, header already consumed."""
+    try:
+        rows = []
+        empty_rows = []
+        start = 0
+        for values in sheet:
+            row = [convert_xlsx_value(value) for value in values[:len(columns)]]
+            row += [""] * (len(columns) - len(row))
+            # Like read_excel, empty rows are kept only when followed by data
+            if all(value == "" for value in row):
+                empty_rows.append(row)
+                continue
+            rows.extend(empty_rows)
+            empty_rows = []
+            rows.append(row)
+            if len(rows) >= batch_size:
+                yield rows_to_frame(rows[:batch_size], columns, start)
+                start += batch_size
+                rows = rows[batch_size:]
+        if rows:
+            yield rows_to_frame(rows, columns, start)
+    finally:
+        workbook.close()
+
+def open_xlsx(file_path, expected_columns, batch_size):
+    """Open an .xlsx file in read-only mode and return its header and a batch generator."""
+    workbook = load_workbook(file_path, read_only=True, data_only=True, keep_links=False)
+    try:
+        sheet = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(sheet, ())
+        while header and header[-1] is None:
+            header = header[:-1]
+        columns = [str(value) if value is not None else f"Unnamed: {i}" for i, value in enumerate(header)]
+        check_columns(columns, expected_columns)
+    except Exception:
+        workbook.close()
+        raise
+    return columns, iter_xlsx_batches(workbook, sheet, columns, batch_size)
+
+def open_csv(file_path, expected_columns, batch_size):
+    """Open a .csv or .csv.gz file and return its header and a batch generator."""
+    with open_text(file_path) as f:
+        first_line = f.readline()
+    try:
+        separator = csv.Sniffer().sniff(first_line, delimiters=CSV_SEPARATORS).delimiter
+    except csv.Error:
+        separator = ','
+    reader = pd.read_csv(file_path, sep=separator, dtype=object, chunksize=batch_size,
+                         compression='infer', encoding='utf-8')
+    try:
+        first_chunk = next(reader, None)
+        columns = first_chunk.columns.tolist() if first_chunk is not None else next(csv.reader([first_line], delimiter=separator), [])
+        check_columns(columns, expected_columns)
+    except Exception:
+        reader.close()
+        raise
+
+    def iter_csv_batches():
+        with reader:
+            if first_chunk is not None:
+                yield first_chunk
+            for chunk in reader:
+                yield chunk
+
+    logger.info("Reading CSV file %s with separator %r", file_path, separator)
+    return columns, iter_csv_batches()
+
+def open_batches(file_path, expected_columns, batch_size=READ_BATCH_SIZE):
+    """
+    Open an input file for streaming.
+    Returns the header columns and a generator of DataFrames with at most batch_size rows,
+    indexed by their position in the file. Raises ValueError for missing columns or
+    unsupported file types.
+    """
+    name = file_path.lower()
+    if name.endswith('.xlsx') or name.endswith('.xlsm'):
+        columns, batches = open_xlsx(file_path, expected_columns, batch_size)
+    elif name.endswith('.csv') or name.endswith('.csv.gz'):
+        columns, batches = open_csv(file_path, expected_columns, batch_size)
+    else:
+        raise ValueError(f"Unsupported input file type: {os.path.basename(file_path)}")
+    logger.info("Streaming %s in batches of %s rows", file_path, batch_size)
+    return columns, batches
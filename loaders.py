@@ -0,0 +1,791 @@
+import io
+import time
+import zlib
+import queue
+import threading
+import logging
+import asyncio
+import itertools
+from operator import attrgetter
+from datetime import date, datetime
+import psycopg2
+import psycopg2.extras
+try:
+    import asyncpg
+except ImportError:  # only needed for --async-connections
+    asyncpg = None
+from database import DB_PARAMS, MAX_RECONNECTS, broken, execute_statement, numbered_params
+from reasons import Reason, ReasonCode
+from dedup import merged_client, CLIENT_FIELDS
+
+logger = logging.getLogger(__name__)
+
+# Contact columns: (tbl_tipos_contato.tipo_contato, record key); the IDs are read from the table
+CONTACT_TYPES = [
+    ('Celular', 'celular'),
+    ('Telefone', 'telefone'),
+    ('E-Mail', 'email')
+]
+
+# Row-by-row mode: rows committed per transaction
+BATCH_SIZE = 1000
+
+# Contacts sent per multi-row INSERT when a batch is committed
+CONTACT_PAGE_SIZE = 1000
+
+# Parallel loaders: row groups (one CPF/CNPJ each) queued per loader before the dispatcher blocks
+LOADER_QUEUE_SIZE = 5000
+
+# Async mode: rows in flight per connection; the reader waits while every slot is taken
+ASYNC_PENDING_PER_CONNECTION = 4
+
+# Column order of the stg_import staging table used by COPY
+STAGING_COLUMNS = [
+    'src_row', 'cpf_cnpj', 'nome_razao_social', 'nome_fantasia', 'data_nascimento', 'data_cadastro',
+    'celular', 'telefone', 'email', 'plano', 'plano_valor', 'status', 'dia_vencimento', 'isento',
+    'endereco_logradouro', 'endereco_numero', 'endereco_bairro', 'endereco_cidade',
+    'endereco_complemento', 'endereco_cep', 'endereco_uf'
+]
+staged_values = attrgetter(*STAGING_COLUMNS[1:])
+
+# Statements the row-by-row loaders run for every group, row or contact batch. Each connection
+# PREPAREs them once and the loaders EXECUTE them by name, so PostgreSQL does not parse and plan
+# them again for every row; with --no-prepare they are sent as SQL text. A batch's contacts go
+# in arrays, one statement for any number of them.
+HOT_STATEMENTS = {
+    'tsmx_cliente_id': "SELECT id FROM tbl_clientes WHERE cpf_cnpj = %s",
+    'tsmx_upsert_cliente': """
+        INSERT INTO tbl_clientes (nome_razao_social, nome_fantasia, cpf_cnpj, data_nascimento, data_cadastro)
+        VALUES (%s, %s, %s, %s, %s)
+        ON CONFLICT (cpf_cnpj) DO UPDATE 
+        SET nome_razao_social = EXCLUDED.nome_razao_social,
+            nome_fantasia = EXCLUDED.nome_fantasia,
+            data_nascimento = EXCLUDED.data_nascimento,
+            data_cadastro = EXCLUDED.data_cadastro
+        RETURNING id, (xmax = 0) AS is_new
+    """,
+    'tsmx_insert_contatos': """
+        INSERT INTO tbl_cliente_contatos (cliente_id, tipo_contato_id, contato)
+        SELECT * FROM unnest(%s::integer[], %s::integer[], %s::varchar[])
+        ON CONFLICT DO NOTHING
+        RETURNING 1
+    """,
+    'tsmx_insert_contato': """
+        INSERT INTO tbl_cliente_contatos (cliente_id, tipo_contato_id, contato)
+        VALUES (%s, %s, %s)
+        ON CONFLICT DO NOTHING
+        RETURNING id
+    """,
+    'tsmx_insert_contrato': """
+        INSERT INTO tbl_cliente_contratos (
+            cliente_id, plano_id, dia_vencimento, isento, 
+            endereco_logradouro, endereco_numero, endereco_bairro,
+            endereco_cidade, endereco_complemento, endereco_cep,
+            endereco_uf, status_id
+        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        ON CONFLICT DO NOTHING
+        RETURNING id
+    """
+}
+
+# HOT_STATEMENTS for asyncpg, with $1, $2, ... placeholders; asyncpg prepares and caches them per connection
+ASYNC_STATEMENTS = {name: numbered_params(sql) for name, sql in HOT_STATEMENTS.items()}
+
+def new_stats():
+    """Return zeroed import counters."""
+    return {
+        'total_clientes': 0,
+        'total_contatos': 0,
+        'total_contratos': 0,
+        'contratos_importados': 0,
+        'total_erros': 0,
+        'campos_descartados': 0
+    }
+
+def new_batch():
+    """Return an empty batch of rows waiting for the next commit."""
+    return {'rows': [], 'hashes': [], 'success': [], 'contacts': [], 'stats': new_stats()}
+
+def add_error(stats, errors_report, row, error_reason):
+    """Write a failed row to the errors report; error_reason is a reasons.Reason or a tuple of them."""
+    errors_report.write(row, error_reason)
+    stats['total_erros'] += 1
+
+def add_success(success_report, row):
+    """Write an imported row to the total records report."""
+    success_report.write(row)  # Empty reason for successful imports
+
+def insert_contacts_each(cursor, contacts):
+    """
+    Insert contacts one by one, each in its own savepoint, so a failing contact is logged
+    and skipped without losing the others. Returns the number inserted.
+    """
+    inserted = 0
+    for cliente_id, tipo_contato_id, contato in contacts:
+        cursor.execute("SAVEPOINT import_contato")
+        try:
+            execute_statement(cursor, HOT_STATEMENTS, 'tsmx_insert_contato', (cliente_id, tipo_contato_id, contato))
+            if cursor.fetchone():
+                inserted += 1
+            cursor.execute("RELEASE SAVEPOINT import_contato")
+        except Exception as e:
+            logger.error("Error inserting contact %s (type %s) for client %s: %s", contato, tipo_contato_id, cliente_id, e)
+            cursor.execute("ROLLBACK TO SAVEPOINT import_contato")
+            cursor.execute("RELEASE SAVEPOINT import_contato")
+    return inserted
+
+def insert_contacts(cursor, contacts):
+    """
+    Insert a batch's (cliente_id, tipo_contato_id, contato) triples a page at a time, after
+    dropping repeats of the table's unique key: as arrays to the prepared tsmx_insert_contatos,
+    or as multi-row INSERTs when statements are not prepared. Values that already exist are skipped by
+    the database; RETURNING tells how many were new without a round trip per contact.
+    If a page fails, the batch falls back to insert_contacts_each.
+    Returns (inserted, skipped).
+    """
+    unique = list(dict.fromkeys(contacts))
+    if not unique:
+        return 0, len(contacts)
+    cursor.execute("SAVEPOINT import_contatos")
+    try:
+        if 'tsmx_insert_contatos' in getattr(cursor.connection, 'prepared_statements', ()):
+            inserted = 0
+            for start in range(0, len(unique), CONTACT_PAGE_SIZE):
+                execute_statement(cursor, HOT_STATEMENTS, 'tsmx_insert_contatos',
+                                  [list(column) for column in zip(*unique[start:start + CONTACT_PAGE_SIZE])])
+                inserted += cursor.rowcount
+        else:
+            inserted = len(psycopg2.extras.execute_values(cursor, """
+                INSERT INTO tbl_cliente_contatos (cliente_id, tipo_contato_id, contato) VALUES %s
+                ON CONFLICT DO NOTHING
+                RETURNING 1
+            """, unique, page_size=CONTACT_PAGE_SIZE, fetch=True))
+        cursor.execute("RELEASE SAVEPOINT import_contatos")
+    except Exception as e:
+        logger.error("Error inserting %s contacts at once, retrying one by one: %s", len(unique), e)
+        cursor.execute("ROLLBACK TO SAVEPOINT import_contatos")
+        cursor.execute("RELEASE SAVEPOINT import_contatos")
+        inserted = insert_contacts_each(cursor, unique)
+    logger.debug("Contacts: %s inserted, %s skipped as duplicates", inserted, len(contacts) - inserted)
+    return inserted, len(contacts) - inserted
+
+def upsert_client(cursor, client):
+    """
+    Write a group's merged client and return (cliente_id, is_new). A client the merge policy
+    does not update is only looked up, and upserted if it is not there after all.
+    """
+    if not client['update']:
+        execute_statement(cursor, HOT_STATEMENTS, 'tsmx_cliente_id', (client['cpf_cnpj'],))
+        result = cursor.fetchone()
+        if result:
+            return result[0], False
+    execute_statement(cursor, HOT_STATEMENTS, 'tsmx_upsert_cliente', (
+        client['nome_razao_social'],
+        client['nome_fantasia'],
+        client['cpf_cnpj'],
+        client['data_nascimento'],
+        client['data_cadastro']
+    ))
+    return cursor.fetchone()
+
+def without_row(group, index):
+    """Drop a failed row from a group and merge the remaining rows' client again."""
+    client, items = group
+    items = [item for item in items if item[0] != index]
+    if items:
+        client = dict(merged_client(items, client['policy'], CONTACT_TYPES), update=client['update'])
+    return client, items
+
+def typed_contacts(contacts, lookups):
+    """A client's (label, contato) contacts as (label, tipo_contato_id, contato), skipping unknown types."""
+    return [(tipo, lookups.tipos_contato[tipo], contato) for tipo, contato in contacts
+            if lookups.tipos_contato.get(tipo) is not None]
+
+def import_group(cursor, group, batch, lookups, stats, errors_report):
+    """
+    Insert a group of prepared rows sharing one CPF/CNPJ (see dedup.ClientMerger) inside its
+    own savepoint: the merged client once, then each row's contract. The group's contacts join
+    the batch and are inserted together when it is committed.
+    A failing contract rolls the group back and it is retried without that row, so a rejected
+    row leaves nothing behind; the rest of the batch is kept either way.
+    """
+    client, items = group
+    cpf_cnpj = client['cpf_cnpj']
+    while items:
+        first_row = items[0][0] + 1
+        group_stats = new_stats()
+        cursor.execute("SAVEPOINT import_row")
+        try:
+            cliente_id, is_new = upsert_client(cursor, client)
+            if is_new:
+                logger.debug("Row %s: Inserted new client with CPF/CNPJ %s", first_row, cpf_cnpj)
+            else:
+                logger.debug("Row %s: Updated existing client with CPF/CNPJ %s", first_row, cpf_cnpj)
+        except Exception as e:
+            logger.error("Row %s: Error inserting client %s: %s", first_row, cpf_cnpj, e)
+            cursor.execute("ROLLBACK TO SAVEPOINT import_row")
+            cursor.execute("RELEASE SAVEPOINT import_row")
+            for index, row, record in items:
+                add_error(stats, errors_report, row, Reason(ReasonCode.CLIENT_INSERT_FAILED, str(e)))
+            return
+
+        # Insert one contract per row
+        success = []
+        failed = None
+        for index, row, record in items:
+            try:
+                execute_statement(cursor, HOT_STATEMENTS, 'tsmx_insert_contrato', (
+                    cliente_id,
+                    record.plano_id,
+                    record.dia_vencimento,
+                    record.isento,
+                    record.endereco_logradouro,
+                    record.endereco_numero,
+                    record.endereco_bairro,
+                    record.endereco_cidade,
+                    record.endereco_complemento,
+                    record.endereco_cep,
+                    record.endereco_uf,
+                    record.status_id
+                ))
+                if cursor.fetchone():
+                    group_stats['total_contratos'] += 1
+                    group_stats['contratos_importados'] += 1
+                    success.append(row)
+                else:
+                    logger.debug("Row %s: Skipped duplicate contract for client %s", index + 1, cpf_cnpj)
+            except Exception as e:
+                failed = (index, row, e)
+                break
+        if failed is None:
+            break
+
+        index, row, e = failed
+        logger.error("Row %s: Error inserting contract for client %s: %s", index + 1, cpf_cnpj, e)
+        cursor.execute("ROLLBACK TO SAVEPOINT import_row")
+        cursor.execute("RELEASE SAVEPOINT import_row")
+        add_error(stats, errors_report, row, Reason(ReasonCode.CONTRACT_INSERT_FAILED, str(e)))
+        client, items = without_row((client, items), index)
+    else:
+        return
+
+    cursor.execute("RELEASE SAVEPOINT import_row")
+    group_stats['total_clientes'] += len(items)
+    for index, row, record in items:
+        batch['rows'].append((index, row))
+        if record.row_hash is not None:
+            batch['hashes'].append(record.row_hash)
+    batch['success'].extend(success)
+    batch['contacts'].extend((cliente_id, tipo_contato_id, contato)
+                             for tipo, tipo_contato_id, contato in typed_contacts(client['contacts'], lookups))
+    for key, value in group_stats.items():
+        batch['stats'][key] += value
+
+def commit_batch(conn, batch, checkpoint, stats, errors_report, success_report):
+    """
+    Commit the rows kept in the current batch, with their contacts and checkpoint hashes, and move
+    their counters to the totals. If the commit fails, every row of the batch is reported as an error.
+    """
+    try:
+        with conn.cursor() as cursor:
+            batch['stats']['total_contatos'] += insert_contacts(cursor, batch['contacts'])[0]
+            checkpoint.record(cursor, batch['hashes'])
+        conn.commit()
+    except Exception as e:
+        logger.error("Error committing batch of %s rows: %s", len(batch['rows']), e)
+        conn.rollback()
+        for index, row in batch['rows']:
+            add_error(stats, errors_report, row, Reason(ReasonCode.COMMIT_FAILED, str(e)))
+        return
+    if not batch['rows']:
+        return
+    for key, value in batch['stats'].items():
+        stats[key] += value
+    for row in batch['success']:
+        add_success(success_report, row)
+    logger.debug("Committed batch of %s rows", len(batch['rows']))
+
+def report_lost_rows(batch, current, e, stats, errors_report):
+    """Report the rows of an uncommitted batch, and of the group being imported, as errors."""
+    lost_rows = batch['rows'] + ([item[:2] for item in current[1]] if current else [])
+    for index, row in lost_rows:
+        add_error(stats, errors_report, row, Reason(ReasonCode.BATCH_FAILED, str(e)))
+    return len(lost_rows)
+
+def import_rows(db, groups, batch_size, lookups, checkpoint, stats, errors_report, success_report):
+    """
+    Import groups of prepared rows one by one on a pooled connection, committing once batch_size
+    rows are pending. If the connection fails, the uncommitted rows are reported as errors; a lost
+    connection is replaced (up to MAX_RECONNECTS times) and the import goes on with the next group,
+    any other failure is re-raised.
+    """
+    conn = db.getconn()
+    cursor = conn.cursor()
+    batch = new_batch()
+    pending = 0
+    current = None
+    reconnects = 0
+    try:
+        # None marks the end of the groups, where the last batch is committed
+        for current in itertools.chain(groups, [None]):
+            last = current is None
+            try:
+                if not last:
+                    import_group(cursor, current, batch, lookups, stats, errors_report)
+                    pending += len(current[1])
+                    current = None
+                if pending and (last or pending >= batch_size):
+                    commit_batch(conn, batch, checkpoint, stats, errors_report, success_report)
+                    batch = new_batch()
+                    pending = 0
+            except Exception as e:
+                if not broken(conn) or reconnects == MAX_RECONNECTS:
+                    raise
+                lost = report_lost_rows(batch, current, e, stats, errors_report)
+                logger.error("Connection lost, %s uncommitted rows reported as errors: %s", lost, e)
+                batch = new_batch()
+                pending = 0
+                current = None
+                reconnects += 1
+                lost_conn, conn = conn, None
+                conn = db.reconnect(lost_conn)
+                cursor = conn.cursor()
+    except Exception as e:
+        logger.error("Error importing batch of %s rows: %s", len(batch['rows']), e)
+        if conn is not None and not broken(conn):
+            conn.rollback()
+        report_lost_rows(batch, current, e, stats, errors_report)
+        raise
+    finally:
+        if conn is not None:
+            db.putconn(conn)
+
+def shard_for(cpf_cnpj, loaders):
+    """Pick the loader for a CPF/CNPJ; all rows of one client go to the same loader."""
+    return zlib.crc32(cpf_cnpj.encode('utf-8')) % loaders
+
+def iter_queue(loader_queue):
+    """Yield items from a loader queue until the None sentinel."""
+    while True:
+        item = loader_queue.get()
+        if item is None:
+            return
+        yield item
+
+def run_loader(db, loader, batch_size, lookups, checkpoint):
+    """Loader thread: import the rows of one shard on its own pooled connection."""
+    started = time.perf_counter()
+    try:
+        import_rows(db, iter_queue(loader['queue']), batch_size, lookups, checkpoint,
+                    loader['stats'], loader['errors_report'], loader['success_report'])
+    except Exception as e:
+        logger.error("Loader %s: stopped after error: %s", loader['id'], e)
+        # Keep draining so the dispatcher never blocks; report the remaining rows
+        for client, items in iter_queue(loader['queue']):
+            for index, row, record in items:
+                add_error(loader['stats'], loader['errors_report'], row, Reason(ReasonCode.LOADER_FAILED, loader['id'], str(e)))
+    finally:
+        loader['elapsed'] = time.perf_counter() - started
+
+def parallel_import(db, grouped_chunks, loaders, batch_size, lookups, checkpoint, stats, errors_report, success_report):
+    """
+    Import groups of prepared rows with several loader threads, each on its own connection of db.
+    Groups are sharded by a hash of the cleaned CPF/CNPJ so upserts of one client never race.
+    Plans and statuses were resolved by resolve_lookups, so loaders only read the shared lookups.
+    Loaders write to the shared reports as they commit, so report rows follow commit order.
+    """
+    workers = []
+    for loader_id in range(loaders):
+        loader = {
+            'id': loader_id + 1,
+            'queue': queue.Queue(maxsize=LOADER_QUEUE_SIZE),
+            'stats': new_stats(),
+            'errors_report': errors_report,
+            'success_report': success_report,
+            'rows': 0,
+            'elapsed': 0.0
+        }
+        loader['thread'] = threading.Thread(target=run_loader, args=(db, loader, batch_size, lookups, checkpoint),
+                                            name=f"loader-{loader['id']}", daemon=True)
+        loader['thread'].start()
+        workers.append(loader)
+
+    try:
+        for chunk, groups in grouped_chunks:
+            for group in groups:
+                loader = workers[shard_for(group[0]['cpf_cnpj'], loaders)]
+                loader['rows'] += len(group[1])
+                loader['queue'].put(group)
+    finally:
+        for loader in workers:
+            loader['queue'].put(None)
+        for loader in workers:
+            loader['thread'].join()
+
+    for loader in workers:
+        for key, value in loader['stats'].items():
+            stats[key] += value
+        rate = loader['rows'] / loader['elapsed'] if loader['elapsed'] else 0.0
+        logger.info("Loader %s: %s rows in %.1fs (%.0f rows/s), %s contracts imported, %s errors",
+                    loader['id'], loader['rows'], loader['elapsed'], rate,
+                    loader['stats']['contratos_importados'], loader['stats']['total_erros'])
+
+def async_available():
+    """Whether asyncpg is installed, so the async loaders can run."""
+    return asyncpg is not None
+
+def asyncpg_params():
+    """DB_PARAMS as asyncpg connection arguments."""
+    return {
+        'database': DB_PARAMS['dbname'],
+        'user': DB_PARAMS['user'],
+        'password': DB_PARAMS['password'],
+        'host': DB_PARAMS['host'],
+        'port': int(DB_PARAMS['port'])
+    }
+
+def as_timestamp(value):
+    """asyncpg binds only datetimes to timestamp columns; a date becomes its midnight."""
+    if isinstance(value, date) and not isinstance(value, datetime):
+        return datetime.combine(value, datetime.min.time())
+    return value
+
+async def upsert_client_async(conn, client):
+    """upsert_client on an asyncpg connection; returns (cliente_id, is_new)."""
+    if not client['update']:
+        cliente_id = await conn.fetchval(ASYNC_STATEMENTS['tsmx_cliente_id'], client['cpf_cnpj'])
+        if cliente_id is not None:
+            return cliente_id, False
+    return await conn.fetchrow(ASYNC_STATEMENTS['tsmx_upsert_cliente'], client['nome_razao_social'], client['nome_fantasia'],
+                               client['cpf_cnpj'], client['data_nascimento'], as_timestamp(client['data_cadastro']))
+
+async def insert_contacts_async(conn, cliente_id, contacts):
+    """
+    Insert a group's contacts with one multi-row INSERT over unnest'ed arrays, falling back to
+    one INSERT per contact (each in its own savepoint) if it fails. Returns the number inserted.
+    """
+    if not contacts:
+        return 0
+    try:
+        async with conn.transaction():
+            return len(await conn.fetch(ASYNC_STATEMENTS['tsmx_insert_contatos'], [cliente_id] * len(contacts),
+                                        [tipo_contato_id for tipo, tipo_contato_id, contato in contacts],
+                                        [contato for tipo, tipo_contato_id, contato in contacts]))
+    except Exception as e:
+        logger.error("Error inserting %s contacts for client %s at once, retrying one by one: %s", len(contacts), cliente_id, e)
+    inserted = 0
+    for tipo, tipo_contato_id, contato in contacts:
+        try:
+            async with conn.transaction():
+                contato_id = await conn.fetchval(ASYNC_STATEMENTS['tsmx_insert_contato'], cliente_id, tipo_contato_id, contato)
+            if contato_id is not None:
+                inserted += 1
+        except Exception as e:
+            logger.error("Error inserting %s contact %s for client %s: %s", tipo, contato, cliente_id, e)
+    return inserted
+
+async def import_group_async(pool, group, lookups, checkpoint, stats, errors_report, success_report):
+    """
+    Insert a group of prepared rows sharing one CPF/CNPJ in its own transaction on a pooled
+    asyncpg connection, with the rows' checkpoint hashes. Same steps and counters as
+    import_group, with the group's contacts inserted by insert_contacts_async: a failing
+    contact rolls back only itself, a failing contract rolls the group back for a retry
+    without that row, and any other failure rolls back the group.
+    """
+    client, items = group
+    cpf_cnpj = client['cpf_cnpj']
+    while items:
+        first_row = items[0][0] + 1
+        group_stats = new_stats()
+        success = []
+        failed = None
+        step = ReasonCode.CLIENT_INSERT_FAILED
+        try:
+            async with pool.acquire() as conn:
+                async with conn.transaction():
+                    cliente_id, is_new = await upsert_client_async(conn, client)
+                    if is_new:
+                        logger.debug("Row %s: Inserted new client with CPF/CNPJ %s", first_row, cpf_cnpj)
+                    else:
+                        logger.debug("Row %s: Updated existing client with CPF/CNPJ %s", first_row, cpf_cnpj)
+
+                    group_stats['total_contatos'] += await insert_contacts_async(conn, cliente_id, typed_contacts(client['contacts'], lookups))
+
+                    for index, row, record in items:
+                        try:
+                            contrato_id = await conn.fetchval(
+                                ASYNC_STATEMENTS['tsmx_insert_contrato'], cliente_id, record.plano_id,
+                                record.dia_vencimento, record.isento, record.endereco_logradouro,
+                                record.endereco_numero, record.endereco_bairro, record.endereco_cidade,
+                                record.endereco_complemento, record.endereco_cep, record.endereco_uf,
+                                record.status_id)
+                        except Exception as e:
+                            failed = (index, row, e)
+                            raise
+                        if contrato_id is not None:
+                            group_stats['total_contratos'] += 1
+                            group_stats['contratos_importados'] += 1
+                            success.append(row)
+                        else:
+                            logger.debug("Row %s: Skipped duplicate contract for client %s", index + 1, cpf_cnpj)
+                    await checkpoint.record_async(conn, [record.row_hash for index, row, record in items
+                                                         if record.row_hash is not None])
+                    step = ReasonCode.COMMIT_FAILED
+        except Exception as e:
+            if failed is None:
+                logger.error("Row %s: Error importing client %s (%s): %s", first_row, cpf_cnpj, step.name, e)
+                for index, row, record in items:
+                    add_error(stats, errors_report, row, Reason(step, str(e)))
+                return
+            index, row, e = failed
+            logger.error("Row %s: Error inserting contract for client %s: %s", index + 1, cpf_cnpj, e)
+            add_error(stats, errors_report, row, Reason(ReasonCode.CONTRACT_INSERT_FAILED, str(e)))
+            client, items = without_row((client, items), index)
+            continue
+        break
+    else:
+        return
+
+    group_stats['total_clientes'] += len(items)
+    for key, value in group_stats.items():
+        stats[key] += value
+    for row in success:
+        add_success(success_report, row)
+
+async def async_load(db, grouped_chunks, connections, lookups, checkpoint, stats, errors_report, success_report):
+    """
+    Event loop side of async_import. The next chunk is read and validated in a thread while
+    queued groups keep loading; a semaphore bounds the groups in flight, so the reader is paused
+    when the database falls behind. Groups of one CPF/CNPJ run one at a time, in input order.
+    The asyncpg connections get the session settings of db; the pool replaces lost connections.
+    """
+    loop = asyncio.get_running_loop()
+    slots = asyncio.Semaphore(connections * ASYNC_PENDING_PER_CONNECTION)
+    client_locks = {}
+    pending = set()
+    chunks = iter(grouped_chunks)
+
+    async def run_group(group, client_lock):
+        try:
+            async with client_lock[0]:
+                await import_group_async(pool, group, lookups, checkpoint, stats, errors_report, success_report)
+        finally:
+            client_lock[1] -= 1
+            if not client_lock[1]:
+                del client_locks[group[0]['cpf_cnpj']]
+            slots.release()
+
+    async def init(connection):
+        # Async statements are timed in the same histograms as the psycopg2 ones
+        if db.metrics is not None:
+            connection.add_query_logger(db.metrics.query_logger)
+
+    pool = await asyncpg.create_pool(min_size=connections, max_size=connections, init=init,
+                                     server_settings=db.settings, **asyncpg_params())
+    try:
+        while True:
+            item = await loop.run_in_executor(None, next, chunks, None)
+            if item is None:
+                break
+            chunk, groups = item
+            for group in groups:
+                await slots.acquire()
+                client_lock = client_locks.setdefault(group[0]['cpf_cnpj'], [asyncio.Lock(), 0])
+                client_lock[1] += 1
+                task = asyncio.create_task(run_group(group, client_lock))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+    finally:
+        if pending:
+            await asyncio.gather(*pending)
+        await pool.close()
+
+def async_import(db, grouped_chunks, connections, lookups, checkpoint, stats, errors_report, success_report):
+    """
+    Import groups of prepared rows with asyncio over a pool of asyncpg connections, one
+    transaction per group. While one group waits on the network the others keep going, so
+    throughput depends much less on round-trip latency than the row-by-row mode.
+    Counters and reports match import_rows. The reader thread still counts validation and
+    lookup errors into stats, so the groups count into their own dict, added to stats once
+    the loop is done, like the loaders of parallel_import.
+    """
+    started = time.perf_counter()
+    loaded = new_stats()
+    try:
+        asyncio.run(async_load(db, grouped_chunks, connections, lookups, checkpoint,
+                               loaded, errors_report, success_report))
+    finally:
+        for key, value in loaded.items():
+            stats[key] += value
+    elapsed = time.perf_counter() - started
+    logger.info("Async load: %s connections, %s contracts imported in %.1fs", connections,
+                stats['contratos_importados'], elapsed)
+
+def copy_text(value):
+    """Format a value for COPY ... FROM STDIN in text format."""
+    if value is None:
+        return '\\N'
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+def load_staged_chunk(cursor, groups, lookups):
+    """
+    COPY groups of prepared rows into the staging table and resolve them with set-based upserts.
+    Each row is staged with its group's merged client fields, whether the client is updated and
+    the plano_id and status_id found by resolve_lookups.
+    Returns the number of contacts inserted and the row indexes whose contract was inserted.
+    """
+    buffer = io.StringIO()
+    for client, items in groups:
+        for index, row, record in items:
+            values = ([index] + [client[column] if column in CLIENT_FIELDS else getattr(record, column)
+                                 for column in STAGING_COLUMNS[1:]] +
+                      [client['update'], record.plano_id, record.status_id])
+            buffer.write('\t'.join(copy_text(value) for value in values) + '\n')
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY stg_import ({', '.join(STAGING_COLUMNS)}, atualiza_cliente, plano_id, status_id) FROM STDIN",
+                       buffer)
+
+    # Rows of one CPF/CNPJ carry the same merged client; clients the merge policy keeps are only inserted if missing
+    cursor.execute("""
+        INSERT INTO tbl_clientes (nome_razao_social, nome_fantasia, cpf_cnpj, data_nascimento, data_cadastro)
+        SELECT DISTINCT ON (cpf_cnpj) nome_razao_social, nome_fantasia, cpf_cnpj, data_nascimento, data_cadastro
+        FROM stg_import
+        WHERE atualiza_cliente
+        ORDER BY cpf_cnpj
+        ON CONFLICT (cpf_cnpj) DO UPDATE 
+        SET nome_razao_social = EXCLUDED.nome_razao_social,
+            nome_fantasia = EXCLUDED.nome_fantasia,
+            data_nascimento = EXCLUDED.data_nascimento,
+            data_cadastro = EXCLUDED.data_cadastro
+    """)
+    cursor.execute("""
+        INSERT INTO tbl_clientes (nome_razao_social, nome_fantasia, cpf_cnpj, data_nascimento, data_cadastro)
+        SELECT DISTINCT ON (cpf_cnpj) nome_razao_social, nome_fantasia, cpf_cnpj, data_nascimento, data_cadastro
+        FROM stg_import
+        WHERE NOT atualiza_cliente
+        ORDER BY cpf_cnpj
+        ON CONFLICT (cpf_cnpj) DO NOTHING
+    """)
+
+    # Contact types missing from tbl_tipos_contato have no ID and are left out
+    contact_values = ', '.join(f"(%s::integer, s.{key})" for label, key in CONTACT_TYPES)
+    cursor.execute(f"""
+        INSERT INTO tbl_cliente_contatos (cliente_id, tipo_contato_id, contato)
+        SELECT c.id, v.tipo_contato_id, v.contato
+        FROM stg_import s
+        JOIN tbl_clientes c ON c.cpf_cnpj = s.cpf_cnpj
+        CROSS JOIN LATERAL (VALUES {contact_values}) AS v(tipo_contato_id, contato)
+        WHERE v.tipo_contato_id IS NOT NULL AND v.contato IS NOT NULL AND v.contato <> ''
+        ORDER BY s.src_row
+        ON CONFLICT DO NOTHING
+    """, [lookups.tipos_contato.get(label) for label, key in CONTACT_TYPES])
+    contatos_inserted = cursor.rowcount
+
+    # Contract IDs are drawn up front so inserted contracts can be mapped back to their rows
+    cursor.execute("UPDATE stg_import SET contrato_id = nextval('public.tbl_cliente_contratos_id_seq')")
+    cursor.execute("""
+        INSERT INTO tbl_cliente_contratos (
+            id, cliente_id, plano_id, dia_vencimento, isento, 
+            endereco_logradouro, endereco_numero, endereco_bairro,
+            endereco_cidade, endereco_complemento, endereco_cep,
+            endereco_uf, status_id
+        )
+        SELECT s.contrato_id, c.id, s.plano_id, s.dia_vencimento, s.isento,
+               s.endereco_logradouro, s.endereco_numero, s.endereco_bairro,
+               s.endereco_cidade, s.endereco_complemento, s.endereco_cep,
+               s.endereco_uf, s.status_id
+        FROM stg_import s
+        JOIN tbl_clientes c ON c.cpf_cnpj = s.cpf_cnpj
+        ORDER BY s.src_row
+        ON CONFLICT DO NOTHING
+        RETURNING id
+    """)
+    inserted_ids = {contrato_id for (contrato_id,) in cursor.fetchall()}
+    cursor.execute("SELECT src_row, contrato_id FROM stg_import")
+    inserted_rows = {src_row for src_row, contrato_id in cursor.fetchall() if contrato_id in inserted_ids}
+    return contatos_inserted, inserted_rows
+
+def create_staging(conn):
+    """Create the session's stg_import staging table, if it does not exist yet."""
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS stg_import (
+                src_row bigint NOT NULL,
+                cpf_cnpj varchar(18) NOT NULL,
+                nome_razao_social varchar(255) NOT NULL,
+                nome_fantasia varchar(255),
+                data_nascimento date,
+                data_cadastro timestamp,
+                celular varchar(255),
+                telefone varchar(255),
+                email varchar(255),
+                plano varchar(255),
+                plano_valor numeric(15,2),
+                status varchar(50),
+                dia_vencimento integer,
+                isento boolean,
+                endereco_logradouro varchar(255),
+                endereco_numero varchar(15),
+                endereco_bairro varchar(255),
+                endereco_cidade varchar(255),
+                endereco_complemento varchar(500),
+                endereco_cep varchar(9),
+                endereco_uf varchar(2),
+                atualiza_cliente boolean NOT NULL,
+                plano_id integer NOT NULL,
+                status_id integer NOT NULL,
+                contrato_id bigint
+            ) ON COMMIT DELETE ROWS
+        """)
+    conn.commit()
+
+def bulk_import(db, grouped_chunks, batch_size, lookups, checkpoint, stats, errors_report, success_report):
+    """
+    Import each chunk of grouped rows through a COPY-loaded staging table. A chunk that fails
+    is imported row by row (on another pooled connection); if the failure lost the connection,
+    the next chunks go through a new one, up to MAX_RECONNECTS times.
+    """
+    conn = db.getconn()
+    reconnects = 0
+    try:
+        create_staging(conn)
+        for chunk, groups in grouped_chunks:
+            start = chunk.index[0]
+            prepared = [item for client, items in groups for item in items]
+            if not prepared:
+                continue
+
+            try:
+                with conn.cursor() as cursor:
+                    contatos_inserted, inserted_rows = load_staged_chunk(cursor, groups, lookups)
+                    checkpoint.record(cursor, [record.row_hash for index, row, record in prepared])
+                conn.commit()
+            except Exception as e:
+                # Fall back to row-by-row so every failing row gets its own error reason
+                logger.error("Bulk load failed for rows %s-%s, retrying row by row: %s", start + 1, start + len(chunk), e)
+                if not broken(conn):
+                    conn.rollback()
+                elif reconnects < MAX_RECONNECTS:
+                    reconnects += 1
+                    lost_conn, conn = conn, None
+                    conn = db.reconnect(lost_conn)
+                    create_staging(conn)
+                else:
+                    raise
+                import_rows(db, groups, batch_size, lookups, checkpoint, stats, errors_report, success_report)
+                continue
+
+            stats['total_clientes'] += len(prepared)
+            stats['total_contatos'] += contatos_inserted
+            stats['total_contratos'] += len(inserted_rows)
+            stats['contratos_importados'] += len(inserted_rows)
+            for index, row, record in prepared:
+                if index in inserted_rows:
+                    add_success(success_report, row)
+                else:
+                    logger.debug("Row %s: Skipped duplicate contract for client %s", index + 1, record.cpf_cnpj)
+            logger.info("Bulk loaded rows %s-%s: %s staged, %s contracts inserted", start + 1, start + len(chunk), len(prepared), len(inserted_rows))
+    finally:
+        if conn is not None:
+            db.putconn(conn)
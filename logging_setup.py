@@ -0,0 +1,153 @@
+import atexit
+import logging
+import logging.handlers
+import multiprocessing
+import os
+import queue
+import threading
+from collections import Counter
+
+# Records with the same message template passed per run before sampling kicks in
+LOG_SAMPLE_LIMIT = 100
+
+# Distinct templates tracked by the sampler; messages past this are passed unsampled
+LOG_SAMPLE_TEMPLATES = 10000
+
+# Set to 1 to log every row and field (per-row trace), like --trace
+TRACE_ENV = 'TSMX_TRACE'
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+_state = {}
+
+class SamplingFilter(logging.Filter):
+    """
+    Let the first LOG_SAMPLE_LIMIT records of each message template through and count the rest.
+    Only INFO and WARNING are sampled: errors always pass, and so does DEBUG, which is only
+    enabled when per-row tracing was asked for. Templates are the unformatted messages (the
+    sample_key of records from pool workers), so this only groups correctly for calls that pass
+    their values as arguments. Loader threads and the worker listener log concurrently, so the
+    counts are updated under a lock.
+    """
+
+    def __init__(self, limit=LOG_SAMPLE_LIMIT):
+        super().__init__()
+        self.limit = limit
+        self.seen = Counter()
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno < logging.INFO or record.levelno >= logging.ERROR:
+            return True
+        template = getattr(record, 'sample_key', record.msg)
+        with self._lock:
+            if template not in self.seen and len(self.seen) >= LOG_SAMPLE_TEMPLATES:
+                return True
+            self.seen[template] += 1
+            return self.seen[template] <= self.limit
+
+    def suppressed(self):
+        """Return {template: suppressed count} for templates over the limit."""
+        with self._lock:
+            return {msg: count - self.limit for msg, count in self.seen.items() if count > self.limit}
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread."""
+
+    def prepare(self, record):
+        # The queue is in-process, so the record can go as is and be formatted in the background
+        return record
+
+class WorkerQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler of pool workers. Records cross to the main process formatted, keeping their
+    unformatted message as sample_key so the main process samples them by template.
+    """
+
+    def prepare(self, record):
+        template = record.msg
+        record = super().prepare(record)
+        record.sample_key = template
+        return record
+
+def trace_enabled():
+    """Whether per-row trace logging was requested through the environment."""
+    return os.environ.get(TRACE_ENV, '').strip().lower() in ('1', 'true', 'yes', 'sim')
+
+def start_listener(log_file):
+    """Create the queue, the output handlers and the background listener."""
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = [logging.FileHandler(log_file), logging.StreamHandler()]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return log_queue, listener
+
+def start_worker_listener(handler, context=None):
+    """
+    Create the queue pool workers send their records to and a listener passing them to handler.
+    The queue belongs to the pool's multiprocessing context (the default one if None).
+    """
+    log_queue = (context or multiprocessing).Queue()
+    listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    listener.start()
+    return log_queue, listener
+
+def init_worker(log_queue, level):
+    """Pool worker initializer: send every record, from level up, to the main process through log_queue."""
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(WorkerQueueHandler(log_queue))
+    root.setLevel(level)
+
+def worker_logging():
+    """
+    (initializer, initargs) that set up logging in ProcessPoolExecutor workers, started or
+    spawned alike: their records go through a multiprocessing queue to the main process,
+    where they are sampled and written like its own. (None, ()) before setup_logging.
+    """
+    if 'handler' not in _state:
+        return None, ()
+    if 'worker_queue' not in _state:
+        log_queue, listener = start_worker_listener(_state['handler'])
+        _state.update(worker_queue=log_queue, worker_listener=listener)
+        # Registered after setup_logging's: stops first, passing its last records on
+        atexit.register(listener.stop)
+    return init_worker, (_state['worker_queue'], logging.getLogger().level)
+
+def log_suppressed():
+    """Log how many records each sampled template dropped."""
+    for msg, count in _state['filter'].suppressed().items():
+        logging.getLogger(__name__).info("Sampled log message, %d more occurrences suppressed: %s", count, msg)
+
+def setup_logging(log_file, trace=None):
+    """
+    Route all logging through a QueueHandler to a background QueueListener writing to
+    log_file and the console. Per-row messages are DEBUG and only emitted with trace;
+    repeated warnings are sampled. The first call wins; later calls only adjust trace.
+    """
+    if trace is None:
+        trace = trace_enabled()
+    root = logging.getLogger()
+    if 'handler' in _state:
+        set_trace(trace or root.level <= logging.DEBUG)
+        return
+
+    log_queue, listener = start_listener(log_file)
+    sampling = SamplingFilter()
+    handler = DeferredQueueHandler(log_queue)
+    handler.addFilter(sampling)
+    root.addHandler(handler)
+    _state.update(handler=handler, listener=listener, filter=sampling, log_file=log_file)
+    set_trace(trace)
+
+    # atexit runs in reverse order: summary first, then the listener flushes and stops
+    atexit.register(listener.stop)
+    atexit.register(log_suppressed)
+
+def set_trace(enabled):
+    """Turn per-row trace logging on or off."""
+    logging.getLogger().setLevel(logging.DEBUG if enabled else logging.INFO)
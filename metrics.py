@@ -0,0 +1,260 @@
+import bisect
+import cProfile
+import io
+import json
+import logging
+import pstats
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from functools import lru_cache
+import psycopg2.extensions
+from pipeline import StageTimer
+from reasons import kind_name
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds, in seconds, of the SQL statement latency histogram buckets
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Characters of a statement looked at to name its type
+STATEMENT_PREFIX = 200
+
+# Prefix of the Prometheus metric names
+PROMETHEUS_PREFIX = 'tsmx_import'
+
+# Functions listed in the log when a run is profiled
+PROFILE_TOP = 25
+
+FROM_TABLE = re.compile(r'\bFROM\s+(\w+)', re.IGNORECASE)
+TABLE_NAME = re.compile(r'\w*')
+
+@lru_cache(maxsize=1024)
+def _statement_type(prefix):
+    words = prefix.split()
+    if not words:
+        return 'EMPTY'
+    keyword = words[0].upper()
+    if keyword in ('INSERT', 'DELETE') and len(words) > 2:
+        return f"{keyword} {TABLE_NAME.match(words[2]).group()}"
+    if keyword in ('UPDATE', 'COPY', 'EXECUTE') and len(words) > 1:
+        return f"{keyword} {TABLE_NAME.match(words[1]).group()}"
+    if keyword == 'SELECT':
+        table = FROM_TABLE.search(prefix)
+        return f"SELECT {table.group(1)}" if table else 'SELECT'
+    return keyword.rstrip(';')
+
+def statement_type(sql):
+    """
+    Name a statement by its command and target table, e.g. 'INSERT tbl_clientes' or 'COMMIT';
+    prepared statements by name, e.g. 'EXECUTE tsmx_upsert_cliente'.
+    """
+    if isinstance(sql, bytes):
+        sql = sql[:STATEMENT_PREFIX].decode('utf-8', 'replace')
+    return _statement_type(sql[:STATEMENT_PREFIX])
+
+class LatencyHistogram:
+    """Count, total, maximum and bucketed latencies of one statement type."""
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.seconds = 0.0
+        self.max = 0.0
+        self.rows = 0
+
+    def observe(self, seconds, rows=None):
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.count += 1
+        self.seconds += seconds
+        self.max = max(self.max, seconds)
+        if rows is not None and rows > 0:
+            self.rows += rows
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'seconds': round(self.seconds, 6),
+            'mean_ms': round(1000 * self.seconds / self.count, 3) if self.count else 0.0,
+            'max_ms': round(1000 * self.max, 3),
+            'rows': self.rows,
+            'rows_per_s': round(self.rows / self.seconds, 1) if self.seconds else 0.0,
+            'buckets': {str(bound): count for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), self.buckets)}
+        }
+
+class RunMetrics:
+    """
+    Metrics of one import run: the StageTimer of the pipeline stages, a latency histogram
+    per SQL statement type (fed by TimedConnection and the asyncpg query logger) and,
+    when the run ends, the counters and rejected rows per reason kind.
+    Statement latencies are recorded from every loader thread, so they are kept under a lock.
+    """
+
+    def __init__(self):
+        self.timer = StageTimer()
+        self.statements = {}
+        self._lock = threading.Lock()
+
+    def observe(self, sql, seconds, rows=None):
+        """Record one statement's latency and affected rows."""
+        name = statement_type(sql)
+        with self._lock:
+            histogram = self.statements.get(name)
+            if histogram is None:
+                histogram = self.statements[name] = LatencyHistogram()
+            histogram.observe(seconds, rows)
+
+    def query_logger(self, record):
+        """asyncpg query logger (Connection.add_query_logger) feeding the statement histograms."""
+        self.observe(record.query, record.elapsed)
+
+    def as_dict(self, stats, rejected_reasons=()):
+        """
+        The run's metrics as a JSON-ready dict: counters, stages (seconds, share, rows, rows/s),
+        statements (latency histograms) and rejections (rows per reason kind).
+        rejected_reasons is a Counter of (code, field) reason kinds, like ReportWriter.reasons.
+        """
+        total = sum(self.timer.elapsed.values())
+        stages = {}
+        for name, elapsed in self.timer.elapsed.items():
+            rows = self.timer.rows[name]
+            stages[name] = {
+                'seconds': round(elapsed, 6),
+                'share': round(elapsed / total, 4) if total else 0.0,
+                'rows': rows,
+                'rows_per_s': round(rows / elapsed, 1) if rows and elapsed else 0.0
+            }
+        rejections = Counter({kind_name(kind): count for kind, count in dict(rejected_reasons).items()})
+        with self._lock:
+            statements = {name: histogram.as_dict() for name, histogram in sorted(self.statements.items())}
+        return {
+            'counters': dict(stats),
+            'stages': stages,
+            'statements': statements,
+            'rejections': dict(rejections.most_common())
+        }
+
+    def log_summary(self, stats, rejected_reasons=()):
+        """Log the stage summary, then each statement type and the rejections per reason kind."""
+        self.timer.log_summary()
+        snapshot = self.as_dict(stats, rejected_reasons)
+        for name, info in sorted(snapshot['statements'].items(), key=lambda item: -item[1]['seconds']):
+            logger.info("SQL %s: %s statements, %.2fs, %.2fms mean, %.2fms max, %s rows",
+                        name, info['count'], info['seconds'], info['mean_ms'], info['max_ms'], info['rows'])
+        for kind, count in snapshot['rejections'].items():
+            logger.info("Linhas rejeitadas por '%s': %s", kind, count)
+        return snapshot
+
+def write_json(path, snapshot):
+    """Write a metrics dict to a JSON file."""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f, indent=2, ensure_ascii=False, default=str)
+    logger.info("Metrics saved to '%s'", path)
+
+def prometheus_label(value):
+    """Escape a Prometheus label value."""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def write_prometheus(path, snapshot):
+    """Write a metrics dict in the Prometheus text exposition format (e.g. for node_exporter's textfile collector)."""
+    lines = []
+
+    def family(name, metric_type, help_text, samples):
+        lines.append(f"# HELP {PROMETHEUS_PREFIX}_{name} {help_text}")
+        lines.append(f"# TYPE {PROMETHEUS_PREFIX}_{name} {metric_type}")
+        for suffix, labels, value in samples:
+            label_text = ','.join(f'{key}="{prometheus_label(label)}"' for key, label in labels)
+            lines.append(f"{PROMETHEUS_PREFIX}_{name}{suffix}{{{label_text}}} {value}")
+
+    family('counter', 'gauge', "Import counters of the run.",
+           [('', [('counter', key)], value) for key, value in snapshot['counters'].items()])
+    family('stage_seconds', 'gauge', "Wall time per pipeline stage.",
+           [('', [('stage', name)], info['seconds']) for name, info in snapshot['stages'].items()])
+    family('stage_rows', 'gauge', "Rows handled per pipeline stage.",
+           [('', [('stage', name)], info['rows']) for name, info in snapshot['stages'].items()])
+    samples = []
+    for name, info in snapshot['statements'].items():
+        cumulative = 0
+        for bound, count in info['buckets'].items():
+            cumulative += count
+            samples.append(('_bucket', [('statement', name), ('le', bound)], cumulative))
+        samples.append(('_sum', [('statement', name)], info['seconds']))
+        samples.append(('_count', [('statement', name)], info['count']))
+    family('statement_seconds', 'histogram', "SQL statement latency per statement type.", samples)
+    family('statement_rows', 'gauge', "Rows affected per SQL statement type.",
+           [('', [('statement', name)], info['rows']) for name, info in snapshot['statements'].items()])
+    family('rejected_rows', 'gauge', "Rejected rows per reason kind.",
+           [('', [('reason', kind)], count) for kind, count in snapshot['rejections'].items()])
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+    logger.info("Prometheus metrics saved to '%s'", path)
+
+@contextmanager
+def profiled(path=None):
+    """
+    Run the enclosed block under cProfile when path is set: the stats are dumped to path
+    (for pstats or snakeviz) and the top functions by cumulative time are logged.
+    Only the calling thread is profiled; validation worker processes and loader threads are not.
+    """
+    if not path:
+        yield
+        return
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield
+    finally:
+        profile.disable()
+        profile.dump_stats(path)
+        output = io.StringIO()
+        pstats.Stats(profile, stream=output).sort_stats('cumulative').print_stats(PROFILE_TOP)
+        logger.info("Profile saved to '%s':\n%s", path, output.getvalue())
+
+class TimedCursor(psycopg2.extensions.cursor):
+    """Cursor reporting the latency and row count of each statement to its connection's metrics."""
+
+    def execute(self, query, vars=None):
+        metrics = self.connection.metrics
+        if metrics is None:
+            return super().execute(query, vars)
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            metrics.observe(query, time.perf_counter() - started, self.rowcount)
+
+    def copy_expert(self, sql, file, size=8192):
+        metrics = self.connection.metrics
+        if metrics is None:
+            return super().copy_expert(sql, file, size)
+        started = time.perf_counter()
+        try:
+            return super().copy_expert(sql, file, size)
+        finally:
+            metrics.observe(sql, time.perf_counter() - started, self.rowcount)
+
+class TimedConnection(psycopg2.extensions.connection):
+    """
+    psycopg2 connection (connection_factory) whose cursors and commits are timed, in the
+    manner of psycopg2.extras.LoggingConnection. Call initialize(metrics) after connecting;
+    until then it behaves like a plain connection.
+    """
+    metrics = None
+
+    def initialize(self, metrics):
+        self.metrics = metrics
+
+    def cursor(self, *args, **kwargs):
+        kwargs.setdefault('cursor_factory', TimedCursor)
+        return super().cursor(*args, **kwargs)
+
+    def commit(self):
+        if self.metrics is None:
+            return super().commit()
+        started = time.perf_counter()
+        try:
+            return super().commit()
+        finally:
+            self.metrics.observe('COMMIT', time.perf_counter() - started)
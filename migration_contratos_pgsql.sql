@@ -0,0 +1,38 @@
+--
+-- Migration: natural key and FK indexes for tbl_cliente_contratos
+--
+-- Databases created from schema_database_pgsql.sql before the contract key existed may hold
+-- duplicate contracts from reruns of import_data.py. This collapses them, keeping the oldest
+-- contract of each (cliente_id, plano_id, endereco_cep, endereco_logradouro, endereco_numero,
+-- endereco_complemento), and adds the unique key and the indexes from the schema.
+-- Requires PostgreSQL 15+ (UNIQUE NULLS NOT DISTINCT). Safe to run more than once.
+--
+
+BEGIN;
+
+-- Block concurrent imports while duplicates are removed and the key is built
+LOCK TABLE public.tbl_cliente_contratos IN SHARE ROW EXCLUSIVE MODE;
+
+DELETE FROM public.tbl_cliente_contratos c
+USING (
+    SELECT id, row_number() OVER (
+        PARTITION BY cliente_id, plano_id, endereco_cep, endereco_logradouro, endereco_numero, endereco_complemento
+        ORDER BY id
+    ) AS n
+    FROM public.tbl_cliente_contratos
+) d
+WHERE c.id = d.id AND d.n > 1;
+
+ALTER TABLE ONLY public.tbl_cliente_contratos
+    DROP CONSTRAINT IF EXISTS tbl_cliente_contratos_contrato_key;
+
+ALTER TABLE ONLY public.tbl_cliente_contratos
+    ADD CONSTRAINT tbl_cliente_contratos_contrato_key UNIQUE NULLS NOT DISTINCT (cliente_id, plano_id, endereco_cep, endereco_logradouro, endereco_numero, endereco_complemento);
+
+CREATE INDEX IF NOT EXISTS tbl_cliente_contratos_plano_id_idx ON public.tbl_cliente_contratos USING btree (plano_id);
+
+CREATE INDEX IF NOT EXISTS tbl_cliente_contratos_status_id_idx ON public.tbl_cliente_contratos USING btree (status_id);
+
+COMMIT;
+
+ANALYZE public.tbl_cliente_contratos;
@@ -0,0 +1,154 @@
+import re
+import unicodedata
+from collections import Counter
+from datetime import date, datetime
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+from dateutil.parser import parse as parse_date
+from reasons import Reason, ReasonCode
+
+# Distinct values remembered per memoized normalizer (cities, CEPs, plans, statuses repeat a lot)
+NORMALIZER_CACHE_SIZE = 65536
+
+NON_DIGITS = re.compile(r'[^\d]')
+EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+
+# Day 0 of Excel serial dates (1900 date system, including its fake 1900-02-29)
+EXCEL_EPOCH = datetime(1899, 12, 30)
+
+# Excel serials converted with array arithmetic (datetime64[ns] covers 1677-2262); others take the slow path
+EXCEL_SERIAL_RANGE = (-80000, 100000)
+
+# Date strings parsed with an exact format before falling back to dateutil: (pattern, format, prefix length)
+DATE_FORMATS = [
+    (re.compile(r'\d{1,2}/\d{1,2}/\d{4}'), '%d/%m/%Y', None),
+    (re.compile(r'\d{4}-\d{2}-\d{2}(?:[ T]\d{2}:\d{2}:\d{2}(?:\.\d+)?)?'), '%Y-%m-%d', 10),
+]
+
+# Mapeamento de UFs (Brazilian states)
+UF_MAPPING = {
+    'ACRE': 'AC', 'ALAGOAS': 'AL', 'AMAPÁ': 'AP', 'AMAZONAS': 'AM', 'BAHIA': 'BA',
+    'CEARÁ': 'CE', 'DISTRITO FEDERAL': 'DF', 'ESPÍRITO SANTO': 'ES', 'GOIÁS': 'GO',
+    'MARANHÃO': 'MA', 'MATO GROSSO': 'MT', 'MATO GROSSO DO SUL': 'MS', 'MINAS GERAIS': 'MG',
+    'PARÁ': 'PA', 'PARAÍBA': 'PB', 'PARANÁ': 'PR', 'PERNAMBUCO': 'PE', 'PIAUÍ': 'PI',
+    'RIO DE JANEIRO': 'RJ', 'RIO GRANDE DO NORTE': 'RN', 'RIO GRANDE DO SUL': 'RS',
+    'RONDÔNIA': 'RO', 'RORAIMA': 'RR', 'SANTA CATARINA': 'SC', 'SÃO PAULO': 'SP',
+    'SERGIPE': 'SE', 'TOCANTINS': 'TO'
+}
+
+def fold_accents(text):
+    """Strip accents: 'SÃO PAULO' -> 'SAO PAULO'."""
+    return ''.join(char for char in unicodedata.normalize('NFKD', text) if not unicodedata.combining(char))
+
+def build_uf_lookup(mapping):
+    """Reverse lookup from codes, state names and accent-free state names to the 2-letter code."""
+    lookup = {}
+    for name, code in mapping.items():
+        lookup[code] = code
+        lookup[name] = code
+        lookup[fold_accents(name)] = code
+    return lookup
+
+UF_LOOKUP = build_uf_lookup(UF_MAPPING)
+
+def only_digits(text):
+    """Remove every non-digit character; not memoized, for mostly unique values like CPF/CNPJ."""
+    return NON_DIGITS.sub('', text)
+
+@lru_cache(maxsize=NORMALIZER_CACHE_SIZE)
+def cached_digits(text):
+    """only_digits for repetitive fields such as CEP."""
+    return NON_DIGITS.sub('', text)
+
+@lru_cache(maxsize=NORMALIZER_CACHE_SIZE)
+def uf_code(text):
+    """2-letter code for a UF code or state name, any case or accents; None if unknown."""
+    uf = text.strip().upper()
+    code = UF_LOOKUP.get(uf)
+    if code is None:
+        code = UF_LOOKUP.get(fold_accents(uf))
+    return code
+
+@lru_cache(maxsize=NORMALIZER_CACHE_SIZE)
+def clean_text(text, max_length=None):
+    """Replace characters that cannot be encoded as UTF-8 and truncate to max_length."""
+    text = text.encode('utf-8', errors='replace').decode('utf-8')
+    if max_length and len(text) > max_length:
+        text = text[:max_length]
+    return text
+
+MEMOIZED_NORMALIZERS = [cached_digits, uf_code, clean_text]
+
+def cache_stats():
+    """Hits, misses and size of each memoized normalizer in this process."""
+    return {func.__name__: func.cache_info() for func in MEMOIZED_NORMALIZERS}
+
+def clear_caches():
+    """Empty every memoized normalizer."""
+    for func in MEMOIZED_NORMALIZERS:
+        func.cache_clear()
+
+def excel_serials_to_dates(days):
+    """Convert an array of Excel serial numbers to dates in one pass."""
+    timestamps = np.datetime64(EXCEL_EPOCH, 'ns') + pd.to_timedelta(days, unit='D').values
+    return timestamps.astype('datetime64[D]').tolist()
+
+def convert_excel_dates(series, field_name):
+    """
+    Convert a column of dates as found in spreadsheets and CSV exports.
+    Date and datetime values are used as they are; Excel serial numbers are converted with
+    array arithmetic; 'dd/mm/yyyy' and ISO strings are parsed with their exact format;
+    only the remaining strings go through dateutil (day first), once per distinct value.
+    Returns (dates or None, reasons.Reason or None, Counter of values handled by each path).
+    """
+    values = pd.Series(np.full(len(series), None, dtype=object), index=series.index)
+    errors = pd.Series(np.full(len(series), None, dtype=object), index=series.index)
+    paths = Counter()
+
+    missing = series.isna() | series.map(lambda value: isinstance(value, str) and not value.strip())
+    errors[missing] = Reason(ReasonCode.MISSING, field=field_name)
+    paths['missing'] = int(missing.sum())
+    present = series[~missing]
+
+    kind = present.map(lambda value: 'datetime' if isinstance(value, (datetime, date))
+                       else 'number' if isinstance(value, (int, float)) else 'text')
+
+    dates = present[kind == 'datetime']
+    values[dates.index] = [value.date() if isinstance(value, datetime) else value for value in dates]
+    paths['datetime'] = len(dates)
+
+    numbers = present[kind == 'number'].astype(float)
+    in_range = (numbers > EXCEL_SERIAL_RANGE[0]) & (numbers < EXCEL_SERIAL_RANGE[1])
+    if in_range.any():
+        values[numbers.index[in_range]] = excel_serials_to_dates(numbers[in_range].values)
+    paths['excel_serial'] = int(in_range.sum())
+    for index in numbers.index[~in_range]:
+        try:
+            values[index] = (EXCEL_EPOCH + pd.Timedelta(days=present[index])).date()
+            paths['excel_serial'] += 1
+        except Exception as e:
+            errors[index] = Reason(ReasonCode.DATE_NUMBER_FAILED, str(e), field=field_name)
+            paths['failed'] += 1
+
+    text = present[kind == 'text'].map(lambda value: str(value).strip())
+    for pattern, date_format, prefix in DATE_FORMATS:
+        matches = text[text.map(lambda value: pattern.fullmatch(value) is not None)]
+        if prefix:
+            matches = matches.str[:prefix]
+        parsed = pd.to_datetime(matches, format=date_format, errors='coerce')
+        parsed = parsed[parsed.notna()]
+        values[parsed.index] = parsed.dt.date
+        paths['exact_format'] += len(parsed)
+        text = text.drop(parsed.index)
+
+    parsed_text = {}
+    for index, value in text.items():
+        if value not in parsed_text:
+            try:
+                parsed_text[value] = (parse_date(value, dayfirst=True).date(), None)
+            except Exception as e:
+                parsed_text[value] = (None, Reason(ReasonCode.DATE_TEXT_FAILED, str(e), field=field_name))
+        values[index], errors[index] = parsed_text[value]
+        paths['dateutil' if errors[index] is None else 'failed'] += 1
+    return values, errors, paths
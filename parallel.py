@@ -0,0 +1,41 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import logging
+from logging_setup import worker_logging
+
+logger = logging.getLogger(__name__)
+
+# Chunks submitted ahead of the one being consumed, per worker
+PENDING_PER_WORKER = 2
+
+_NO_ITEMS = object()
+
+def map_in_order(func, items, workers=1):
+    """
+    Apply func to every item, yielding results in the order of items.
+    With workers > 1 the calls run in a ProcessPoolExecutor; only a few items per worker
+    are in flight, so a lazy iterable (e.g. a streaming reader) is never read ahead
+    much further than it is consumed. The pool is created only once the first item
+    arrives, so an empty input yields nothing without starting any process. Workers log
+    through the main process (logging_setup.worker_logging).
+    """
+    if workers <= 1:
+        for item in items:
+            yield func(item)
+        return
+
+    items = iter(items)
+    first = next(items, _NO_ITEMS)
+    if first is _NO_ITEMS:
+        logger.info("No data to process; worker pool not started")
+        return
+
+    initializer, initargs = worker_logging()
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs) as executor:
+        pending = deque([executor.submit(func, first)])
+        for item in items:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= workers * PENDING_PER_WORKER:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
@@ -0,0 +1,166 @@
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+from decimal import Decimal, ROUND_HALF_UP
+from operator import attrgetter
+import numpy as np
+from data_validator import validate_dataframe, combine_error_reasons, column_as_text
+from normalizers import convert_excel_dates
+
+logger = logging.getLogger(__name__)
+
+# Date columns are converted here, so their conversion paths can be counted per run
+DATE_COLUMNS = ['Data Nasc.', 'Data Cadastro cliente']
+
+# A validation error in one of these columns rejects the row; in any other column
+# the value is dropped (or set to its default) with a warning and the row is kept
+REQUIRED_COLUMNS = ['CPF/CNPJ', 'Nome/Razão Social', 'Plano', 'Endereço', 'CEP', 'UF', 'Vencimento', 'Plano Valor']
+
+# Loader record key for each validated column
+RECORD_COLUMNS = [
+    ('cpf_cnpj', 'CPF/CNPJ'),
+    ('nome_razao_social', 'Nome/Razão Social'),
+    ('nome_fantasia', 'Nome Fantasia'),
+    ('data_nascimento', 'Data Nasc.'),
+    ('data_cadastro', 'Data Cadastro cliente'),
+    ('celular', 'Celulares'),
+    ('telefone', 'Telefones'),
+    ('email', 'Emails'),
+    ('plano', 'Plano'),
+    ('plano_valor', 'Plano Valor'),
+    ('status', 'Status'),
+    ('dia_vencimento', 'Vencimento'),
+    ('isento', 'Isento'),
+    ('endereco_logradouro', 'Endereço'),
+    ('endereco_numero', 'Número'),
+    ('endereco_bairro', 'Bairro'),
+    ('endereco_cidade', 'Cidade'),
+    ('endereco_complemento', 'Complemento'),
+    ('endereco_cep', 'CEP'),
+    ('endereco_uf', 'UF'),
+]
+
+RECORD_KEYS = [key for key, column in RECORD_COLUMNS]
+_record_values = attrgetter(*RECORD_KEYS)
+
+# Bit of each validated column in Record.dropped
+RECORD_BITS = {column: 1 << bit for bit, (key, column) in enumerate(RECORD_COLUMNS)}
+
+# Plan values are kept as Decimal at the scale of tbl_planos.valor, numeric(15,2)
+CENTS = Decimal('0.01')
+
+def money(value):
+    """A validated plan value (float) as Decimal cents; missing values stay None."""
+    if value is None or value != value:
+        return None
+    return Decimal(repr(value)).quantize(CENTS, ROUND_HALF_UP)
+
+class Record:
+    """
+    Validated row on its way to the database: one typed value per RECORD_KEYS attribute (str, date,
+    int, bool, Decimal for plano_valor, None when empty). dropped is a bitmask (RECORD_BITS) of
+    the optional columns whose invalid value was discarded. The lookup stage sets plano_id and
+    status_id and the checkpoint sets row_hash. Slots keep the rows in flight a fraction of the
+    size of dicts, and attribute reads are cheaper than key lookups in the loaders.
+    """
+    __slots__ = RECORD_KEYS + ['dropped', 'plano_id', 'status_id', 'row_hash']
+
+    def __init__(self, values, dropped=0):
+        for key, value in zip(RECORD_KEYS, values):
+            setattr(self, key, value)
+        self.dropped = dropped
+        self.plano_id = self.status_id = self.row_hash = None
+
+    # Validation workers send records back as their values, not slot by slot
+    def __reduce__(self):
+        return Record, (self.values(), self.dropped)
+
+    def values(self):
+        """The RECORD_KEYS values, in order."""
+        return _record_values(self)
+
+    def dropped_columns(self):
+        """Input columns whose invalid value was discarded."""
+        return [column for column, bit in RECORD_BITS.items() if self.dropped & bit]
+
+_END = object()
+
+class StageTimer:
+    """
+    Wall time and rows per pipeline stage (read, validate, load, report).
+    Stages run interleaved: the input is read while validation pulls its next chunk and
+    validation runs while the loader pulls its next row. Time spent in a nested stage
+    is counted only for that stage, so the totals add up to the run time.
+    """
+
+    def __init__(self):
+        self.elapsed = {}
+        self.rows = Counter()
+        self._nested = []
+
+    @contextmanager
+    def stage(self, name):
+        """Time the enclosed block as stage name, minus any stage nested in it."""
+        started = time.perf_counter()
+        self._nested.append(0.0)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            nested = self._nested.pop()
+            self.elapsed[name] = self.elapsed.get(name, 0.0) + elapsed - nested
+            if self._nested:
+                self._nested[-1] += elapsed
+
+    def timed(self, name, iterable, rows=len):
+        """Yield from iterable, timing each step as stage name and counting rows(item)."""
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                item = next(iterator, _END)
+            if item is _END:
+                return
+            self.rows[name] += rows(item)
+            yield item
+
+    def log_summary(self):
+        """Log the time, share of the run and throughput of each stage."""
+        total = sum(self.elapsed.values())
+        for name, elapsed in self.elapsed.items():
+            rows = self.rows[name]
+            rate = rows / elapsed if rows and elapsed else 0.0
+            logger.info("Stage %s: %.2fs (%.0f%%), %s rows, %.0f rows/s",
+                        name, elapsed, 100 * elapsed / total if total else 0.0, rows, rate)
+
+def validate_chunk(chunk):
+    """
+    Validate stage for one chunk of input rows; runs in a worker process when --workers > 1.
+    Every column goes through the data_validator column engine once and the typed values
+    are turned into loader records, so nothing is cleaned again before loading.
+    Returns (records, reasons, date_paths): a Record or None per row, the rejection
+    reason or None per row, and the Counter of date conversion paths.
+    """
+    cleaned, errors = validate_dataframe(chunk.drop(columns=DATE_COLUMNS))
+    date_paths = Counter()
+    for column in DATE_COLUMNS:
+        cleaned[column], errors[column], paths = convert_excel_dates(chunk[column].astype(object), column)
+        date_paths.update(paths)
+
+    reasons = combine_error_reasons(errors[REQUIRED_COLUMNS])
+    accepted = reasons.isna()
+    dropped = np.zeros(len(chunk), dtype=np.int64)
+    for column in errors.columns:
+        if column in REQUIRED_COLUMNS:
+            continue
+        text, missing = column_as_text(chunk[column])
+        discarded = errors[column].notna() & ~missing & accepted
+        dropped[discarded.to_numpy()] |= RECORD_BITS[column]
+        for index in errors.index[discarded]:
+            logger.warning("Row %s: %s ignored: %s", index + 1, column, errors.at[index, column])
+
+    values = [cleaned[column].tolist() for key, column in RECORD_COLUMNS]
+    values[RECORD_KEYS.index('plano_valor')] = [money(value) for value in cleaned['Plano Valor'].tolist()]
+    records = [Record(row, bits) if ok else None
+               for row, ok, bits in zip(zip(*values), accepted.tolist(), dropped.tolist())]
+    return records, reasons.tolist(), date_paths
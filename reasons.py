@@ -0,0 +1,205 @@
+import json
+from enum import IntEnum
+
+# Languages reports can be written in
+LANGUAGES = ('pt', 'en')
+
+class ReasonCode(IntEnum):
+    """Why a field or row was rejected. The values are stored in the input cache, so never reuse one."""
+    MISSING = 1
+    NO_DIGITS = 2
+    REPEATED_DIGITS = 3
+    SEQUENTIAL_DIGITS = 4
+    BAD_CHECKSUM = 5
+    DOCUMENT_LENGTH = 6
+    PHONE_INVALID = 7
+    EMAIL_INVALID = 8
+    NOT_NUMERIC = 9
+    CEP_LENGTH = 10
+    INVALID = 11
+    NOT_A_NUMBER = 12
+    OUT_OF_RANGE = 13
+    INVALID_VALUE = 14
+    ENCODING_ERROR = 15
+    DATE_NUMBER_FAILED = 16
+    DATE_TEXT_FAILED = 17
+    UNKNOWN_STATUS = 18
+    CLIENT_INSERT_FAILED = 19
+    CONTRACT_INSERT_FAILED = 20
+    COMMIT_FAILED = 21
+    BATCH_FAILED = 22
+    LOADER_FAILED = 23
+
+# Message of each code per language; {field} is the field the reason is about, {0}, {1}... its values
+MESSAGES = {
+    'pt': {
+        ReasonCode.MISSING: "{field} ausente ou vazio.",
+        ReasonCode.NO_DIGITS: "{field} vazio após limpeza.",
+        ReasonCode.REPEATED_DIGITS: "{field} inválido (todos os dígitos iguais).",
+        ReasonCode.SEQUENTIAL_DIGITS: "{field} inválido (dígitos sequenciais).",
+        ReasonCode.BAD_CHECKSUM: "Checksum de {field} inválido (esperado: {0}, fornecido: {1}).",
+        ReasonCode.DOCUMENT_LENGTH: "Comprimento de {field} inválido ({0} dígitos, esperado 11 ou 14).",
+        ReasonCode.PHONE_INVALID: "{field} inválido (10 dígitos para fixo, 11 dígitos com terceiro dígito após DDD como 9/8/7/6 para móvel).",
+        ReasonCode.EMAIL_INVALID: "Formato de email inválido.",
+        ReasonCode.NOT_NUMERIC: "{field} inválido (contém caracteres não numéricos).",
+        ReasonCode.CEP_LENGTH: "Comprimento de {field} inválido (deve ter 8 dígitos).",
+        ReasonCode.INVALID: "{field} inválido.",
+        ReasonCode.NOT_A_NUMBER: "{field} não é um número.",
+        ReasonCode.OUT_OF_RANGE: "{field} inválido (deve ser entre {0} e {1}).",
+        ReasonCode.INVALID_VALUE: "Valor de {field} inválido ({0}).",
+        ReasonCode.ENCODING_ERROR: "Erro de codificação: {0}.",
+        ReasonCode.DATE_NUMBER_FAILED: "Falha ao converter data numérica para {field}: {0}.",
+        ReasonCode.DATE_TEXT_FAILED: "Falha ao parsear data de string para {field}: {0}.",
+        ReasonCode.UNKNOWN_STATUS: "Status desconhecido: {0}.",
+        ReasonCode.CLIENT_INSERT_FAILED: "Erro ao inserir cliente: {0}",
+        ReasonCode.CONTRACT_INSERT_FAILED: "Erro ao inserir contrato: {0}",
+        ReasonCode.COMMIT_FAILED: "Erro ao confirmar transação: {0}",
+        ReasonCode.BATCH_FAILED: "Erro ao importar lote: {0}",
+        ReasonCode.LOADER_FAILED: "Erro no carregador {0}: {1}",
+    },
+    'en': {
+        ReasonCode.MISSING: "{field} missing or empty.",
+        ReasonCode.NO_DIGITS: "{field} has no digits.",
+        ReasonCode.REPEATED_DIGITS: "Invalid {field} (all digits identical).",
+        ReasonCode.SEQUENTIAL_DIGITS: "Invalid {field} (sequential digits).",
+        ReasonCode.BAD_CHECKSUM: "Invalid {field} checksum (expected: {0}, given: {1}).",
+        ReasonCode.DOCUMENT_LENGTH: "Invalid {field} length ({0} digits, expected 11 or 14).",
+        ReasonCode.PHONE_INVALID: "Invalid {field} (10 digits for landlines, 11 digits with 9/8/7/6 after the area code for mobiles).",
+        ReasonCode.EMAIL_INVALID: "Invalid email format.",
+        ReasonCode.NOT_NUMERIC: "Invalid {field} (non-numeric characters).",
+        ReasonCode.CEP_LENGTH: "Invalid {field} length (must have 8 digits).",
+        ReasonCode.INVALID: "Invalid {field}.",
+        ReasonCode.NOT_A_NUMBER: "{field} is not a number.",
+        ReasonCode.OUT_OF_RANGE: "Invalid {field} (must be between {0} and {1}).",
+        ReasonCode.INVALID_VALUE: "Invalid {field} value ({0}).",
+        ReasonCode.ENCODING_ERROR: "Encoding error: {0}.",
+        ReasonCode.DATE_NUMBER_FAILED: "Failed to convert numeric date for {field}: {0}.",
+        ReasonCode.DATE_TEXT_FAILED: "Failed to parse date string for {field}: {0}.",
+        ReasonCode.UNKNOWN_STATUS: "Unknown status: {0}.",
+        ReasonCode.CLIENT_INSERT_FAILED: "Error inserting client: {0}",
+        ReasonCode.CONTRACT_INSERT_FAILED: "Error inserting contract: {0}",
+        ReasonCode.COMMIT_FAILED: "Error committing transaction: {0}",
+        ReasonCode.BATCH_FAILED: "Error importing batch: {0}",
+        ReasonCode.LOADER_FAILED: "Error in loader {0}: {1}",
+    }
+}
+
+# Short name of each code per language, for the rejection summary
+LABELS = {
+    'pt': {
+        ReasonCode.MISSING: "Ausente ou vazio",
+        ReasonCode.NO_DIGITS: "Sem dígitos",
+        ReasonCode.REPEATED_DIGITS: "Dígitos todos iguais",
+        ReasonCode.SEQUENTIAL_DIGITS: "Dígitos sequenciais",
+        ReasonCode.BAD_CHECKSUM: "Dígito verificador inválido",
+        ReasonCode.DOCUMENT_LENGTH: "Comprimento do documento inválido",
+        ReasonCode.PHONE_INVALID: "Telefone inválido",
+        ReasonCode.EMAIL_INVALID: "Email inválido",
+        ReasonCode.NOT_NUMERIC: "Caracteres não numéricos",
+        ReasonCode.CEP_LENGTH: "Comprimento do CEP inválido",
+        ReasonCode.INVALID: "Inválido",
+        ReasonCode.NOT_A_NUMBER: "Não é um número",
+        ReasonCode.OUT_OF_RANGE: "Fora do intervalo",
+        ReasonCode.INVALID_VALUE: "Valor inválido",
+        ReasonCode.ENCODING_ERROR: "Erro de codificação",
+        ReasonCode.DATE_NUMBER_FAILED: "Data numérica inválida",
+        ReasonCode.DATE_TEXT_FAILED: "Data em texto inválida",
+        ReasonCode.UNKNOWN_STATUS: "Status desconhecido",
+        ReasonCode.CLIENT_INSERT_FAILED: "Falha ao inserir cliente",
+        ReasonCode.CONTRACT_INSERT_FAILED: "Falha ao inserir contrato",
+        ReasonCode.COMMIT_FAILED: "Falha ao confirmar transação",
+        ReasonCode.BATCH_FAILED: "Falha no lote",
+        ReasonCode.LOADER_FAILED: "Falha no carregador",
+    },
+    'en': {
+        ReasonCode.MISSING: "Missing or empty",
+        ReasonCode.NO_DIGITS: "No digits",
+        ReasonCode.REPEATED_DIGITS: "All digits identical",
+        ReasonCode.SEQUENTIAL_DIGITS: "Sequential digits",
+        ReasonCode.BAD_CHECKSUM: "Invalid check digits",
+        ReasonCode.DOCUMENT_LENGTH: "Invalid document length",
+        ReasonCode.PHONE_INVALID: "Invalid phone number",
+        ReasonCode.EMAIL_INVALID: "Invalid email",
+        ReasonCode.NOT_NUMERIC: "Non-numeric characters",
+        ReasonCode.CEP_LENGTH: "Invalid CEP length",
+        ReasonCode.INVALID: "Invalid",
+        ReasonCode.NOT_A_NUMBER: "Not a number",
+        ReasonCode.OUT_OF_RANGE: "Out of range",
+        ReasonCode.INVALID_VALUE: "Invalid value",
+        ReasonCode.ENCODING_ERROR: "Encoding error",
+        ReasonCode.DATE_NUMBER_FAILED: "Invalid numeric date",
+        ReasonCode.DATE_TEXT_FAILED: "Invalid date text",
+        ReasonCode.UNKNOWN_STATUS: "Unknown status",
+        ReasonCode.CLIENT_INSERT_FAILED: "Client insert failed",
+        ReasonCode.CONTRACT_INSERT_FAILED: "Contract insert failed",
+        ReasonCode.COMMIT_FAILED: "Commit failed",
+        ReasonCode.BATCH_FAILED: "Batch failed",
+        ReasonCode.LOADER_FAILED: "Loader failed",
+    }
+}
+
+class Reason:
+    """
+    Why a field or row was rejected: a ReasonCode, the field it is about and the values its
+    message shows. The message is only rendered when a report or log line needs it.
+    """
+    __slots__ = ('code', 'field', 'params')
+
+    def __init__(self, code, *params, field=None):
+        self.code = code
+        self.field = field
+        self.params = params
+
+    def render(self, language='pt'):
+        return MESSAGES[language][self.code].format(*self.params, field=self.field)
+
+    @property
+    def kind(self):
+        """(code, field), the key reasons are counted by."""
+        return self.code, self.field
+
+    def __str__(self):
+        return self.render()
+
+    def __repr__(self):
+        return f"Reason({self.code.name}, params={self.params!r}, field={self.field!r})"
+
+def as_reasons(reason):
+    """The Reasons of a row's reason: None, a Reason or a tuple of them."""
+    if reason is None:
+        return ()
+    if isinstance(reason, Reason):
+        return (reason,)
+    return tuple(reason)
+
+def render(reason, language='pt'):
+    """
+    Message of a row's reason: its Reasons rendered and joined with '; '. Text (e.g. the notes
+    of the duplicates report) is kept as it is; no reason gives ''.
+    """
+    if not reason:
+        return ''
+    if isinstance(reason, str):
+        return reason
+    return '; '.join(part.render(language) for part in as_reasons(reason))
+
+def label(code, language='pt'):
+    """Short name of a reason code in language, e.g. 'Dígito verificador inválido' for BAD_CHECKSUM."""
+    return LABELS[language][code]
+
+def kind_name(kind):
+    """Label of a (code, field) kind, e.g. 'BAD_CHECKSUM CPF' or 'UNKNOWN_STATUS'."""
+    code, field = kind
+    return f"{code.name} {field}" if field else code.name
+
+def dumps(reason):
+    """A row's reason as JSON text, for the input cache; None stays None."""
+    if reason is None:
+        return None
+    return json.dumps([[part.code, part.field, *part.params] for part in as_reasons(reason)], ensure_ascii=False, default=str)
+
+def loads(text):
+    """Inverse of dumps: the row's tuple of Reasons, or None."""
+    if text is None:
+        return None
+    return tuple(Reason(ReasonCode(code), *params, field=field) for code, field, *params in json.loads(text))
@@ -0,0 +1,115 @@
+import csv
+import logging
+import os
+import threading
+from collections import Counter
+import pandas as pd
+from openpyxl import Workbook
+from reasons import as_reasons, label, render
+
+logger = logging.getLogger(__name__)
+
+# Report file formats: xlsx (openpyxl write-only), csv, or txt (tab-separated)
+REPORT_FORMATS = ('xlsx', 'csv', 'txt')
+
+# Column appended to the input columns with the reason a row was rejected
+REASON_COLUMN = 'Motivo do Erro'
+
+# Columns of the rejection summary, one row per reason code and field, plus an example message
+SUMMARY_COLUMNS = ['Código', 'Motivo', 'Campo', 'Linhas']
+SUMMARY_EXAMPLE_COLUMN = 'Exemplo'
+
+def report_path(path, report_format):
+    """path with its extension replaced by the report format's."""
+    return os.path.splitext(path)[0] + '.' + report_format
+
+def cell_value(value):
+    """Missing values (None, NaN) become empty cells."""
+    return None if pd.isna(value) else value
+
+class ReportWriter:
+    """
+    Report file written row by row as rows are accepted or rejected.
+    Nothing but the row count is kept in memory: each row goes to disk when it is written
+    (xlsx through openpyxl's write-only mode, which streams rows to a temporary file until close).
+    The file is created on the first row, so a report with no rows leaves no file behind.
+    Safe to share between loader threads. Reasons (reasons.Reason, or a row's tuple of them) are
+    rendered in language as they are written; reasons counts them per (code, field) kind and
+    samples keeps the first of each kind.
+    """
+
+    def __init__(self, path, columns, title=None, report_format='xlsx', reason_column=REASON_COLUMN, language='pt'):
+        if report_format not in REPORT_FORMATS:
+            raise ValueError(f"Unsupported report format: {report_format}")
+        self.path = report_path(path, report_format)
+        self.columns = list(columns) + [reason_column]
+        self.title = title
+        self.report_format = report_format
+        self.language = language
+        self.count = 0
+        self.reasons = Counter()
+        self.samples = {}
+        self.closed = False
+        self._lock = threading.Lock()
+        self._file = None
+        self._workbook = None
+        self._append = None
+
+    def _open(self):
+        if self.report_format == 'xlsx':
+            self._workbook = Workbook(write_only=True)
+            self._append = self._workbook.create_sheet().append
+        else:
+            # utf-8-sig so Excel opens the accents right
+            self._file = open(self.path, 'w', encoding='utf-8-sig', newline='')
+            writer = csv.writer(self._file, delimiter=',' if self.report_format == 'csv' else '\t')
+            self._append = writer.writerow
+        if self.title:
+            self._append([self.title])
+        self._append(self.columns)
+
+    def write(self, row, reason=None):
+        """Append an input row (its values in input column order, e.g. a tuple or Series) with its reason."""
+        values = [cell_value(value) for value in row] + [render(reason, self.language)]
+        parts = () if isinstance(reason, str) else as_reasons(reason)
+        with self._lock:
+            if self.count == 0:
+                self._open()
+            self._append(values)
+            self.count += 1
+            for part in parts:
+                self.reasons[part.kind] += 1
+                self.samples.setdefault(part.kind, part)
+
+    def close(self):
+        """Finish the file; logs where it was saved if it has any rows. Closing twice is a no-op."""
+        with self._lock:
+            if self.closed:
+                return
+            self.closed = True
+            if self._workbook is not None:
+                self._workbook.save(self.path)
+                self._workbook = None
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if self.count:
+                logger.info("Report with %s rows saved to '%s'", self.count, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def write_reason_summary(path, errors_report, report_format='xlsx'):
+    """
+    Write the rejection summary of an errors report: how many times each reason code was given,
+    per field, most frequent first, with the first such message as an example. Reasons are
+    named and shown in the errors report's language.
+    """
+    with ReportWriter(path, SUMMARY_COLUMNS, report_format=report_format,
+                      reason_column=SUMMARY_EXAMPLE_COLUMN, language=errors_report.language) as summary:
+        for kind, count in errors_report.reasons.most_common():
+            code, field = kind
+            summary.write([int(code), label(code, errors_report.language), field, count], errors_report.samples[kind])
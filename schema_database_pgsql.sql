@@ -402,6 +402,15 @@ ALTER TABLE ONLY public.tbl_cliente_contratos
     ADD CONSTRAINT tbl_cliente_contratos_pkey PRIMARY KEY (id);
 
 
+--
+-- Name: tbl_cliente_contratos tbl_cliente_contratos_contrato_key; Type: CONSTRAINT; Schema: public; Owner: postgres
+-- Natural key of a contract: one client, one plan, one installation address.
+--
+
+ALTER TABLE ONLY public.tbl_cliente_contratos
+    ADD CONSTRAINT tbl_cliente_contratos_contrato_key UNIQUE NULLS NOT DISTINCT (cliente_id, plano_id, endereco_cep, endereco_logradouro, endereco_numero, endereco_complemento);
+
+
 --
 -- Name: tbl_clientes tbl_clientes_cpf_cnpj_key; Type: CONSTRAINT; Schema: public; Owner: postgres
 --
@@ -466,6 +475,20 @@ ALTER TABLE ONLY public.tbl_tipos_contato
     ADD CONSTRAINT tbl_tipos_contato_tipo_contato_key UNIQUE (tipo_contato);
 
 
+--
+-- Name: tbl_cliente_contratos_plano_id_idx; Type: INDEX; Schema: public; Owner: postgres
+--
+
+CREATE INDEX tbl_cliente_contratos_plano_id_idx ON public.tbl_cliente_contratos USING btree (plano_id);
+
+
+--
+-- Name: tbl_cliente_contratos_status_id_idx; Type: INDEX; Schema: public; Owner: postgres
+--
+
+CREATE INDEX tbl_cliente_contratos_status_id_idx ON public.tbl_cliente_contratos USING btree (status_id);
+
+
 --
 -- Name: tbl_cliente_contatos tbl_cliente_contatos_cliente_id_fkey; Type: FK CONSTRAINT; Schema: public; Owner: postgres
 --
@@ -506,6 +529,39 @@ ALTER TABLE ONLY public.tbl_cliente_contratos
     ADD CONSTRAINT tbl_cliente_contratos_status_id_fkey FOREIGN KEY (status_id) REFERENCES public.tbl_status_contrato(id) ON UPDATE CASCADE ON DELETE RESTRICT;
 
 
+--
+-- Name: tbl_importacoes; Type: TABLE; Schema: public; Owner: postgres
+-- Import runs; import_data.py also creates it if missing.
+--
+
+CREATE TABLE IF NOT EXISTS public.tbl_importacoes (
+    id serial PRIMARY KEY,
+    arquivo character varying(500) NOT NULL,
+    caminho character varying(1000),
+    hash_arquivo character(64),
+    iniciada_em timestamp without time zone DEFAULT now() NOT NULL,
+    concluida_em timestamp without time zone
+);
+
+
+ALTER TABLE public.tbl_importacoes OWNER TO postgres;
+
+--
+-- Name: tbl_importacao_linhas; Type: TABLE; Schema: public; Owner: postgres
+-- Hash of the normalized content of every committed source row, used to skip rows on reruns.
+--
+
+CREATE TABLE IF NOT EXISTS public.tbl_importacao_linhas (
+    hash_linha bytea PRIMARY KEY,
+    importacao_id integer NOT NULL REFERENCES public.tbl_importacoes(id) ON DELETE CASCADE
+);
+
+
+ALTER TABLE public.tbl_importacao_linhas OWNER TO postgres;
+
+CREATE INDEX IF NOT EXISTS tbl_importacao_linhas_importacao_id_idx ON public.tbl_importacao_linhas USING btree (importacao_id);
+
+
 --
 -- PostgreSQL database dump complete
 --
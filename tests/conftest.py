@@ -0,0 +1,119 @@
+import io
+import os
+import sys
+import pytest
+
+# The modules live at the repository root, next to import_data.py
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import psycopg2
+from database import DB_PARAMS
+
+SCHEMA_FILE = os.path.join(ROOT, 'schema_database_pgsql.sql')
+
+# Database the postgres tests create from SCHEMA_FILE and drop afterwards, on the DB_PARAMS server
+TEST_DB_NAME = os.environ.get('TSMX_TEST_DB_NAME', 'tsmx_test')
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', "postgres: needs the PostgreSQL server of DB_PARAMS (skipped when it cannot "
+                                       "be reached); runs against a scratch database, TSMX_TEST_DB_NAME")
+
+def run_script(cursor, path):
+    """
+    Run a pg_dump script: its SQL as is, and its COPY ... FROM stdin blocks through copy_expert.
+    The end-of-data lines left by commented-out COPY commands are dropped, as psql does.
+    """
+    sql = []
+
+    def flush():
+        if any(line.strip() and not line.lstrip().startswith('--') for line in sql):
+            cursor.execute(''.join(sql))
+        sql.clear()
+
+    copy = None
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if copy is not None:
+                if line.rstrip('\n') == '\\.':
+                    cursor.copy_expert(copy, io.StringIO(''.join(data)))
+                    copy = None
+                else:
+                    data.append(line)
+            elif line.startswith('COPY ') and line.rstrip().endswith('FROM stdin;'):
+                flush()
+                copy, data = line.rstrip().rstrip(';'), []
+            elif line.rstrip('\n') != '\\.':
+                sql.append(line)
+    flush()
+
+def admin_connection():
+    """Autocommit connection to the server's postgres database, or a skipped test if there is no server."""
+    try:
+        conn = psycopg2.connect(**dict(DB_PARAMS, dbname='postgres'))
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"PostgreSQL not available: {str(e).strip()}")
+    conn.autocommit = True
+    return conn
+
+@pytest.fixture
+def database(monkeypatch):
+    """
+    Connection parameters of a fresh TEST_DB_NAME database built from the schema script.
+    DB_PARAMS point to it during the test; it is dropped afterwards.
+    """
+    admin = admin_connection()
+    with admin.cursor() as cursor:
+        cursor.execute(f"DROP DATABASE IF EXISTS {TEST_DB_NAME} WITH (FORCE)")
+        cursor.execute(f"CREATE DATABASE {TEST_DB_NAME}")
+    params = dict(DB_PARAMS, dbname=TEST_DB_NAME)
+    conn = psycopg2.connect(**params)
+    with conn, conn.cursor() as cursor:
+        run_script(cursor, SCHEMA_FILE)
+    conn.close()
+    monkeypatch.setitem(DB_PARAMS, 'dbname', TEST_DB_NAME)
+    try:
+        yield params
+    finally:
+        with admin.cursor() as cursor:
+            cursor.execute(f"DROP DATABASE IF EXISTS {TEST_DB_NAME} WITH (FORCE)")
+        admin.close()
+
+class FakeCursor:
+    """
+    psycopg2 cursor stand-in recording the statements it is given. answers maps a piece of SQL
+    to the rows (or a function of the params returning them) that statements containing it fetch.
+    """
+
+    def __init__(self, answers=None):
+        self.answers = answers or {}
+        self.executed = []
+        self.rows = []
+        self.connection = None
+
+    def execute(self, sql, params=None):
+        self.executed.append((' '.join(sql.split()), params))
+        self.rows = []
+        for key, rows in self.answers.items():
+            if key in sql:
+                self.rows = list(rows(params) if callable(rows) else rows)
+                break
+
+    def fetchall(self):
+        return self.rows
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def statements(self, key):
+        """(sql, params) of the statements run so far containing key."""
+        return [(sql, params) for sql, params in self.executed if key in sql]
+
+class FakeDB:
+    """ConnectionManager stand-in running call() on one FakeCursor."""
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def call(self, func):
+        return func(self.cursor)
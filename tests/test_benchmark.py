@@ -0,0 +1,14 @@
+import types
+import pytest
+from benchmark import overridden
+
+def test_overridden_restores_module_attributes_and_dict_keys():
+    module = types.SimpleNamespace(OUTPUT_DIR='C:/reports', ERRORS_FILE='C:/reports/import_erros.xlsx')
+    params = {'dbname': 'tsmx_db', 'host': 'localhost'}
+    with pytest.raises(RuntimeError):
+        with overridden(module, OUTPUT_DIR='/tmp/bench'), overridden(params, dbname='tsmx_bench'):
+            assert (module.OUTPUT_DIR, module.ERRORS_FILE) == ('/tmp/bench', 'C:/reports/import_erros.xlsx')
+            assert params == {'dbname': 'tsmx_bench', 'host': 'localhost'}
+            raise RuntimeError("load failed")
+    assert module.OUTPUT_DIR == 'C:/reports'
+    assert params == {'dbname': 'tsmx_db', 'host': 'localhost'}
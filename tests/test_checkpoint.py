@@ -0,0 +1,115 @@
+import hashlib
+import os
+import psycopg2
+import pytest
+from conftest import FakeCursor, FakeDB
+from import_data import Checkpoint, CHECKPOINT_LOCK
+from pipeline import validate_chunk
+from test_pipeline import chunk
+
+def prepared(documents):
+    """A chunk's (index, row, record) items as the loaders get them."""
+    records, reasons, date_paths = validate_chunk(chunk(documents))
+    return [(index, None, record) for index, record in enumerate(records)]
+
+def hashes(checkpoint, documents):
+    """Row hashes checkpoint gives a chunk of documents that no run has committed."""
+    [(chunk_, items)] = checkpoint.skip_imported(FakeDB(FakeCursor()), [(None, prepared(documents))])
+    return [record.row_hash for index, row, record in items]
+
+def source(tmp_path, content=b'CPF/CNPJ\n52998224725\n'):
+    path = tmp_path / 'clientes.csv'
+    path.write_bytes(content)
+    return str(path)
+
+def test_repeated_rows_get_distinct_hashes_in_a_stable_order():
+    documents = ['529.982.247-25', '529.982.247-25', '111.444.777-35']
+    first = hashes(Checkpoint(), documents)
+    assert len(set(first)) == 3
+    assert hashes(Checkpoint(), documents) == first
+
+def test_rows_committed_by_an_earlier_run_are_skipped():
+    documents = ['529.982.247-25', '111.444.777-35', '591.267.843-19']
+    committed = set(hashes(Checkpoint(), documents)[:2])
+    cursor = FakeCursor({'FROM tbl_importacao_linhas': lambda params: [(h,) for h in params[0] if h in committed]})
+    checkpoint = Checkpoint()
+    [(chunk_, items)] = checkpoint.skip_imported(FakeDB(cursor), [(None, prepared(documents))])
+    assert [record.cpf_cnpj for index, row, record in items] == ['59126784319']
+    assert checkpoint.skipped == 2
+    [(sql, params)] = cursor.executed
+    assert len(params[0]) == 3
+
+def test_reprocess_keeps_every_row_without_querying():
+    cursor = FakeCursor()
+    checkpoint = Checkpoint(reprocess=True)
+    [(chunk_, items)] = checkpoint.skip_imported(FakeDB(cursor), [(None, prepared(['529.982.247-25'] * 2))])
+    assert len(items) == 2 and all(record.row_hash for index, row, record in items)
+    assert cursor.executed == [] and checkpoint.skipped == 0
+
+def test_start_resumes_only_the_runs_it_locked_and_finish_completes_them(tmp_path):
+    path = source(tmp_path)
+    cursor = FakeCursor({'WITH pendentes': [(3, 10), (5, 0)], 'INSERT INTO tbl_importacoes': [(9,)]})
+    checkpoint = Checkpoint()
+    checkpoint.start(cursor, path)
+    [(sql, params)] = cursor.statements('WITH pendentes')
+    assert params == (os.path.abspath(path), hashlib.sha256(b'CPF/CNPJ\n52998224725\n').hexdigest(), CHECKPOINT_LOCK)
+    assert 'pg_try_advisory_lock' in sql
+    assert (checkpoint.run_id, checkpoint.resumed) == (9, [3, 5])
+    assert cursor.executed[-1] == ("SELECT pg_advisory_lock(%s, %s)", (CHECKPOINT_LOCK, 9))
+
+    cursor = FakeCursor()
+    checkpoint.finish(cursor)
+    [(sql, params)] = cursor.executed
+    assert sql.startswith('UPDATE tbl_importacoes') and 'WHERE id = ANY(%s)' in sql
+    assert params == ([9, 3, 5],)
+
+def test_record_moves_stored_hashes_to_this_run():
+    checkpoint = Checkpoint()
+    checkpoint.run_id = 9
+    cursor = FakeCursor()
+    checkpoint.record(cursor, [])
+    assert cursor.executed == []
+    checkpoint.record(cursor, [b'a', b'b'])
+    [(sql, params)] = cursor.executed
+    assert 'ON CONFLICT (hash_linha) DO UPDATE SET importacao_id = EXCLUDED.importacao_id' in sql
+    assert params == ([b'a', b'b'], 9)
+
+def start_run(params, path, reprocess=False):
+    """Register a Checkpoint run on its own connection, which keeps the run's lock while open."""
+    conn = psycopg2.connect(**params)
+    checkpoint = Checkpoint(reprocess)
+    with conn.cursor() as cursor:
+        checkpoint.start(cursor, path)
+    conn.commit()
+    return conn, checkpoint
+
+@pytest.mark.postgres
+def test_resume_and_reprocess_against_postgres(database, tmp_path):
+    path = source(tmp_path)
+    other = str(tmp_path / 'outro.csv')
+    with open(other, 'wb') as f:
+        f.write(b'CPF/CNPJ\n11144477735\n')
+
+    interrupted, first = start_run(database, path)
+    with interrupted.cursor() as cursor:
+        first.record(cursor, [b'a', b'b'])
+    interrupted.commit()
+    in_progress, busy = start_run(database, path)
+    assert busy.resumed == []
+    interrupted.close()
+    running, unrelated = start_run(database, other)
+
+    # The run whose connection closed is resumed; the one still open and the other file's are not
+    conn, rerun = start_run(database, path, reprocess=True)
+    assert rerun.resumed == [first.run_id]
+    with conn.cursor() as cursor:
+        rerun.record(cursor, [b'b', b'c'])
+        rerun.finish(cursor)
+        conn.commit()
+        cursor.execute("SELECT hash_linha, importacao_id FROM tbl_importacao_linhas ORDER BY hash_linha")
+        assert [(bytes(h), run_id) for h, run_id in cursor.fetchall()] == [
+            (b'a', first.run_id), (b'b', rerun.run_id), (b'c', rerun.run_id)]
+        cursor.execute("SELECT id FROM tbl_importacoes WHERE concluida_em IS NULL ORDER BY id")
+        assert [run_id for (run_id,) in cursor.fetchall()] == [busy.run_id, unrelated.run_id]
+    for connection in (conn, running, in_progress):
+        connection.close()
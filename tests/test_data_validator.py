@@ -0,0 +1,75 @@
+import os
+import pandas as pd
+import pytest
+from data_validator import (clean_cpf_cnpj, clean_cpf_cnpj_column, validate_plano_valor, validate_plano_valor_column,
+                            validate_dataframe, combine_error_reasons)
+from reasons import ReasonCode
+
+SAMPLE_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'dados_importacao.xlsx')
+
+def mod11_digit(digits, weights):
+    """Reference check digit: sum of digit * weight, mod 11; 0 below 2, else 11 - remainder."""
+    remainder = sum(int(d) * w for d, w in zip(digits, weights, strict=True)) % 11
+    return 0 if remainder < 2 else 11 - remainder
+
+def cpf(base):
+    first = mod11_digit(base, range(10, 1, -1))
+    return base + str(first) + str(mod11_digit(base + str(first), range(11, 1, -1)))
+
+def cnpj(base):
+    first = mod11_digit(base, [5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2])
+    return base + str(first) + str(mod11_digit(base + str(first), [6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]))
+
+# Published examples and documents built with the reference algorithm
+VALID_DOCUMENTS = ['529.982.247-25', '111.444.777-35', '591.267.843-19', '11.222.333/0001-81', '11.444.777/0001-61',
+                   cpf('123456780'), cpf('987654320'), cpf('100000001'), cnpj('123456780001'), cnpj('000000010001')]
+
+INVALID_DOCUMENTS = ['529.982.247-24', '529.982.247-15', '11.222.333/0001-80', '111.111.111-11',
+                     '012.345.678-90', '1234567890', '', None, 'abc']
+
+@pytest.mark.parametrize('document', VALID_DOCUMENTS)
+def test_valid_documents_are_accepted(document):
+    cleaned, reason = clean_cpf_cnpj(document, 0)
+    assert reason is None
+    assert cleaned == ''.join(filter(str.isdigit, document))
+
+def test_checksum_reason_has_expected_digits():
+    cleaned, reason = clean_cpf_cnpj('529.982.247-24', 0)
+    assert cleaned == '00000000000'
+    assert reason.code == ReasonCode.BAD_CHECKSUM
+    assert reason.params == ('25', '24')
+
+def test_column_matches_scalar():
+    series = pd.Series(VALID_DOCUMENTS + INVALID_DOCUMENTS, dtype=object)
+    values, errors = clean_cpf_cnpj_column(series)
+    for index, value in series.items():
+        expected, reason = clean_cpf_cnpj(value, index)
+        assert values[index] == expected
+        assert str(errors[index]) == str(reason)
+
+@pytest.mark.skipif(not os.path.exists(SAMPLE_FILE), reason="sample sheet not available")
+def test_column_matches_scalar_on_sample_sheet():
+    series = pd.read_excel(SAMPLE_FILE, dtype=object)['CPF/CNPJ'].astype(object)
+    values, errors = clean_cpf_cnpj_column(series)
+    scalar = [clean_cpf_cnpj(value, index) for index, value in series.items()]
+    assert values.tolist() == [value for value, reason in scalar]
+    assert [str(reason) for reason in errors] == [str(reason) for value, reason in scalar]
+    # Nearly every document of the sample sheet is a real CPF/CNPJ
+    assert errors.notna().sum() < len(series) * 0.01
+
+def test_combine_error_reasons_keeps_column_order():
+    df = pd.DataFrame([{'CPF/CNPJ': '529.982.247-25', 'CEP': '12345678', 'UF': 'SP'},
+                       {'CPF/CNPJ': '529.982.247-24', 'CEP': 'abc', 'UF': 'SP'}])
+    cleaned, errors = validate_dataframe(df)
+    reasons = combine_error_reasons(errors)
+    assert reasons[0] is None
+    assert [reason.code for reason in reasons[1]] == [ReasonCode.BAD_CHECKSUM, ReasonCode.NOT_NUMERIC]
+
+def test_plan_value_column_matches_scalar():
+    series = pd.Series(['100.50', '1,234.56', 249.9, 'inf', '-inf', 'nan', '1e30', '9999999999999.99',
+                        '10000000000000', 'abc', None, ''], dtype=object)
+    values, errors = validate_plano_valor_column(series)
+    for index, value in series.items():
+        expected, reason = validate_plano_valor(value, index)
+        assert values[index] == expected
+        assert str(errors[index]) == str(reason)
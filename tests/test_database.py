@@ -0,0 +1,47 @@
+import pytest
+from conftest import FakeCursor
+from database import ConnectionManager, execute_statement, numbered_params
+from loaders import HOT_STATEMENTS
+from test_loaders import add_due_day_check, assert_due_day_rejected, contracts_frame, import_frame, row_by_row
+
+STATEMENTS = {'cliente_id': "SELECT id FROM tbl_clientes WHERE cpf_cnpj = %s AND nome_razao_social = %s"}
+
+def test_numbered_params_numbers_the_placeholders_in_order():
+    assert numbered_params(STATEMENTS['cliente_id']) == \
+        "SELECT id FROM tbl_clientes WHERE cpf_cnpj = $1 AND nome_razao_social = $2"
+
+def test_execute_statement_executes_prepared_statements_by_name():
+    cursor = FakeCursor()
+    execute_statement(cursor, STATEMENTS, 'cliente_id', ('52998224725', 'Maria'))
+    cursor.connection = type('Connection', (), {'prepared_statements': frozenset(STATEMENTS)})()
+    execute_statement(cursor, STATEMENTS, 'cliente_id', ('52998224725', 'Maria'))
+    assert cursor.executed == [(STATEMENTS['cliente_id'], ('52998224725', 'Maria')),
+                               ("EXECUTE cliente_id (%s, %s)", ('52998224725', 'Maria'))]
+
+def prepared_names(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT name FROM pg_prepared_statements ORDER BY name")
+        return [name for (name,) in cursor.fetchall()]
+
+@pytest.mark.postgres
+def test_statements_are_prepared_once_per_connection_and_again_after_a_reconnect(database):
+    db = ConnectionManager(database, 1, statements=HOT_STATEMENTS)
+    try:
+        conn = db.getconn()
+        assert prepared_names(conn) == sorted(HOT_STATEMENTS)
+        db.putconn(conn)
+        # Taking the connection again does not PREPARE twice, which would fail
+        conn = db.getconn()
+        assert conn.prepared_statements == frozenset(HOT_STATEMENTS)
+        conn.close()
+        conn = db.reconnect(conn)
+        assert prepared_names(conn) == sorted(HOT_STATEMENTS)
+        db.putconn(conn)
+    finally:
+        db.closeall()
+
+@pytest.mark.postgres
+def test_prepared_statements_import_like_the_sql_text(database, tmp_path):
+    add_due_day_check(database)
+    assert_due_day_rejected(database, import_frame(database, tmp_path, contracts_frame(), row_by_row(4),
+                                                   statements=HOT_STATEMENTS))
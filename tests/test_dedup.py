@@ -0,0 +1,75 @@
+import pytest
+import dedup
+from dedup import ClientMerger
+from pipeline import RECORD_KEYS, Record
+
+CONTACT_TYPES = [('Celular', 'celular'), ('E-Mail', 'email')]
+
+def item(index, cpf_cnpj='52998224725', **fields):
+    """(index, row, record) as prepared by import_data, with the given record fields."""
+    values = dict.fromkeys(RECORD_KEYS)
+    values.update(cpf_cnpj=cpf_cnpj, nome_razao_social=f"Cliente {index}", **fields)
+    return index, (f"row {index}",), Record([values[key] for key in RECORD_KEYS])
+
+class ListReport:
+    def __init__(self):
+        self.rows = []
+
+    def write(self, row, reason=None):
+        self.rows.append((row, reason))
+
+def group_all(merger, *chunks):
+    return [groups for chunk, groups in merger.group((None, prepared) for prepared in chunks)]
+
+ROWS = [item(0, celular='+5511987654321'),
+        item(1, nome_fantasia='Loja', data_nascimento='1980-01-01', email='a@example.com'),
+        item(2, celular='+5511987654321', email='b@example.com'),
+        item(3, cpf_cnpj='11222333000181')]
+
+@pytest.mark.parametrize('policy, source_row', [('first', 0), ('last', 2), ('complete', 1)])
+def test_policy_chooses_the_client_row(policy, source_row):
+    [groups] = group_all(ClientMerger(policy, CONTACT_TYPES), ROWS)
+    (client, items), (other, other_items) = groups
+    assert client['source_row'] == source_row
+    assert client['nome_razao_social'] == f"Cliente {source_row}"
+    assert [index for index, row, record in items] == [0, 1, 2]
+    assert other['cpf_cnpj'] == '11222333000181' and len(other_items) == 1
+
+def test_contacts_are_merged_without_repeats_in_row_order():
+    [groups] = group_all(ClientMerger('last', CONTACT_TYPES), ROWS)
+    assert groups[0][0]['contacts'] == [('Celular', '+5511987654321'), ('E-Mail', 'a@example.com'),
+                                        ('E-Mail', 'b@example.com')]
+
+def test_complete_ties_go_to_the_later_row():
+    [groups] = group_all(ClientMerger('complete'), [item(0, email='x'), item(1, nome_fantasia='A'), item(2, nome_fantasia='B')])
+    assert groups[0][0]['source_row'] == 2
+
+@pytest.mark.parametrize('policy, update', [('first', False), ('last', True)])
+def test_later_chunks_only_update_when_they_win(policy, update):
+    first, second = group_all(ClientMerger(policy), [item(0)], [item(5)])
+    assert first[0][0]['update'] is True
+    assert second[0][0]['update'] is update
+
+def test_repeated_rows_go_to_the_duplicates_report():
+    report = ListReport()
+    merger = ClientMerger('first', CONTACT_TYPES, report)
+    group_all(merger, ROWS[:2], ROWS[2:])
+    assert [row for row, note in report.rows] == [('row 1',), ('row 2',)]
+    assert 'primeira ocorrência na linha 1' in report.rows[1][1]
+    assert (merger.duplicate_rows, merger.duplicate_clients) == (2, 1)
+
+def test_documents_past_the_cap_are_upserted_untracked(monkeypatch):
+    monkeypatch.setattr(dedup, 'MERGE_TRACKED_DOCUMENTS', 1)
+    report = ListReport()
+    merger = ClientMerger('first', CONTACT_TYPES, report)
+    first, second = group_all(merger, [item(0), item(1, cpf_cnpj='11222333000181')],
+                              [item(5), item(6, cpf_cnpj='11222333000181')])
+    assert [client['update'] for client, items in first] == [True, True]
+    # The tracked document keeps its first client; the untracked one is upserted again
+    assert [client['update'] for client, items in second] == [False, True]
+    assert [row for row, note in report.rows] == [('row 5',)]
+    assert len(merger._seen) == 1
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        ClientMerger('newest')
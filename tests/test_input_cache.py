@@ -0,0 +1,97 @@
+import os
+import pandas as pd
+import pytest
+from pipeline import RECORD_KEYS, validate_chunk
+from test_pipeline import chunk
+
+pytest.importorskip('pyarrow')
+import input_cache
+from input_cache import InputCache
+
+def validated(documents):
+    frame = chunk(documents)
+    records, reasons, date_paths = validate_chunk(frame)
+    return frame, records, reasons, date_paths
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / 'clientes.csv'
+    path.write_text('CPF/CNPJ\n529.982.247-25\n', encoding='utf-8')
+    return str(path)
+
+def fill(source, cache_dir):
+    """Run two validated chunks through InputCache.write and return them."""
+    results = [validated(['529.982.247-25', '529.982.247-24']), validated(['11.222.333/0001-81'])]
+    frame = results[0][0]
+    assert list(InputCache(source, RECORD_KEYS, cache_dir).write(frame.columns, iter(results))) == results
+    return list(frame.columns), results
+
+def test_round_trip(source, tmp_path):
+    columns, results = fill(source, tmp_path / 'cache')
+    cached_columns, cached = InputCache(source, RECORD_KEYS, tmp_path / 'cache').open()
+    assert cached_columns == columns
+    cached = list(cached)
+    assert len(cached) == len(results)
+    for (frame, records, reasons, paths), (cached_frame, cached_records, cached_reasons, cached_paths) in zip(results, cached):
+        assert cached_frame.index.tolist() == frame.index.tolist()
+        assert [None if record is None else record.values() for record in cached_records] == \
+               [None if record is None else record.values() for record in records]
+        assert [None if reason is None else [str(part) for part in reason] for reason in cached_reasons] == \
+               [None if reason is None else [str(part) for part in reason] for reason in reasons]
+        assert cached_paths == paths
+
+def test_raw_values_keep_their_python_types(source, tmp_path):
+    frame, records, reasons, paths = validated(['529.982.247-25', '529.982.247-24', '11.222.333/0001-81'])
+    frame['CEP'] = pd.Series([50010000, '50010-000', None], dtype=object)
+    frame['Vencimento'] = pd.Series([10, 15, 20], dtype=object)
+    frame['Plano Valor'] = pd.Series([119.9, float('nan'), 99.0], dtype=object)
+    list(InputCache(source, RECORD_KEYS, tmp_path / 'cache').write(frame.columns, iter([(frame, records, reasons, paths)])))
+    columns, cached = InputCache(source, RECORD_KEYS, tmp_path / 'cache').open()
+    [(cached_frame, cached_records, cached_reasons, cached_paths)] = cached
+    for column in frame.columns:
+        assert [type(value) for value in cached_frame[column]] == [type(value) for value in frame[column]], column
+    assert list(cached_frame['CEP']) == [50010000, '50010-000', None]
+    assert list(cached_frame['Vencimento']) == [10, 15, 20]
+
+def test_source_is_hashed_only_when_its_stat_matches(source, tmp_path, monkeypatch):
+    fill(source, tmp_path / 'cache')
+    hashed = []
+    monkeypatch.setattr(input_cache, 'file_sha256', lambda path: hashed.append(path) or input_cache.hashlib.sha256(
+        open(path, 'rb').read()).hexdigest())
+    assert InputCache(source, RECORD_KEYS, tmp_path / 'cache').open() is not None
+    assert hashed == [source]
+    fill(source, tmp_path / 'cache')
+    hashed.clear()
+    stat = os.stat(source)
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert InputCache(source, RECORD_KEYS, tmp_path / 'cache').open() is None
+    assert hashed == []
+
+def test_content_change_discards_the_entry(source, tmp_path):
+    fill(source, tmp_path / 'cache')
+    stat = os.stat(source)
+    with open(source, 'a', encoding='utf-8') as f:
+        f.write('111.444.777-35\n')
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    cache = InputCache(source, RECORD_KEYS, tmp_path / 'cache')
+    assert cache.open() is None
+    assert not os.path.exists(cache.entry)
+
+def test_mtime_change_discards_the_entry(source, tmp_path):
+    fill(source, tmp_path / 'cache')
+    stat = os.stat(source)
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert InputCache(source, RECORD_KEYS, tmp_path / 'cache').open() is None
+
+@pytest.mark.parametrize('damage', ['missing', 'truncated'])
+def test_damaged_chunk_discards_the_entry(source, tmp_path, damage):
+    fill(source, tmp_path / 'cache')
+    cache = InputCache(source, RECORD_KEYS, tmp_path / 'cache')
+    chunk_file = os.path.join(cache.entry, 'chunk-00001.arrow')
+    if damage == 'missing':
+        os.remove(chunk_file)
+    else:
+        with open(chunk_file, 'r+b') as f:
+            f.truncate(os.path.getsize(chunk_file) // 2)
+    assert cache.open() is None
+    assert not os.path.exists(cache.entry)
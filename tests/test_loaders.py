@@ -0,0 +1,248 @@
+import psycopg2
+import pytest
+from datetime import date, datetime
+from conftest import FakeCursor
+from database import ConnectionManager
+from dedup import ClientMerger
+from import_data import Checkpoint, LookupCache, resolve_lookups
+from loaders import (BATCH_SIZE, CONTACT_TYPES, HOT_STATEMENTS, as_timestamp, async_available, async_import,
+                     bulk_import, copy_text, import_group, import_rows, insert_contacts, new_batch, new_stats,
+                     parallel_import, shard_for)
+from pipeline import validate_chunk
+from reasons import ReasonCode
+from test_checkpoint import source
+from test_pipeline import chunk
+
+class Report:
+    """ReportWriter stand-in keeping the (row, reason) pairs written to it."""
+
+    def __init__(self):
+        self.rows = []
+
+    def write(self, row, reason=None):
+        self.rows.append((row, reason))
+
+def grouped(frame, db=None, checkpoint=None):
+    """A chunk's valid rows grouped by CPF/CNPJ, as (client, items) with each row's index as its row."""
+    records, reasons, date_paths = validate_chunk(frame)
+    chunks = [(frame, [(index, index, record) for index, record in enumerate(records) if record is not None])]
+    if checkpoint is not None:
+        chunks = checkpoint.skip_imported(db, chunks)
+    return list(ClientMerger('last', CONTACT_TYPES).group(chunks))
+
+def failing_on(*calls, rows=((1,),)):
+    """FakeCursor answer raising on the given calls (counted from 1) and fetching rows on the others."""
+    count = [0]
+
+    def answer(params):
+        count[0] += 1
+        if count[0] in calls:
+            raise psycopg2.IntegrityError("check constraint")
+        return rows
+    return answer
+
+def test_a_failing_contract_is_retried_without_its_row():
+    [(frame, [group])] = grouped(chunk(['529.982.247-25'] * 3))
+    for index, row, record in group[1]:
+        record.plano_id, record.status_id = 1, 1
+    cursor = FakeCursor({'INSERT INTO tbl_clientes': [(7, True)],
+                         'INSERT INTO tbl_cliente_contratos': failing_on(2)})
+    lookups = LookupCache()
+    lookups.tipos_contato = {'Celular': 1, 'Telefone': None, 'E-Mail': 3}
+    batch, stats, errors = new_batch(), new_stats(), Report()
+    import_group(cursor, group, batch, lookups, stats, errors)
+
+    savepoints = [sql for sql, params in cursor.executed if 'SAVEPOINT' in sql]
+    assert savepoints == ['SAVEPOINT import_row', 'ROLLBACK TO SAVEPOINT import_row', 'RELEASE SAVEPOINT import_row',
+                          'SAVEPOINT import_row', 'RELEASE SAVEPOINT import_row']
+    assert [(row, reason.code) for row, reason in errors.rows] == [(1, ReasonCode.CONTRACT_INSERT_FAILED)]
+    assert batch['rows'] == [(0, 0), (2, 2)] and batch['success'] == [0, 2]
+    assert batch['contacts'] == [(7, 1, '+5511987654321'), (7, 3, 'maria@example.com')]
+    assert (batch['stats']['total_clientes'], batch['stats']['contratos_importados'], stats['total_erros']) == (2, 2, 1)
+
+def test_a_failing_client_reports_the_whole_group():
+    [(frame, [group])] = grouped(chunk(['529.982.247-25'] * 2))
+    cursor = FakeCursor({'INSERT INTO tbl_clientes': failing_on(1)})
+    batch, stats, errors = new_batch(), new_stats(), Report()
+    import_group(cursor, group, batch, LookupCache(), stats, errors)
+    assert [(row, reason.code) for row, reason in errors.rows] == [(0, ReasonCode.CLIENT_INSERT_FAILED),
+                                                                    (1, ReasonCode.CLIENT_INSERT_FAILED)]
+    assert batch == new_batch()
+    assert cursor.executed[-2:] == [('ROLLBACK TO SAVEPOINT import_row', None), ('RELEASE SAVEPOINT import_row', None)]
+
+def import_frame(params, tmp_path, frame, load, pool_size=2, **options):
+    """
+    Import frame into the params database the way import_data.main does, with load(db, grouped_chunks,
+    lookups, checkpoint, stats, errors_report, success_report) as the loader. Returns stats, errors, success.
+    """
+    db = ConnectionManager(params, pool_size, **options)
+    stats, errors, success = new_stats(), Report(), Report()
+    try:
+        lookups = LookupCache()
+        db.call(lookups.load)
+        checkpoint = Checkpoint()
+        with db.connection() as conn, conn.cursor() as cursor:
+            checkpoint.start(cursor, source(tmp_path))
+            conn.commit()
+        grouped_chunks = resolve_lookups(db, grouped(frame, db, checkpoint), lookups, stats, errors)
+        load(db, grouped_chunks, lookups, checkpoint, stats, errors, success)
+    finally:
+        db.closeall()
+    return stats, errors, success
+
+def query(params, sql):
+    conn = psycopg2.connect(**params)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(sql)
+            return cursor.fetchall()
+    finally:
+        conn.close()
+
+def contracts_frame():
+    """Two clients with three contracts each; the contracts due on day 13 break a CHECK constraint."""
+    frame = chunk(['529.982.247-25'] * 3 + ['111.444.777-35'] * 3)
+    frame['Número'] = ['1', '2', '3', '1', '2', '3']
+    frame['Vencimento'] = [10, 13, 10, 10, 10, 13]
+    return frame
+
+def add_due_day_check(params):
+    conn = psycopg2.connect(**params)
+    with conn, conn.cursor() as cursor:
+        cursor.execute("ALTER TABLE tbl_cliente_contratos ADD CONSTRAINT vencimento_13 CHECK (dia_vencimento <> 13)")
+    conn.close()
+
+def row_by_row(batch_size):
+    return lambda db, grouped_chunks, *args: import_rows(
+        db, (group for chunk, groups in grouped_chunks for group in groups), batch_size, *args)
+
+def assert_due_day_rejected(params, result):
+    """The contracts_frame import kept every row but the two the CHECK constraint rejects."""
+    stats, errors, success = result
+    assert sorted(row for row, reason in errors.rows) == [1, 5]
+    assert {reason.code for row, reason in errors.rows} == {ReasonCode.CONTRACT_INSERT_FAILED}
+    assert sorted(row for row, reason in success.rows) == [0, 2, 3, 4]
+    assert query(params, """
+        SELECT c.cpf_cnpj, k.endereco_numero FROM tbl_cliente_contratos k JOIN tbl_clientes c ON c.id = k.cliente_id
+        ORDER BY 1, 2
+    """) == [('11144477735', '1'), ('11144477735', '2'), ('52998224725', '1'), ('52998224725', '3')]
+    assert query(params, "SELECT count(*) FROM tbl_cliente_contatos") == [(4,)]
+    assert query(params, "SELECT count(*) FROM tbl_importacao_linhas") == [(4,)]
+    assert (stats['contratos_importados'], stats['total_contatos'], stats['total_erros']) == (4, 4, 2)
+
+@pytest.mark.postgres
+def test_row_by_row_keeps_the_batch_when_a_contract_fails(database, tmp_path):
+    add_due_day_check(database)
+    assert_due_day_rejected(database, import_frame(database, tmp_path, contracts_frame(), row_by_row(4)))
+
+def test_copy_text_escapes_the_text_format():
+    assert [copy_text(value) for value in (None, 12, 'a\\b', 'c\td\ne\r', True)] == [
+        '\\N', '12', 'a\\\\b', 'c\\td\\ne\\r', 'True']
+
+def bulk(db, grouped_chunks, *args):
+    bulk_import(db, grouped_chunks, BATCH_SIZE, *args)
+
+@pytest.mark.postgres
+def test_bulk_import_stages_the_chunk_and_skips_repeated_contracts(database, tmp_path):
+    frame = contracts_frame()
+    frame['Vencimento'] = 10
+    frame.loc[2, 'Número'] = '1'
+    frame['Nome Fantasia'] = "Bar do Zé \\ Filial\t2"
+    stats, errors, success = import_frame(database, tmp_path, frame, bulk)
+    assert errors.rows == []
+    assert sorted(row for row, reason in success.rows) == [0, 1, 3, 4, 5]
+    assert (stats['total_clientes'], stats['contratos_importados'], stats['total_contatos']) == (6, 5, 4)
+    assert query(database, "SELECT count(*) FROM tbl_cliente_contratos") == [(5,)]
+    assert query(database, "SELECT DISTINCT nome_fantasia FROM tbl_clientes") == [("Bar do Zé \\ Filial\t2",)]
+    assert query(database, "SELECT count(*) FROM tbl_importacao_linhas") == [(6,)]
+
+@pytest.mark.postgres
+def test_bulk_import_falls_back_to_row_by_row_when_the_chunk_fails(database, tmp_path, caplog):
+    add_due_day_check(database)
+    assert_due_day_rejected(database, import_frame(database, tmp_path, contracts_frame(), bulk))
+    assert 'Bulk load failed for rows 1-6, retrying row by row' in caplog.text
+
+def test_shard_for_is_stable_and_in_range():
+    documents = ['52998224725', '11144477735', '59126784319', '11222333000181', '11444777000161']
+    shards = [shard_for(document, 3) for document in documents]
+    assert shards == [shard_for(document, 3) for document in documents]
+    assert set(shards) <= {0, 1, 2} and len(set(shards)) > 1
+
+class UnreachableDB:
+    def getconn(self):
+        raise psycopg2.OperationalError("connection refused")
+
+def test_rows_of_a_failed_loader_are_reported():
+    frame = chunk(['529.982.247-25', '111.444.777-35', '591.267.843-19'])
+    stats, errors, success = new_stats(), Report(), Report()
+    parallel_import(UnreachableDB(), grouped(frame), 2, BATCH_SIZE, LookupCache(), Checkpoint(), stats, errors, success)
+    assert sorted(row for row, reason in errors.rows) == [0, 1, 2]
+    assert {reason.code for row, reason in errors.rows} == {ReasonCode.LOADER_FAILED}
+    assert stats['total_erros'] == 3 and success.rows == []
+
+def parallel(loaders):
+    return lambda db, grouped_chunks, *args: parallel_import(db, grouped_chunks, loaders, 2, *args)
+
+@pytest.mark.postgres
+def test_parallel_loaders_import_like_row_by_row(database, tmp_path, caplog):
+    add_due_day_check(database)
+    caplog.set_level('INFO', logger='loaders')
+    assert_due_day_rejected(database, import_frame(database, tmp_path, contracts_frame(), parallel(3), pool_size=4))
+    summaries = [record.getMessage() for record in caplog.records if ' rows in ' in record.getMessage()]
+    assert [summary.split(':')[0] for summary in summaries] == ['Loader 1', 'Loader 2', 'Loader 3']
+    assert sum(int(summary.split()[2]) for summary in summaries) == 6
+
+def test_as_timestamp_turns_dates_into_midnight():
+    assert as_timestamp(date(2024, 1, 2)) == datetime(2024, 1, 2)
+    assert as_timestamp(datetime(2024, 1, 2, 8, 30)) == datetime(2024, 1, 2, 8, 30)
+    assert as_timestamp(None) is None
+
+def asynchronous(connections):
+    return lambda db, grouped_chunks, *args: async_import(db, grouped_chunks, connections, *args)
+
+@pytest.mark.postgres
+@pytest.mark.skipif(not async_available(), reason="asyncpg is not installed")
+def test_async_import_counts_like_row_by_row(database, tmp_path):
+    add_due_day_check(database)
+    assert_due_day_rejected(database, import_frame(database, tmp_path, contracts_frame(), asynchronous(2)))
+
+def insert_contacts_on(params, contacts, prepared, check=None):
+    """
+    Run insert_contacts on a pooled connection, with the hot statements PREPAREd or not, for a
+    client that already has one contact. Returns its (inserted, skipped) and the stored contacts.
+    """
+    db = ConnectionManager(params, 1, statements=HOT_STATEMENTS if prepared else None)
+    try:
+        with db.connection() as conn, conn.cursor() as cursor:
+            assert ('tsmx_insert_contatos' in getattr(conn, 'prepared_statements', ())) == prepared
+            if check:
+                cursor.execute(f"ALTER TABLE tbl_cliente_contatos ADD CONSTRAINT contato_check CHECK ({check})")
+            cursor.execute("""
+                INSERT INTO tbl_clientes (nome_razao_social, cpf_cnpj) VALUES ('Maria Silva', '52998224725') RETURNING id
+            """)
+            [(cliente_id,)] = cursor.fetchall()
+            cursor.execute("INSERT INTO tbl_cliente_contatos (cliente_id, tipo_contato_id, contato) VALUES (%s, 3, %s)",
+                           (cliente_id, 'maria@example.com'))
+            counts = insert_contacts(cursor, [(cliente_id, tipo, contato) for tipo, contato in contacts])
+            cursor.execute("SELECT tipo_contato_id, contato FROM tbl_cliente_contatos ORDER BY id")
+            return counts, cursor.fetchall()
+    finally:
+        db.closeall()
+
+CONTACTS = [(2, '+5511987654321'), (3, 'maria@example.com'), (2, '+5511987654321'), (1, '+551133334444'),
+            (3, 'maria@uol.com.br')]
+
+@pytest.mark.postgres
+@pytest.mark.parametrize('prepared', [False, True])
+def test_insert_contacts_counts_new_and_repeated_contacts(database, prepared):
+    counts, stored = insert_contacts_on(database, CONTACTS, prepared)
+    assert counts == (3, 2)
+    assert stored == [(3, 'maria@example.com'), (2, '+5511987654321'), (1, '+551133334444'), (3, 'maria@uol.com.br')]
+
+@pytest.mark.postgres
+@pytest.mark.parametrize('prepared', [False, True])
+def test_insert_contacts_retries_one_by_one_when_the_page_fails(database, prepared, caplog):
+    counts, stored = insert_contacts_on(database, CONTACTS, prepared, check="contato NOT LIKE '%uol.com.br'")
+    assert counts == (2, 3)
+    assert stored == [(3, 'maria@example.com'), (2, '+5511987654321'), (1, '+551133334444')]
+    assert 'retrying one by one' in caplog.text
@@ -0,0 +1,71 @@
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from logging_setup import SamplingFilter, init_worker, start_worker_listener
+
+def record(level, msg='Row %s: %s ignored'):
+    return logging.LogRecord('test', level, __file__, 1, msg, (1, 'CEP'), None)
+
+def test_warnings_are_sampled_per_template():
+    sampling = SamplingFilter(limit=3)
+    passed = [sampling.filter(record(logging.WARNING)) for _ in range(5)]
+    assert passed == [True, True, True, False, False]
+    assert sampling.filter(record(logging.WARNING, 'Other %s %s'))
+    assert sampling.suppressed() == {'Row %s: %s ignored': 2}
+
+def test_trace_and_errors_are_never_sampled():
+    sampling = SamplingFilter(limit=3)
+    assert all(sampling.filter(record(logging.DEBUG)) for _ in range(10))
+    assert all(sampling.filter(record(logging.ERROR)) for _ in range(10))
+    assert sampling.suppressed() == {}
+
+def test_counts_are_exact_across_threads():
+    sampling = SamplingFilter(limit=0)
+
+    def log():
+        for _ in range(5000):
+            sampling.filter(record(logging.WARNING))
+
+    threads = [threading.Thread(target=log) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sampling.suppressed() == {'Row %s: %s ignored': 40000}
+
+class Collect(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+def log_row(value):
+    logging.getLogger('worker').warning('Row %s: %s ignored', value, 'CEP')
+    logging.getLogger('worker').debug('Row %s traced', value)
+    return value
+
+def test_spawned_workers_log_through_the_main_process():
+    collect = Collect()
+    spawn = multiprocessing.get_context('spawn')
+    log_queue, listener = start_worker_listener(collect, spawn)
+    try:
+        with ProcessPoolExecutor(max_workers=2, mp_context=spawn,
+                                 initializer=init_worker, initargs=(log_queue, logging.INFO)) as executor:
+            assert list(executor.map(log_row, range(3))) == [0, 1, 2]
+    finally:
+        listener.stop()
+    assert sorted(record.getMessage() for record in collect.records) == [f'Row {value}: CEP ignored' for value in range(3)]
+    assert {record.sample_key for record in collect.records} == {'Row %s: %s ignored'}
+
+def test_worker_records_are_sampled_by_template():
+    sampling = SamplingFilter(limit=2)
+    records = []
+    for value in range(4):
+        worker_record = logging.LogRecord('test', logging.WARNING, __file__, 1, f'Row {value}: CEP ignored', None, None)
+        worker_record.sample_key = 'Row %s: %s ignored'
+        records.append(worker_record)
+    assert [sampling.filter(worker_record) for worker_record in records] == [True, True, False, False]
+    assert sampling.suppressed() == {'Row %s: %s ignored': 2}
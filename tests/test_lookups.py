@@ -0,0 +1,94 @@
+import psycopg2
+import pytest
+from conftest import FakeCursor, FakeDB
+from database import ConnectionManager
+from import_data import DEFAULT_STATUS, LOOKUP_SQL, LookupCache, resolve_lookups
+from loaders import new_stats
+from reasons import ReasonCode
+from test_loaders import Report, grouped
+from test_pipeline import chunk
+
+def preloaded():
+    cursor = FakeCursor({'FROM tbl_planos': [('plano', '100MB_FIBRA', 4), ('status', 'Ativo', 1),
+                                             ('status', 'Suspenso', 3), ('tipo', 'Celular', 2)]})
+    lookups = LookupCache()
+    lookups.load(cursor)
+    return lookups, cursor
+
+def test_load_fills_every_table_with_one_query():
+    lookups, cursor = preloaded()
+    assert len(cursor.executed) == 1
+    assert (lookups.planos, lookups.status, lookups.tipos_contato) == (
+        {'100MB_FIBRA': 4}, {'Ativo': 1, 'Suspenso': 3}, {'Celular': 2})
+
+def test_resolve_queries_only_the_labels_it_has_not_seen():
+    lookups, cursor = preloaded()
+    cursor = FakeCursor({'WITH planos': [('plano', '1GB_FIBRA', 9)]})
+    lookups.resolve(cursor, {'100MB_FIBRA': 119.9, '1GB_FIBRA': 299.9}, ['Ativo', 'Bloqueado'], ['Celular'])
+    [(sql, params)] = cursor.executed
+    assert params == {'planos': ['1GB_FIBRA'], 'valores': [299.9], 'status': ['Bloqueado'], 'tipos': []}
+    assert lookups.planos['1GB_FIBRA'] == 9 and lookups.status['Bloqueado'] is None
+    assert (lookups.hits, lookups.misses, lookups.queries) == (3, 2, 1)
+
+    # Unknown labels are cached as well, so resolving the same labels again needs no query
+    cursor = FakeCursor()
+    lookups.resolve(cursor, {'1GB_FIBRA': 299.9}, ['Ativo', 'Bloqueado'], ['Celular'])
+    assert cursor.executed == []
+    assert (lookups.hits, lookups.misses, lookups.queries) == (7, 2, 1)
+
+def test_a_plan_the_database_does_not_return_twice_is_an_error():
+    lookups = LookupCache()
+    cursor = FakeCursor()
+    with pytest.raises(RuntimeError, match='1GB_FIBRA'):
+        lookups.resolve(cursor, {'1GB_FIBRA': 299.9})
+    assert [params['planos'] for sql, params in cursor.executed] == [['1GB_FIBRA'], ['1GB_FIBRA']]
+
+@pytest.mark.postgres
+def test_created_plans_outlive_a_rolled_back_batch(database):
+    db = ConnectionManager(database, 2)
+    try:
+        lookups = LookupCache()
+        db.call(lookups.load)
+        assert lookups.status == {'Ativo': 1, 'Velocidade Reduzida': 2, 'Suspenso': 3, 'Cancelado': 4}
+        with db.connection() as conn, conn.cursor() as cursor:
+            db.call(lambda lookup_cursor: lookups.resolve(lookup_cursor, {'1GB_FIBRA': 299.9}))
+            cursor.execute("INSERT INTO tbl_planos (descricao, valor) VALUES ('descartado', 1)")
+            conn.rollback()
+            cursor.execute("SELECT descricao, id FROM tbl_planos")
+            assert cursor.fetchall() == [('1GB_FIBRA', lookups.planos['1GB_FIBRA'])]
+    finally:
+        db.closeall()
+
+def test_resolve_lookups_stores_ids_and_drops_rows_of_unknown_statuses():
+    frame = chunk(['529.982.247-25', '529.982.247-25', '111.444.777-35'])
+    frame['Status'] = [None, 'Bloqueado', 'Suspenso']
+    cursor = FakeCursor({'WITH planos': [('plano', '100MB_FIBRA', 4), ('status', 'Suspenso', 3),
+                                         ('status', DEFAULT_STATUS, 2), ('tipo', 'Celular', 2)]})
+    lookups, stats, errors = LookupCache(), new_stats(), Report()
+    [(frame_, groups)] = resolve_lookups(FakeDB(cursor), grouped(frame), lookups, stats, errors)
+
+    [(sql, params)] = cursor.executed
+    assert sorted(params['status']) == ['Bloqueado', 'Suspenso', DEFAULT_STATUS]
+    assert sorted(params['tipos']) == ['Celular', 'E-Mail', 'Telefone']
+    assert [(row, reason.code, reason.params) for row, reason in errors.rows] == [
+        (1, ReasonCode.UNKNOWN_STATUS, ('Bloqueado',))]
+    assert [[(index, record.plano_id, record.status_id) for index, row, record in items]
+            for client, items in groups] == [[(0, 4, 2)], [(2, 4, 3)]]
+    assert stats['total_erros'] == 1
+
+@pytest.mark.postgres
+def test_lookup_sql_creates_missing_plans_and_finds_the_rest_in_one_statement(database):
+    conn = psycopg2.connect(**database)
+    with conn, conn.cursor() as cursor:
+        cursor.execute("INSERT INTO tbl_planos (descricao, valor) VALUES ('100MB_FIBRA', 119.9) RETURNING id")
+        [(existing,)] = cursor.fetchall()
+        cursor.execute(LOOKUP_SQL, {'planos': ['100MB_FIBRA', '1GB_FIBRA'], 'valores': [1, 299.9],
+                                    'status': ['Ativo', 'Bloqueado'], 'tipos': ['Celular', 'Fax']})
+        found = sorted(cursor.fetchall())
+        cursor.execute("SELECT descricao, valor::float FROM tbl_planos ORDER BY id")
+        assert cursor.fetchall() == [('100MB_FIBRA', 119.9), ('1GB_FIBRA', 299.9)]
+        cursor.execute("SELECT id FROM tbl_planos WHERE descricao = '1GB_FIBRA'")
+        [(created,)] = cursor.fetchall()
+    conn.close()
+    assert found == [('plano', '100MB_FIBRA', existing), ('plano', '1GB_FIBRA', created),
+                     ('status', 'Ativo', 1), ('tipo', 'Celular', 2)]
@@ -0,0 +1,53 @@
+import os
+import psycopg2
+import pytest
+from conftest import ROOT, run_script
+
+MIGRATION_FILE = os.path.join(ROOT, 'migration_contratos_pgsql.sql')
+
+CONTRACT_SQL = """
+    INSERT INTO tbl_cliente_contratos (cliente_id, plano_id, dia_vencimento, isento, endereco_logradouro,
+                                       endereco_numero, endereco_bairro, endereco_cidade, endereco_complemento,
+                                       endereco_cep, endereco_uf, status_id)
+    VALUES (%s, %s, 10, false, 'Rua das Flores', %s, 'Centro', 'Recife', %s, '50010-000', 'PE', 1)
+"""
+
+def contract_ids(cursor):
+    cursor.execute("SELECT id, endereco_numero, endereco_complemento FROM tbl_cliente_contratos ORDER BY id")
+    return cursor.fetchall()
+
+@pytest.mark.postgres
+def test_migration_collapses_duplicate_contracts_and_can_run_again(database):
+    conn = psycopg2.connect(**database)
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cursor:
+            # A database from before the contract key, with the duplicates reruns left behind
+            cursor.execute("ALTER TABLE tbl_cliente_contratos DROP CONSTRAINT tbl_cliente_contratos_contrato_key")
+            cursor.execute("DROP INDEX tbl_cliente_contratos_plano_id_idx, tbl_cliente_contratos_status_id_idx")
+            cursor.execute("INSERT INTO tbl_clientes (nome_razao_social, cpf_cnpj) VALUES ('Maria Silva', '52998224725') RETURNING id")
+            [(cliente_id,)] = cursor.fetchall()
+            cursor.execute("INSERT INTO tbl_planos (descricao, valor) VALUES ('100MB_FIBRA', 119.9) RETURNING id")
+            [(plano_id,)] = cursor.fetchall()
+            for numero, complemento in [('12', None), ('12', None), ('12', 'Apto 1'), ('14', None), ('12', 'Apto 1')]:
+                cursor.execute(CONTRACT_SQL, (cliente_id, plano_id, numero, complemento))
+            first, second, apartment, other, repeated = [row[0] for row in contract_ids(cursor)]
+
+            run_script(cursor, MIGRATION_FILE)
+            kept = contract_ids(cursor)
+            assert kept == [(first, '12', None), (apartment, '12', 'Apto 1'), (other, '14', None)]
+            run_script(cursor, MIGRATION_FILE)
+            assert contract_ids(cursor) == kept
+
+            cursor.execute("""
+                SELECT indexname FROM pg_indexes WHERE tablename = 'tbl_cliente_contratos' ORDER BY indexname
+            """)
+            assert [name for (name,) in cursor.fetchall()] == [
+                'tbl_cliente_contratos_contrato_key', 'tbl_cliente_contratos_pkey',
+                'tbl_cliente_contratos_plano_id_idx', 'tbl_cliente_contratos_status_id_idx']
+
+            # The loaders' ON CONFLICT DO NOTHING now skips a contract the table already has
+            cursor.execute(CONTRACT_SQL + " ON CONFLICT DO NOTHING RETURNING id", (cliente_id, plano_id, '12', None))
+            assert cursor.fetchall() == []
+    finally:
+        conn.close()
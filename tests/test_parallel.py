@@ -0,0 +1,35 @@
+import time
+import parallel
+from parallel import map_in_order, PENDING_PER_WORKER
+
+def slow_square(value):
+    # Earlier items take longer, so they finish out of order
+    time.sleep(0.01 * (5 - value % 5))
+    return value * value
+
+def test_results_keep_input_order():
+    values = list(range(20))
+    assert list(map_in_order(slow_square, values, workers=3)) == [value * value for value in values]
+
+def test_single_worker_runs_in_process():
+    assert list(map_in_order(str, iter([3, 1, 2]))) == ['3', '1', '2']
+
+def test_empty_input_starts_no_pool(monkeypatch):
+    def no_pool(*args, **kwargs):
+        raise AssertionError("pool started for empty input")
+    monkeypatch.setattr(parallel, 'ProcessPoolExecutor', no_pool)
+    assert list(map_in_order(slow_square, [], workers=4)) == []
+    assert list(map_in_order(slow_square, iter(()), workers=4)) == []
+
+def test_input_is_not_read_far_ahead():
+    read = []
+
+    def items():
+        for value in range(50):
+            read.append(value)
+            yield value
+
+    results = map_in_order(abs, items(), workers=2)
+    assert next(results) == 0
+    assert len(read) <= 2 * PENDING_PER_WORKER + 1
+    assert list(results) == list(range(1, 50))
@@ -0,0 +1,36 @@
+import pandas as pd
+from pipeline import RECORD_COLUMNS, validate_chunk
+from reasons import ReasonCode
+
+def chunk(documents):
+    """Input chunk with one otherwise valid row per document."""
+    row = {
+        'Nome/Razão Social': 'Maria Silva', 'Nome Fantasia': None, 'Data Nasc.': '1980-05-17',
+        'Data Cadastro cliente': '2024-01-02', 'Celulares': '(11) 98765-4321', 'Telefones': None,
+        'Emails': 'maria@example.com', 'Plano': '100MB_FIBRA', 'Plano Valor': 119.9, 'Status': 'Ativo',
+        'Vencimento': 10, 'Isento': 'Não', 'Endereço': 'Rua das Flores', 'Número': '12', 'Bairro': 'Centro',
+        'Cidade': 'Recife', 'Complemento': None, 'CEP': '50010-000', 'UF': 'PE',
+    }
+    frame = pd.DataFrame([dict(row, **{'CPF/CNPJ': document}) for document in documents], dtype=object)
+    return frame[[column for key, column in RECORD_COLUMNS]]
+
+def test_known_valid_documents_are_imported():
+    documents = ['529.982.247-25', '111.444.777-35', '591.267.843-19', '11.222.333/0001-81', '11.444.777/0001-61']
+    records, reasons, date_paths = validate_chunk(chunk(documents))
+    assert reasons == [None] * len(documents)
+    assert [record.cpf_cnpj for record in records] == [''.join(filter(str.isdigit, d)) for d in documents]
+
+def test_bad_checksum_rejects_the_row():
+    records, reasons, date_paths = validate_chunk(chunk(['529.982.247-25', '529.982.247-24']))
+    assert records[0] is not None and reasons[0] is None
+    assert records[1] is None
+    assert [reason.code for reason in reasons[1]] == [ReasonCode.BAD_CHECKSUM]
+
+def test_plan_values_outside_numeric_15_2_reject_the_row():
+    frame = chunk(['529.982.247-25'] * 5)
+    frame['Plano Valor'] = ['inf', '1e30', 'nan', '-9999999999999.99', '1,234.56']
+    records, reasons, date_paths = validate_chunk(frame)
+    assert [reason[0].code for reason in reasons[:3]] == [ReasonCode.INVALID, ReasonCode.OUT_OF_RANGE,
+                                                          ReasonCode.INVALID]
+    assert records[:3] == [None] * 3
+    assert [str(record.plano_valor) for record in records[3:]] == ['-9999999999999.99', '1234.56']
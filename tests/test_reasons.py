@@ -0,0 +1,44 @@
+import pytest
+from reasons import LABELS, LANGUAGES, MESSAGES, Reason, ReasonCode, dumps, loads, render, kind_name
+
+REASONS = [
+    Reason(ReasonCode.MISSING, field='CPF/CNPJ'),
+    Reason(ReasonCode.BAD_CHECKSUM, '25', '24', field='CPF'),
+    Reason(ReasonCode.DOCUMENT_LENGTH, 10, field='CPF/CNPJ'),
+    Reason(ReasonCode.OUT_OF_RANGE, 1, 31, field='Dia de vencimento'),
+    Reason(ReasonCode.LOADER_FAILED, 2, 'conexão perdida: "tbl_clientes"'),
+]
+
+def test_every_code_has_a_message_in_every_language():
+    for language in LANGUAGES:
+        assert set(MESSAGES[language]) == set(ReasonCode)
+        assert set(LABELS[language]) == set(ReasonCode)
+
+@pytest.mark.parametrize('reason', REASONS)
+def test_dumps_loads_round_trip(reason):
+    [loaded] = loads(dumps(reason))
+    assert (loaded.code, loaded.field, loaded.params) == (reason.code, reason.field, reason.params)
+    assert isinstance(loaded.code, ReasonCode)
+    for language in LANGUAGES:
+        assert loaded.render(language) == reason.render(language)
+
+def test_row_reasons_round_trip_in_order():
+    loaded = loads(dumps(tuple(REASONS)))
+    assert [part.kind for part in loaded] == [part.kind for part in REASONS]
+    assert render(loaded) == render(tuple(REASONS))
+
+def test_missing_reason_stays_none():
+    assert dumps(None) is None
+    assert loads(None) is None
+
+def test_render():
+    reason = (REASONS[1], REASONS[3])
+    assert render(reason) == ("Checksum de CPF inválido (esperado: 25, fornecido: 24).; "
+                              "Dia de vencimento inválido (deve ser entre 1 e 31).")
+    assert render(REASONS[1], 'en') == "Invalid CPF checksum (expected: 25, given: 24)."
+    assert render("CPF/CNPJ repetido") == "CPF/CNPJ repetido"
+    assert render(None) == ''
+
+def test_kind_name():
+    assert kind_name(REASONS[1].kind) == 'BAD_CHECKSUM CPF'
+    assert kind_name(REASONS[4].kind) == 'LOADER_FAILED'
@@ -0,0 +1,78 @@
+import csv
+import math
+import os
+import pytest
+from openpyxl import load_workbook
+from reasons import Reason, ReasonCode
+from reports import REASON_COLUMN, ReportWriter, write_reason_summary
+
+COLUMNS = ['CPF/CNPJ', 'Nome/Razão Social', 'Plano Valor']
+CHECKSUM = Reason(ReasonCode.BAD_CHECKSUM, '25', '24', field='CPF')
+UF = Reason(ReasonCode.INVALID, field='UF')
+
+def write_rows(report):
+    with report:
+        report.write(('529.982.247-24', 'José Ação', 119.9), (CHECKSUM, UF))
+        report.write(('111.444.777-35', None, math.nan), UF)
+
+def read_rows(path, report_format):
+    if report_format == 'xlsx':
+        return [list(row) for row in load_workbook(path).active.iter_rows(values_only=True)]
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        return list(csv.reader(f, delimiter=',' if report_format == 'csv' else '\t'))
+
+@pytest.mark.parametrize('report_format', ['xlsx', 'csv', 'txt'])
+def test_rows_and_reasons_are_written(tmp_path, report_format):
+    report = ReportWriter(str(tmp_path / 'import_erros.xlsx'), COLUMNS, report_format=report_format)
+    write_rows(report)
+    assert report.path == str(tmp_path / f'import_erros.{report_format}')
+    rows = read_rows(report.path, report_format)
+    assert rows[0] == COLUMNS + [REASON_COLUMN]
+    reason = "Checksum de CPF inválido (esperado: 25, fornecido: 24).; UF inválido."
+    if report_format == 'xlsx':
+        assert rows[1:] == [['529.982.247-24', 'José Ação', 119.9, reason],
+                            ['111.444.777-35', None, None, 'UF inválido.']]
+    else:
+        assert rows[1:] == [['529.982.247-24', 'José Ação', '119.9', reason],
+                            ['111.444.777-35', '', '', 'UF inválido.']]
+
+def test_messages_follow_the_language(tmp_path):
+    report = ReportWriter(str(tmp_path / 'e.csv'), COLUMNS, report_format='csv', language='en')
+    write_rows(report)
+    assert read_rows(report.path, 'csv')[2][-1] == 'Invalid UF.'
+
+def test_title_row_comes_first(tmp_path):
+    with ReportWriter(str(tmp_path / 's.csv'), COLUMNS, title='Registros Válidos', report_format='csv') as report:
+        report.write(('111.444.777-35', 'Ana', 1.0))
+    rows = read_rows(report.path, 'csv')
+    assert rows[0] == ['Registros Válidos']
+    assert rows[2] == ['111.444.777-35', 'Ana', '1.0', '']
+
+def test_empty_report_leaves_no_file(tmp_path):
+    report = ReportWriter(str(tmp_path / 'e.xlsx'), COLUMNS)
+    report.close()
+    report.close()
+    assert report.count == 0
+    assert not os.path.exists(report.path)
+
+def test_unknown_format_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        ReportWriter(str(tmp_path / 'e.xlsx'), COLUMNS, report_format='ods')
+
+def test_reason_summary_counts_codes_per_field(tmp_path):
+    report = ReportWriter(str(tmp_path / 'e.csv'), COLUMNS, report_format='csv')
+    write_rows(report)
+    assert report.count == 2
+    write_reason_summary(str(tmp_path / 'import_motivos.xlsx'), report, 'csv')
+    rows = read_rows(str(tmp_path / 'import_motivos.csv'), 'csv')
+    assert rows == [['Código', 'Motivo', 'Campo', 'Linhas', 'Exemplo'],
+                    ['11', 'Inválido', 'UF', '2', 'UF inválido.'],
+                    ['5', 'Dígito verificador inválido', 'CPF', '1', 'Checksum de CPF inválido (esperado: 25, fornecido: 24).']]
+
+def test_reason_summary_uses_the_report_language(tmp_path):
+    report = ReportWriter(str(tmp_path / 'e.csv'), COLUMNS, report_format='csv', language='en')
+    write_rows(report)
+    write_reason_summary(str(tmp_path / 'import_motivos.xlsx'), report, 'csv')
+    rows = read_rows(str(tmp_path / 'import_motivos.csv'), 'csv')
+    assert rows[1:] == [['11', 'Invalid', 'UF', '2', 'Invalid UF.'],
+                        ['5', 'Invalid check digits', 'CPF', '1', 'Invalid CPF checksum (expected: 25, given: 24).']]